@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from client.sql_client import repair_post_stats
+from comments.sql_comments import repair_comment_counters
+
+# (название, функция с расхождениями, ключ, функция починки)
+COUNTERS = (
+    ("post_stats", "post_stats_drift()", "post_id", repair_post_stats),
+    ("comments", "comment_counter_drift()", "comment_id", repair_comment_counters),
+)
+
+
+class Command(BaseCommand):
+    help = "Сверяет денормализованные счётчики постов и комментариев с данными"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair", action="store_true",
+            help="Переписать расходящиеся счётчики",
+        )
+
+    def handle(self, *args, repair, **options):
+        total_drift = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            if repair:
+                # SHARE блокирует запись (и триггеры) на время починки, чтение не мешает
+                cursor.execute("LOCK TABLE comments, reactions, post_tags IN SHARE MODE")
+
+            # write-behind: несвёрнутые дельты - это не расхождение, сначала догоняем
+            cursor.execute("SELECT apply_reaction_deltas(%s)", (2 ** 31 - 1,))
+            flushed = cursor.fetchone()[0]
+            if flushed:
+                self.stdout.write(f"✔ applied {flushed} pending reaction deltas")
+
+            for name, view, key, repair_func in COUNTERS:
+                cursor.execute(f"SELECT {key} FROM {view} ORDER BY {key}")
+                ids = [row[0] for row in cursor.fetchall()]
+                total_drift += len(ids)
+
+                if not ids:
+                    self.stdout.write(f"✔ {name}: counters consistent")
+                    continue
+
+                sample = ", ".join(str(i) for i in ids[:10])
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ {name}: {len(ids)} rows out of sync (e.g. {sample})"
+                ))
+                if repair:
+                    fixed = repair_func(cursor)
+                    self.stdout.write(self.style.SUCCESS(f"✔ {name}: {fixed} rows repaired"))
+
+        if total_drift and not repair:
+            raise CommandError("Counters out of sync, run with --repair")
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from client.sql_client import TRENDING_SIZE, refresh_trending_posts
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает hot_score постов с недавней активностью в trending_posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Пересобрать список по всем постам",
+        )
+        parser.add_argument(
+            "--size", type=int, default=TRENDING_SIZE,
+            help="Сколько постов держать в trending_posts",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=None,
+            help="Повторять каждые N секунд (без флага - один прогон)",
+        )
+
+    def handle(self, *args, full, size, interval, **options):
+        try:
+            while True:
+                started = time.monotonic()
+                refreshed = refresh_trending_posts(size=size, full=full)
+                self.stdout.write(
+                    f"✔ trending: {refreshed} posts rescored in {time.monotonic() - started:.2f}s"
+                )
+                if interval is None:
+                    break
+                full = False
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
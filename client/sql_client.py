@@ -1,19 +1,6 @@
 from django.db import connection
 
-# =========================
-# Utils
-# =========================
-def dict_fetchone(cursor):
-    row = cursor.fetchone()
-    if row is None:
-        return None
-    desc = cursor.description
-    return {desc[i].name: row[i] for i in range(len(row))}
-
-def dict_fetchall(cursor):
-    rows = cursor.fetchall()
-    desc = cursor.description
-    return [{desc[i].name: row[i] for i in range(len(row))} for row in rows]
+from db.access import call_all, call_one, call_value, fetch_one
 
 # =========================
 # Profile table + SQL functions
@@ -90,8 +77,6 @@ def create_profile_table_and_functions():
         RETURNS TABLE(
             profile_id INT, profile_user_id INT, avatar_url TEXT, bio TEXT, reputation INT, created_at TIMESTAMP, updated_at TIMESTAMP
         ) AS $$
-        BEGIN
-            RETURN QUERY
             SELECT
                 profile.id AS profile_id,
                 profile.user_id AS profile_user_id,
@@ -102,8 +87,7 @@ def create_profile_table_and_functions():
                 profile.updated_at
             FROM profile
             WHERE profile.user_id = p_user_id;
-        END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -156,34 +140,28 @@ def create_profile_table_and_functions():
 # Python wrappers
 # =========================
 def create_profile(user_id, avatar_url=None, bio=None):
-    create_profile_table_and_functions()
     avatar_url = avatar_url or ''
     bio = bio or ''
     with connection.cursor() as cursor:
         cursor.execute("SELECT * FROM create_profile_func(%s, %s, %s)", (user_id, avatar_url, bio))
-        result = dict_fetchone(cursor)
+        result = fetch_one(cursor)
     connection.commit()  
     return result
 
 def get_profile(user_id):
-    create_profile_table_and_functions()  
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_profile_func(%s)", (user_id,))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM get_profile_func(%s)", (user_id,))
 
 def update_profile(user_id, avatar_url=None, bio=None):
-    create_profile_table_and_functions()
     with connection.cursor() as cursor:
         cursor.execute(
             "SELECT * FROM update_profile_func(%s, %s, %s, %s)",
             (user_id, avatar_url, bio, None)  
         )
-        result = dict_fetchone(cursor)
+        result = fetch_one(cursor)
     connection.commit() 
     return result
 
 def delete_profile(user_id):
-    create_profile_table_and_functions()
     with connection.cursor() as cursor:
         cursor.execute("SELECT delete_profile_func(%s)", (user_id,))
         result = cursor.fetchone()[0]
@@ -191,197 +169,799 @@ def delete_profile(user_id):
     return result
 
 # =========================
-# Posts View
+# Post stats (trigger-maintained)
 # =========================
-def create_posts_view():
+def init_post_stats():
+    """
+    Таблица post_stats (db/init/009_post_stats_t.sql) хранит счётчики поста
+    и обновляется триггерами на posts, comments, reactions, post_tags и tags.
+    """
     with connection.cursor() as cursor:
+        # -------------------------
+        # posts: строка статистики создаётся вместе с постом
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION post_stats_on_post()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO post_stats(post_id)
+            VALUES (NEW.id)
+            ON CONFLICT (post_id) DO NOTHING;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_post_stats_post ON posts")
+        cursor.execute("""
+        CREATE TRIGGER trg_post_stats_post
+        AFTER INSERT ON posts
+        FOR EACH ROW
+        EXECUTE FUNCTION post_stats_on_post();
+        """)
+
+        # -------------------------
+        # comments: comment_count
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION post_stats_on_comment()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE post_stats
+                SET comment_count = comment_count + 1,
+                    updated_at = NOW()
+                WHERE post_id = NEW.post_id;
+            ELSE
+                UPDATE post_stats
+                SET comment_count = comment_count - 1,
+                    updated_at = NOW()
+                WHERE post_id = OLD.post_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_post_stats_comment ON comments")
+        cursor.execute("""
+        CREATE TRIGGER trg_post_stats_comment
+        AFTER INSERT OR DELETE ON comments
+        FOR EACH ROW
+        EXECUTE FUNCTION post_stats_on_comment();
+        """)
+
+        # -------------------------
+        # reactions: likes / loves / dislikes
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION post_stats_on_reaction()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            v_post_id INT;
+            v_old_type VARCHAR;
+            v_new_type VARCHAR;
+        BEGIN
+            IF COALESCE(NEW.reactable_type, OLD.reactable_type) <> 'post' THEN
+                RETURN NULL;
+            END IF;
+
+            -- write-behind: дельта уже в reaction_deltas, счётчики догонит aggregate_reactions
+            IF current_setting('reverence.reaction_write_behind', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+
+            v_post_id := COALESCE(NEW.reactable_id, OLD.reactable_id);
+            IF TG_OP <> 'INSERT' THEN
+                v_old_type := OLD.reaction_type;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                v_new_type := NEW.reaction_type;
+            END IF;
+
+            -- повторная та же реакция (upsert) счётчики не меняет
+            IF v_old_type IS NOT DISTINCT FROM v_new_type THEN
+                RETURN NULL;
+            END IF;
+
+            UPDATE post_stats
+            SET likes_count = likes_count
+                    + (v_new_type IS NOT DISTINCT FROM 'like')::INT
+                    - (v_old_type IS NOT DISTINCT FROM 'like')::INT,
+                loves_count = loves_count
+                    + (v_new_type IS NOT DISTINCT FROM 'love')::INT
+                    - (v_old_type IS NOT DISTINCT FROM 'love')::INT,
+                dislikes_count = dislikes_count
+                    + (v_new_type IS NOT DISTINCT FROM 'dislike')::INT
+                    - (v_old_type IS NOT DISTINCT FROM 'dislike')::INT,
+                updated_at = NOW()
+            WHERE post_id = v_post_id;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_post_stats_reaction ON reactions")
+        cursor.execute("""
+        CREATE TRIGGER trg_post_stats_reaction
+        AFTER INSERT OR UPDATE OR DELETE ON reactions
+        FOR EACH ROW
+        EXECUTE FUNCTION post_stats_on_reaction();
+        """)
+
+        # -------------------------
+        # post_tags / tags: tag_count + tag_list
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION refresh_post_tag_stats(p_post_id INT)
+        RETURNS VOID AS $$
+            UPDATE post_stats s
+            SET tag_count = t.tag_count,
+                tag_list = t.tag_list,
+                updated_at = NOW()
+            FROM (
+                SELECT
+                    COUNT(*)::INT AS tag_count,
+                    COALESCE(STRING_AGG(tg.name, ', ' ORDER BY tg.name), 'No tags') AS tag_list
+                FROM post_tags pt
+                JOIN tags tg ON tg.id = pt.tag_id
+                WHERE pt.post_id = p_post_id
+            ) t
+            WHERE s.post_id = p_post_id;
+        $$ LANGUAGE sql;
+        """)
+
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION post_stats_on_post_tag()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM refresh_post_tag_stats(COALESCE(NEW.post_id, OLD.post_id));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_post_stats_post_tag ON post_tags")
+        cursor.execute("""
+        CREATE TRIGGER trg_post_stats_post_tag
+        AFTER INSERT OR DELETE ON post_tags
+        FOR EACH ROW
+        EXECUTE FUNCTION post_stats_on_post_tag();
+        """)
+
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION post_stats_on_tag_rename()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF OLD.name IS DISTINCT FROM NEW.name THEN
+                PERFORM refresh_post_tag_stats(pt.post_id)
+                FROM post_tags pt
+                WHERE pt.tag_id = NEW.id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_post_stats_tag_rename ON tags")
         cursor.execute("""
-        DROP VIEW IF EXISTS posts_with_stats CASCADE;
+        CREATE TRIGGER trg_post_stats_tag_rename
+        AFTER UPDATE ON tags
+        FOR EACH ROW
+        EXECUTE FUNCTION post_stats_on_tag_rename();
         """)
+
+        # -------------------------
+        # NOTIFY post_stats: новые счётчики открытым страницам поста (posts/realtime.py)
+        # -------------------------
+        # шлём абсолютные значения, а не дельты: пропущенное событие не ломает счётчик
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION post_stats_notify()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM pg_notify('post_stats', json_build_object(
+                'post_id', NEW.post_id,
+                'likes_count', NEW.likes_count,
+                'loves_count', NEW.loves_count,
+                'dislikes_count', NEW.dislikes_count,
+                'comment_count', NEW.comment_count
+            )::TEXT);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_post_stats_notify ON post_stats")
+        cursor.execute("""
+        CREATE TRIGGER trg_post_stats_notify
+        AFTER UPDATE ON post_stats
+        FOR EACH ROW
+        WHEN ((OLD.likes_count, OLD.loves_count, OLD.dislikes_count, OLD.comment_count)
+              IS DISTINCT FROM
+              (NEW.likes_count, NEW.loves_count, NEW.dislikes_count, NEW.comment_count))
+        EXECUTE FUNCTION post_stats_notify();
+        """)
+
+        # -------------------------
+        # Backfill: посты, у которых ещё нет строки статистики
+        # -------------------------
+        cursor.execute("""
+        INSERT INTO post_stats(
+            post_id, comment_count, tag_count, tag_list,
+            likes_count, loves_count, dislikes_count
+        )
+        SELECT
+            p.id,
+            (SELECT COUNT(*) FROM comments c WHERE c.post_id = p.id),
+            (SELECT COUNT(*) FROM post_tags pt WHERE pt.post_id = p.id),
+            COALESCE(
+                (SELECT STRING_AGG(t.name, ', ' ORDER BY t.name)
+                 FROM post_tags pt JOIN tags t ON t.id = pt.tag_id
+                 WHERE pt.post_id = p.id),
+                'No tags'
+            ),
+            r.likes_count,
+            r.loves_count,
+            r.dislikes_count
+        FROM posts p
+        CROSS JOIN LATERAL (
+            SELECT
+                COUNT(*) FILTER (WHERE reaction_type = 'like') AS likes_count,
+                COUNT(*) FILTER (WHERE reaction_type = 'love') AS loves_count,
+                COUNT(*) FILTER (WHERE reaction_type = 'dislike') AS dislikes_count
+            FROM reactions
+            WHERE reactable_type = 'post' AND reactable_id = p.id
+        ) r
+        WHERE NOT EXISTS (SELECT 1 FROM post_stats s WHERE s.post_id = p.id)
+        ON CONFLICT (post_id) DO NOTHING;
+        """)
+
+        # -------------------------
+        # posts_with_stats: простой JOIN, без агрегации на чтении
+        # -------------------------
+        cursor.execute("DROP VIEW IF EXISTS posts_with_stats")
         cursor.execute("""
         CREATE VIEW posts_with_stats AS
-        SELECT 
+        SELECT
             p.id,
             p.title,
             p.content,
             p.author_id,
             p.created_at,
-            
-            COUNT(DISTINCT c.id) AS comment_count,
-            
-            COUNT(DISTINCT pt.tag_id) AS tag_count,
-            COALESCE(
-                STRING_AGG(DISTINCT t.name, ', ' ORDER BY t.name), 
-                'No tags'
-            ) AS tag_list,
-            
-            COUNT(DISTINCT CASE WHEN r.reaction_type = 'like' THEN r.id END) AS likes_count,
-            COUNT(DISTINCT CASE WHEN r.reaction_type = 'love' THEN r.id END) AS loves_count,
-            COUNT(DISTINCT CASE WHEN r.reaction_type = 'dislike' THEN r.id END) AS dislikes_count,
-            
-            COUNT(DISTINCT r.id) AS total_reactions,
-            
-            (
-                COUNT(DISTINCT CASE WHEN r.reaction_type = 'like' THEN r.id END) +
-                2 * COUNT(DISTINCT CASE WHEN r.reaction_type = 'love' THEN r.id END) -
-                COUNT(DISTINCT CASE WHEN r.reaction_type = 'dislike' THEN r.id END)
-            ) AS engagement_score
+            s.comment_count,
+            s.tag_count,
+            s.tag_list,
+            s.likes_count,
+            s.loves_count,
+            s.dislikes_count,
+            s.total_reactions,
+            s.engagement_score
         FROM posts p
-        LEFT JOIN comments c ON c.post_id = p.id
-        LEFT JOIN post_tags pt ON pt.post_id = p.id
-        LEFT JOIN tags t ON t.id = pt.tag_id
-        LEFT JOIN reactions r ON r.reactable_type = 'post' AND r.reactable_id = p.id
-        GROUP BY p.id, p.title, p.content, p.author_id, p.created_at;
+        JOIN post_stats s ON s.post_id = p.id;
+        """)
+
+        # -------------------------
+        # Расхождения post_stats с реальными данными (manage.py check_counters)
+        # -------------------------
+        # функция, а не view: view зафиксировал бы тип tags.name (его меняет create_tags_tables)
+        cursor.execute("DROP FUNCTION IF EXISTS post_stats_drift()")
+        cursor.execute("""
+        CREATE FUNCTION post_stats_drift()
+        RETURNS TABLE(
+            post_id INT,
+            comment_count INT,
+            tag_count INT,
+            tag_list TEXT,
+            likes_count INT,
+            loves_count INT,
+            dislikes_count INT
+        ) AS $$
+        WITH cm AS (
+            SELECT post_id, COUNT(*)::INT AS comment_count
+            FROM comments
+            GROUP BY post_id
+        ),
+        tg AS (
+            SELECT
+                pt.post_id,
+                COUNT(*)::INT AS tag_count,
+                STRING_AGG(t.name, ', ' ORDER BY t.name) AS tag_list
+            FROM post_tags pt
+            JOIN tags t ON t.id = pt.tag_id
+            GROUP BY pt.post_id
+        ),
+        rx AS (
+            SELECT
+                reactable_id AS post_id,
+                COUNT(*) FILTER (WHERE reaction_type = 'like')::INT AS likes_count,
+                COUNT(*) FILTER (WHERE reaction_type = 'love')::INT AS loves_count,
+                COUNT(*) FILTER (WHERE reaction_type = 'dislike')::INT AS dislikes_count
+            FROM reactions
+            WHERE reactable_type = 'post'
+            GROUP BY reactable_id
+        ),
+        actual AS (
+            SELECT
+                p.id AS post_id,
+                COALESCE(cm.comment_count, 0) AS comment_count,
+                COALESCE(tg.tag_count, 0) AS tag_count,
+                COALESCE(tg.tag_list, 'No tags') AS tag_list,
+                COALESCE(rx.likes_count, 0) AS likes_count,
+                COALESCE(rx.loves_count, 0) AS loves_count,
+                COALESCE(rx.dislikes_count, 0) AS dislikes_count
+            FROM posts p
+            LEFT JOIN cm ON cm.post_id = p.id
+            LEFT JOIN tg ON tg.post_id = p.id
+            LEFT JOIN rx ON rx.post_id = p.id
+        )
+        SELECT a.*
+        FROM actual a
+        LEFT JOIN post_stats s ON s.post_id = a.post_id
+        WHERE (s.comment_count, s.tag_count, s.tag_list,
+               s.likes_count, s.loves_count, s.dislikes_count)
+            IS DISTINCT FROM (a.comment_count, a.tag_count, a.tag_list,
+                              a.likes_count, a.loves_count, a.dislikes_count)
+        $$ LANGUAGE sql STABLE;
         """)
     connection.commit()
-    print("✔ posts_with_stats view created")
+    print("✔ post_stats table + triggers ready")
+
+
+def repair_post_stats(cursor):
+    """Переписывает post_stats из post_stats_drift() (и создаёт недостающие строки)"""
+    cursor.execute("""
+    INSERT INTO post_stats(
+        post_id, comment_count, tag_count, tag_list,
+        likes_count, loves_count, dislikes_count
+    )
+    SELECT
+        post_id, comment_count, tag_count, tag_list,
+        likes_count, loves_count, dislikes_count
+    FROM post_stats_drift()
+    ON CONFLICT (post_id) DO UPDATE
+    SET comment_count = EXCLUDED.comment_count,
+        tag_count = EXCLUDED.tag_count,
+        tag_list = EXCLUDED.tag_list,
+        likes_count = EXCLUDED.likes_count,
+        loves_count = EXCLUDED.loves_count,
+        dislikes_count = EXCLUDED.dislikes_count,
+        updated_at = NOW()
+    """)
+    return cursor.rowcount
 
 # =========================
 # posts_with_stats
 # =========================
 def get_posts_with_stats(limit=10, offset=0):
-    create_posts_view()
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT * FROM posts_with_stats 
-            ORDER BY created_at DESC 
-            LIMIT %s OFFSET %s
-        """, (limit, offset))
-        return dict_fetchall(cursor)
+    return call_all("""
+        SELECT * FROM posts_with_stats 
+        ORDER BY created_at DESC 
+        LIMIT %s OFFSET %s
+    """, (limit, offset))
 
 def get_post_stats_by_id(post_id):
-
-    create_posts_view()
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT * FROM posts_with_stats 
-            WHERE id = %s
-        """, (post_id,))
-        return dict_fetchone(cursor)
+    return call_one("""
+        SELECT * FROM posts_with_stats 
+        WHERE id = %s
+    """, (post_id,))
 
 def get_most_engaged_posts(limit=10):
+    return call_all("""
+        SELECT * FROM posts_with_stats 
+        ORDER BY engagement_score DESC, id DESC 
+        LIMIT %s
+    """, (limit,))
+
+def get_posts_by_tag_with_stats(tag_name, limit=10):
+    # Подстрока ищется по tags.name (триграммный индекс), а не по склеенному tag_list
+    pattern = tag_name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return call_all("""
+        SELECT s.* FROM posts_with_stats s
+        WHERE s.id IN (
+            SELECT pt.post_id
+            FROM tags t
+            JOIN post_tags pt ON pt.tag_id = t.id
+            WHERE t.name LIKE %s
+        )
+        ORDER BY s.created_at DESC, s.id DESC
+        LIMIT %s
+    """, (f'%{pattern}%', limit))
+    
+# =========================
+# Trending: горячие посты в маленькой таблице trending_posts
+# =========================
+
+# Сколько постов держать в trending_posts
+TRENDING_SIZE = 500
+# Перекрытие окна инкрементального пересчёта: updated_at = NOW() начала
+# транзакции, долгая транзакция может закоммититься позже прошлого прогона
+TRENDING_REFRESH_OVERLAP = '5 minutes'
 
-    create_posts_view()
+
+def init_trending_posts():
+    """
+    hot_score не зависит от текущего времени (как в Reddit): свежесть входит
+    через created_at, поэтому счёт поста меняется только вместе с его активностью.
+    Пересчитывать нужно лишь посты, у которых post_stats.updated_at сдвинулся.
+    """
     with connection.cursor() as cursor:
+        # log10 от активности + 1 порядок за 12.5 часов свежести
         cursor.execute("""
-            SELECT * FROM posts_with_stats 
-            ORDER BY engagement_score DESC 
-            LIMIT %s
-        """, (limit,))
-        return dict_fetchall(cursor)
+        CREATE OR REPLACE FUNCTION post_hot_score(
+            p_engagement INT,
+            p_comments INT,
+            p_created_at TIMESTAMP
+        )
+        RETURNS DOUBLE PRECISION AS $$
+            SELECT
+                sign(p_engagement + p_comments)
+                    * log(GREATEST(abs(p_engagement + p_comments), 1))
+                + EXTRACT(EPOCH FROM p_created_at) / 45000;
+        $$ LANGUAGE sql IMMUTABLE;
+        """)
 
-def get_posts_by_tag_with_stats(tag_name, limit=10):
+        # trending_refresh_state (db/init/015_trending_posts.sql):
+        # одна строка - время прошлого прогона
+        cursor.execute("""
+        INSERT INTO trending_refresh_state(id, last_refresh_at)
+        VALUES (TRUE, NULL)
+        ON CONFLICT (id) DO NOTHING;
+        """)
 
-    create_posts_view()
-    with connection.cursor() as cursor:
+        cursor.execute("DROP FUNCTION IF EXISTS refresh_trending_posts(INT, BOOLEAN, INTERVAL)")
         cursor.execute("""
-            SELECT * FROM posts_with_stats 
-            WHERE tag_list LIKE %s
-            ORDER BY created_at DESC 
-            LIMIT %s
-        """, (f'%{tag_name}%', limit))
-        return dict_fetchall(cursor)
-    
+        CREATE FUNCTION refresh_trending_posts(
+            p_size INT,
+            p_full BOOLEAN DEFAULT FALSE,
+            p_overlap INTERVAL DEFAULT '5 minutes'
+        )
+        RETURNS INT AS $$
+        DECLARE
+            v_since TIMESTAMP;
+            v_count INT;
+        BEGIN
+            -- FOR UPDATE: параллельные прогоны выполняются по очереди
+            SELECT last_refresh_at INTO v_since
+            FROM trending_refresh_state
+            FOR UPDATE;
+
+            IF p_full OR v_since IS NULL THEN
+                DELETE FROM trending_posts;
+                v_since := NULL;
+            END IF;
+
+            INSERT INTO trending_posts(post_id, hot_score, refreshed_at)
+            SELECT
+                s.post_id,
+                post_hot_score(s.engagement_score, s.comment_count, p.created_at),
+                NOW()
+            FROM post_stats s
+            JOIN posts p ON p.id = s.post_id
+            WHERE v_since IS NULL
+               OR s.updated_at >= v_since - p_overlap
+            ON CONFLICT (post_id) DO UPDATE
+            SET hot_score = EXCLUDED.hot_score,
+                refreshed_at = EXCLUDED.refreshed_at;
+            GET DIAGNOSTICS v_count = ROW_COUNT;
+
+            -- держим только верх списка
+            DELETE FROM trending_posts t
+            WHERE t.post_id NOT IN (
+                SELECT post_id FROM trending_posts
+                ORDER BY hot_score DESC, post_id DESC
+                LIMIT p_size
+            );
+
+            UPDATE trending_refresh_state SET last_refresh_at = NOW();
+            RETURN v_count;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+
+        # первый запуск: сразу наполняем список
+        cursor.execute("SELECT last_refresh_at FROM trending_refresh_state")
+        if cursor.fetchone()[0] is None:
+            cursor.execute(
+                "SELECT refresh_trending_posts(%s, TRUE, %s)",
+                (TRENDING_SIZE, TRENDING_REFRESH_OVERLAP)
+            )
+
+    connection.commit()
+    print("✔ trending_posts ready")
+
+
+def refresh_trending_posts(size=TRENDING_SIZE, full=False):
+    """Пересчитать hot_score изменившихся постов, вернуть их число"""
+    return call_value(
+        "SELECT refresh_trending_posts(%s, %s, %s)",
+        (size, full, TRENDING_REFRESH_OVERLAP)
+    )
+
+
+def get_trending_posts(limit=20):
+    # top-N по idx_trending_posts_hot, статистика из posts_with_stats
+    return call_all("""
+        SELECT s.*, t.hot_score
+        FROM trending_posts t
+        JOIN posts_with_stats s ON s.id = t.post_id
+        ORDER BY t.hot_score DESC, t.post_id DESC
+        LIMIT %s
+    """, (limit,))
+
+
 # =========================
-# User Activity View
+# User activity (trigger-maintained)
 # =========================
-def create_user_activity_view():
+def init_user_activity():
+    """
+    Таблица user_activity (db/init/010_user_activity_t.sql) хранит счётчики
+    активности пользователя и обновляется триггерами на users, posts, comments и reactions.
+    """
     with connection.cursor() as cursor:
+        # -------------------------
+        # users: строка активности создаётся вместе с пользователем
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION user_activity_on_user()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO user_activity(user_id)
+            VALUES (NEW.id)
+            ON CONFLICT (user_id) DO NOTHING;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_user_activity_user ON users")
+        cursor.execute("""
+        CREATE TRIGGER trg_user_activity_user
+        AFTER INSERT ON users
+        FOR EACH ROW
+        EXECUTE FUNCTION user_activity_on_user();
+        """)
+
+        # -------------------------
+        # posts: posts_count
+        # BEFORE DELETE, пока реакции на пост ещё можно посчитать
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION user_activity_on_post()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE user_activity
+                SET posts_count = posts_count + 1,
+                    last_activity_at = GREATEST(last_activity_at, NEW.created_at)
+                WHERE user_id = NEW.author_id;
+                RETURN NEW;
+            END IF;
+
+            UPDATE user_activity
+            SET posts_count = posts_count - 1,
+                reactions_on_posts = reactions_on_posts - (
+                    SELECT COUNT(*) FROM reactions
+                    WHERE reactable_type = 'post' AND reactable_id = OLD.id
+                ) + (
+                    -- write-behind: несвёрнутые дельты в счётчик ещё не попали,
+                    -- а после удаления apply_reaction_deltas их пропустит
+                    SELECT COALESCE(SUM(d.likes_delta + d.loves_delta + d.dislikes_delta), 0)
+                    FROM reaction_deltas d
+                    WHERE d.reactable_type = 'post' AND d.reactable_id = OLD.id
+                )
+            WHERE user_id = OLD.author_id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_user_activity_post_insert ON posts")
+        cursor.execute("""
+        CREATE TRIGGER trg_user_activity_post_insert
+        AFTER INSERT ON posts
+        FOR EACH ROW
+        EXECUTE FUNCTION user_activity_on_post();
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_user_activity_post_delete ON posts")
+        cursor.execute("""
+        CREATE TRIGGER trg_user_activity_post_delete
+        BEFORE DELETE ON posts
+        FOR EACH ROW
+        EXECUTE FUNCTION user_activity_on_post();
+        """)
+
+        # -------------------------
+        # comments: comments_count
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION user_activity_on_comment()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE user_activity
+                SET comments_count = comments_count + 1,
+                    last_activity_at = GREATEST(last_activity_at, NEW.created_at)
+                WHERE user_id = NEW.user_id;
+                RETURN NEW;
+            END IF;
+
+            UPDATE user_activity
+            SET comments_count = comments_count - 1,
+                reactions_on_comments = reactions_on_comments - (
+                    SELECT COUNT(*) FROM reactions
+                    WHERE reactable_type = 'comment' AND reactable_id = OLD.id
+                ) + (
+                    -- write-behind: несвёрнутые дельты в счётчик ещё не попали,
+                    -- а после удаления apply_reaction_deltas их пропустит
+                    SELECT COALESCE(SUM(d.likes_delta + d.loves_delta + d.dislikes_delta), 0)
+                    FROM reaction_deltas d
+                    WHERE d.reactable_type = 'comment' AND d.reactable_id = OLD.id
+                )
+            WHERE user_id = OLD.user_id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_user_activity_comment_insert ON comments")
         cursor.execute("""
-        DROP VIEW IF EXISTS user_activity_summary CASCADE;
+        CREATE TRIGGER trg_user_activity_comment_insert
+        AFTER INSERT ON comments
+        FOR EACH ROW
+        EXECUTE FUNCTION user_activity_on_comment();
         """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_user_activity_comment_delete ON comments")
+        cursor.execute("""
+        CREATE TRIGGER trg_user_activity_comment_delete
+        BEFORE DELETE ON comments
+        FOR EACH ROW
+        EXECUTE FUNCTION user_activity_on_comment();
+        """)
+
+        # -------------------------
+        # reactions: reactions_given + reactions_on_posts / _comments владельца
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION user_activity_on_reaction()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            v_delta INT;
+            v_row reactions;
+            v_owner_id INT;
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                UPDATE user_activity
+                SET last_activity_at = GREATEST(last_activity_at, NEW.created_at)
+                WHERE user_id = NEW.user_id;
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP = 'INSERT' THEN
+                v_delta := 1;
+                v_row := NEW;
+            ELSE
+                v_delta := -1;
+                v_row := OLD;
+            END IF;
+
+            UPDATE user_activity
+            SET reactions_given = reactions_given + v_delta,
+                last_activity_at = CASE
+                    WHEN v_delta > 0 THEN GREATEST(last_activity_at, v_row.created_at)
+                    ELSE last_activity_at
+                END
+            WHERE user_id = v_row.user_id;
+
+            -- write-behind: счётчики владельца (горячая строка) догонит aggregate_reactions
+            IF current_setting('reverence.reaction_write_behind', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+
+            IF v_row.reactable_type = 'post' THEN
+                SELECT author_id INTO v_owner_id FROM posts WHERE id = v_row.reactable_id;
+                UPDATE user_activity
+                SET reactions_on_posts = reactions_on_posts + v_delta
+                WHERE user_id = v_owner_id;
+            ELSE
+                SELECT user_id INTO v_owner_id FROM comments WHERE id = v_row.reactable_id;
+                UPDATE user_activity
+                SET reactions_on_comments = reactions_on_comments + v_delta
+                WHERE user_id = v_owner_id;
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_user_activity_reaction ON reactions")
+        cursor.execute("""
+        CREATE TRIGGER trg_user_activity_reaction
+        AFTER INSERT OR UPDATE OR DELETE ON reactions
+        FOR EACH ROW
+        EXECUTE FUNCTION user_activity_on_reaction();
+        """)
+
+        # -------------------------
+        # Backfill: пользователи, у которых ещё нет строки активности
+        # -------------------------
+        cursor.execute("""
+        INSERT INTO user_activity(
+            user_id, posts_count, comments_count, reactions_given,
+            reactions_on_posts, reactions_on_comments, last_activity_at
+        )
+        SELECT
+            u.id,
+            (SELECT COUNT(*) FROM posts p WHERE p.author_id = u.id),
+            (SELECT COUNT(*) FROM comments c WHERE c.user_id = u.id),
+            (SELECT COUNT(*) FROM reactions r WHERE r.user_id = u.id),
+            (SELECT COUNT(*) FROM reactions r
+             JOIN posts p ON r.reactable_type = 'post' AND p.id = r.reactable_id
+             WHERE p.author_id = u.id),
+            (SELECT COUNT(*) FROM reactions r
+             JOIN comments c ON r.reactable_type = 'comment' AND c.id = r.reactable_id
+             WHERE c.user_id = u.id),
+            GREATEST(
+                (SELECT MAX(created_at) FROM posts p WHERE p.author_id = u.id),
+                (SELECT MAX(created_at) FROM comments c WHERE c.user_id = u.id),
+                (SELECT MAX(created_at) FROM reactions r WHERE r.user_id = u.id)
+            )
+        FROM users u
+        WHERE NOT EXISTS (SELECT 1 FROM user_activity a WHERE a.user_id = u.id)
+        ON CONFLICT (user_id) DO NOTHING;
+        """)
+
+        # -------------------------
+        # user_activity_summary: JOIN по первичным ключам
+        # -------------------------
+        cursor.execute("DROP VIEW IF EXISTS user_activity_summary")
         cursor.execute("""
         CREATE VIEW user_activity_summary AS
-        SELECT 
+        SELECT
             u.id AS user_id,
             u.username,
             u.email,
-            
+
             COALESCE(pr.reputation, 0) AS reputation,
             COALESCE(pr.bio, '') AS bio,
             COALESCE(pr.avatar_url, '') AS avatar_url,
-            
-            COUNT(DISTINCT p.id) AS posts_count,
-            COUNT(DISTINCT c.id) AS comments_count,
-            (COUNT(DISTINCT p.id) + COUNT(DISTINCT c.id)) AS total_contributions,
-            
-            COUNT(DISTINCT r.id) AS reactions_given,
-            
-            COUNT(DISTINCT rp.id) AS reactions_on_posts,
-            
-            COUNT(DISTINCT rc.id) AS reactions_on_comments,
-            
-            (COUNT(DISTINCT rp.id) + COUNT(DISTINCT rc.id)) AS total_reactions_received,
-            
+
+            a.posts_count,
+            a.comments_count,
+            a.total_contributions,
+            a.reactions_given,
+            a.reactions_on_posts,
+            a.reactions_on_comments,
+            a.total_reactions_received,
+
             COALESCE(pr.created_at, u.created_at) AS profile_created_at,
-            GREATEST(
-                MAX(p.created_at),
-                MAX(c.created_at),
-                MAX(r.created_at)
-            ) AS last_activity_at
+            a.last_activity_at
         FROM users u
-        LEFT JOIN profile pr ON pr.user_id = u.id
-        LEFT JOIN posts p ON p.author_id = u.id
-        LEFT JOIN comments c ON c.user_id = u.id
-        LEFT JOIN reactions r ON r.user_id = u.id
-        LEFT JOIN reactions rp ON rp.reactable_type = 'post' 
-            AND rp.reactable_id IN (SELECT id FROM posts WHERE author_id = u.id)
-        LEFT JOIN reactions rc ON rc.reactable_type = 'comment' 
-            AND rc.reactable_id IN (SELECT id FROM comments WHERE user_id = u.id)
-        GROUP BY 
-            u.id, 
-            u.username, 
-            u.email, 
-            pr.reputation, 
-            pr.bio, 
-            pr.avatar_url, 
-            pr.created_at, 
-            u.created_at;
+        JOIN user_activity a ON a.user_id = u.id
+        LEFT JOIN profile pr ON pr.user_id = u.id;
         """)
     connection.commit()
-    print("✔ user_activity_summary view created")
+    print("✔ user_activity table + triggers ready")
 
 # =========================
 # user_activity_summary
 # =========================
 def get_user_activity(user_id):
-    
-    create_user_activity_view()
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT * FROM user_activity_summary 
-            WHERE user_id = %s
-        """, (user_id,))
-        return dict_fetchone(cursor)
+    return call_one("""
+        SELECT * FROM user_activity_summary 
+        WHERE user_id = %s
+    """, (user_id,))
 
 def get_top_users_by_reputation(limit=10):
-    
-    create_user_activity_view()
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT * FROM user_activity_summary 
-            ORDER BY reputation DESC 
-            LIMIT %s
-        """, (limit,))
-        return dict_fetchall(cursor)
+    # обход idx_profile_reputation: репутация хранится только в profile
+    return call_all("""
+        SELECT s.* FROM profile pr
+        JOIN user_activity_summary s ON s.user_id = pr.user_id
+        ORDER BY pr.reputation DESC, pr.user_id
+        LIMIT %s
+    """, (limit,))
 
 def get_most_active_users(limit=10):
-    
-    create_user_activity_view()
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT * FROM user_activity_summary 
-            ORDER BY total_contributions DESC 
-            LIMIT %s
-        """, (limit,))
-        return dict_fetchall(cursor)
+    return call_all("""
+        SELECT * FROM user_activity_summary 
+        ORDER BY total_contributions DESC, user_id 
+        LIMIT %s
+    """, (limit,))
 
-def get_all_users_activity():
-    
-    create_user_activity_view()
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT * FROM user_activity_summary 
-            ORDER BY reputation DESC
-        """)
-        return dict_fetchall(cursor)
\ No newline at end of file
+def get_all_users_activity(limit=50, offset=0):
+    return call_all("""
+        SELECT * FROM user_activity_summary 
+        ORDER BY reputation DESC, user_id
+        LIMIT %s OFFSET %s
+    """, (limit, offset))
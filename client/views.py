@@ -123,7 +123,20 @@ def most_active_users_page(request):
 # =========================
 # НОВОЕ: Все пользователи со статистикой
 # =========================
+USERS_PAGE_SIZE = 50
+
 def all_users_page(request):
-    """Список всех пользователей со статистикой"""
-    users = get_all_users_activity()
-    return render(request, "client/all_users.html", {"users": users})
\ No newline at end of file
+    """Список всех пользователей со статистикой (постранично)"""
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+
+    users = get_all_users_activity(limit=USERS_PAGE_SIZE + 1, offset=(page - 1) * USERS_PAGE_SIZE)
+    has_next = len(users) > USERS_PAGE_SIZE
+
+    return render(request, "users/all_users.html", {
+        "users": users[:USERS_PAGE_SIZE],
+        "page": page,
+        "has_next": has_next,
+    })
\ No newline at end of file
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+class Command(BaseCommand):
+    help = "Заполняет comments.path для комментариев, созданных до появления колонки"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Сколько строк обновлять в одной транзакции",
+        )
+
+    def handle(self, *args, batch_size, **options):
+        total = 0
+        with connection.cursor() as cursor:
+            # Корни: path = [id]
+            while True:
+                with transaction.atomic():
+                    cursor.execute("""
+                        UPDATE comments
+                        SET path = ARRAY[id]
+                        WHERE id IN (
+                            SELECT id FROM comments
+                            WHERE parent_id IS NULL AND path IS NULL
+                            LIMIT %s
+                        )
+                    """, [batch_size])
+                    updated = cursor.rowcount
+                total += updated
+                if updated < batch_size:
+                    break
+
+            # Ответы: уровень за уровнем, пока есть дети уже заполненных родителей
+            while True:
+                with transaction.atomic():
+                    cursor.execute("""
+                        UPDATE comments c
+                        SET path = p.path || c.id
+                        FROM comments p
+                        WHERE p.id = c.parent_id
+                          AND c.id IN (
+                              SELECT ch.id
+                              FROM comments ch
+                              JOIN comments pa ON pa.id = ch.parent_id
+                              WHERE ch.path IS NULL AND pa.path IS NOT NULL
+                              LIMIT %s
+                          )
+                    """, [batch_size])
+                    updated = cursor.rowcount
+                total += updated
+                if updated == 0:
+                    break
+                self.stdout.write(f"  {total} rows updated")
+
+            cursor.execute("SELECT COUNT(*) FROM comments WHERE path IS NULL")
+            missing = cursor.fetchone()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"✔ comment paths backfilled: {total} rows"))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"⚠️ {missing} comments still have no path"))
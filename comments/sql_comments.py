@@ -1,23 +1,13 @@
 from django.db import connection
+from db.access import PreparedStatement, call_all, call_one, call_value, fetch_all
+from posts.sql_posts import encode_cursor, decode_cursor
+from reactions.sql_reactions import get_user_reactions_on_comments
 
-# =========================
-# Utils
-# =========================
-
-def dict_fetchone(cursor):
-    row = cursor.fetchone()
-    if row is None:
-        return None
-    desc = cursor.description
-    return {desc[i].name: row[i] for i in range(len(row))}
-
-def dict_fetchall(cursor):
-    rows = cursor.fetchall()
-    desc = cursor.description
-    return [
-        {desc[i].name: row[i] for i in range(len(row))}
-        for row in rows
-    ]
+# Сколько комментариев показывается за один запрос
+COMMENT_ROOTS_PAGE_SIZE = 20
+COMMENT_REPLIES_PAGE_SIZE = 10
+COMMENT_THREAD_DEPTH = 3
+COMMENT_CHILDREN_LIMIT = 5
 
 # =========================
 # Init comments table + SQL logic
@@ -40,6 +30,70 @@ def init_comments_table():
         );
         """)
 
+        # -------------------------
+        # THREAD INDEXES: корни поста и ответы по (created_at, id)
+        # -------------------------
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_comments_post_roots
+        ON comments(post_id, created_at, id)
+        WHERE parent_id IS NULL
+        """)
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_comments_parent_created_id
+        ON comments(parent_id, created_at, id)
+        """)
+
+        # -------------------------
+        # MATERIALIZED PATH: id всех предков + свой id.
+        # Заполняется триггером при любой вставке, не только через add_comment_func
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION comment_path_on_insert()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.parent_id IS NULL THEN
+                NEW.path := ARRAY[NEW.id];
+            ELSE
+                -- у незаполненного родителя path NULL: строку догонит backfill ниже
+                SELECT CASE WHEN c.path IS NULL THEN NULL ELSE c.path || NEW.id END
+                INTO NEW.path
+                FROM comments c
+                WHERE c.id = NEW.parent_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_comment_path ON comments")
+        cursor.execute("""
+        CREATE TRIGGER trg_comment_path
+        BEFORE INSERT ON comments
+        FOR EACH ROW
+        EXECUTE FUNCTION comment_path_on_insert();
+        """)
+
+        # Backfill: строки, вставленные до триггера (пачками - manage.py backfill_comment_paths)
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM comments WHERE path IS NULL)")
+        if cursor.fetchone()[0]:
+            cursor.execute("""
+            WITH RECURSIVE paths AS (
+                SELECT c.id, ARRAY[c.id] AS path
+                FROM comments c
+                WHERE c.parent_id IS NULL
+
+                UNION ALL
+
+                SELECT c.id, p.path || c.id
+                FROM paths p
+                JOIN comments c ON c.parent_id = p.id
+            )
+            UPDATE comments c
+            SET path = p.path
+            FROM paths p
+            WHERE c.id = p.id
+              AND c.path IS NULL
+            """)
+
         # -------------------------
         # ADD COMMENT FUNCTION
         # -------------------------
@@ -60,6 +114,14 @@ def init_comments_table():
             created_at TIMESTAMP
         ) AS $$
         BEGIN
+            IF p_parent_id IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM comments c
+                WHERE c.id = p_parent_id AND c.post_id = p_post_id
+            ) THEN
+                RAISE EXCEPTION 'Parent comment % not found in post %', p_parent_id, p_post_id;
+            END IF;
+
+            -- path заполняет trg_comment_path
             RETURN QUERY
             INSERT INTO comments(post_id, user_id, content, parent_id, created_at)
             VALUES (p_post_id, p_user_id, p_content, p_parent_id, NOW())
@@ -82,13 +144,10 @@ def init_comments_table():
             parent_id INT, 
             created_at TIMESTAMP
         ) AS $$
-        BEGIN
-            RETURN QUERY
             SELECT comments.id, comments.post_id, comments.user_id, comments.content, comments.parent_id, comments.created_at
             FROM comments
             WHERE comments.id = p_id;
-        END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # -------------------------
@@ -106,40 +165,231 @@ def init_comments_table():
             created_at TIMESTAMP,
             level INT
         ) AS $$
+            -- весь тред в порядке показа: один range scan по idx_comments_post_path
+            SELECT
+                c.id,
+                c.post_id,
+                c.user_id,
+                c.content,
+                c.parent_id,
+                c.created_at,
+                cardinality(c.path) - 1 AS level
+            FROM comments c
+            WHERE c.post_id = p_post_id
+            ORDER BY c.path;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+        # -------------------------
+        # COMMENT SUBTREES: ветки от заданных корней с ограничением глубины
+        # и числа ответов на каждом уровне; ветка читается по materialized path
+        # -------------------------
+        cursor.execute("DROP FUNCTION IF EXISTS get_comment_subtrees_func(INT[], INT, INT)")
+        cursor.execute("""
+        CREATE FUNCTION get_comment_subtrees_func(
+            p_root_ids INT[],
+            p_depth INT,
+            p_children_limit INT
+        )
+        RETURNS TABLE(
+            id INT,
+            post_id INT,
+            user_id INT,
+            content TEXT,
+            parent_id INT,
+            created_at TIMESTAMP,
+            level INT,
+            reply_count INT,
+            likes_count INT,
+            loves_count INT,
+            dislikes_count INT,
+            sort_path INT[]
+        ) AS $$
+            WITH roots AS (
+                SELECT c.id, c.post_id, c.path, r.ord::INT AS root_ord
+                FROM unnest(p_root_ids) WITH ORDINALITY AS r(id, ord)
+                JOIN comments c ON c.id = r.id
+            ),
+            branch AS (
+                -- потомки корня: диапазон [path, path с последним id + 1)
+                -- по idx_comments_post_path, глубина - по длине path
+                SELECT
+                    c.id, c.parent_id, c.path,
+                    rt.root_ord,
+                    cardinality(rt.path) AS root_len,
+                    row_number() OVER (
+                        PARTITION BY c.parent_id ORDER BY c.created_at, c.id
+                    )::INT AS sibling_ord
+                FROM roots rt
+                JOIN comments c
+                  ON c.post_id = rt.post_id
+                 AND c.path > rt.path
+                 AND c.path < rt.path[1:cardinality(rt.path) - 1]
+                              || (rt.path[cardinality(rt.path)] + 1)
+                 AND cardinality(c.path) <= cardinality(rt.path) + p_depth
+            ),
+            shown AS (
+                -- узел виден, если он и все его предки в ветке - среди первых
+                -- p_children_limit ответов своего родителя
+                SELECT
+                    b.id, b.root_len,
+                    b.root_ord || array_agg(a.sibling_ord ORDER BY u.i) AS sort_path
+                FROM branch b
+                CROSS JOIN LATERAL unnest(b.path[b.root_len + 1:]) WITH ORDINALITY AS u(id, i)
+                JOIN branch a ON a.id = u.id
+                GROUP BY b.id, b.root_len, b.root_ord
+                HAVING max(a.sibling_ord) <= p_children_limit
+            )
+            SELECT
+                c.id, c.post_id, c.user_id, c.content, c.parent_id, c.created_at,
+                0 AS level,
+                c.reply_count,
+                c.likes_count,
+                c.loves_count,
+                c.dislikes_count,
+                ARRAY[rt.root_ord] AS sort_path
+            FROM roots rt
+            JOIN comments c ON c.id = rt.id
+
+            UNION ALL
+
+            SELECT
+                c.id, c.post_id, c.user_id, c.content, c.parent_id, c.created_at,
+                cardinality(c.path) - s.root_len,
+                c.reply_count,
+                c.likes_count,
+                c.loves_count,
+                c.dislikes_count,
+                s.sort_path
+            FROM shown s
+            JOIN comments c ON c.id = s.id
+            ORDER BY sort_path;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+        # -------------------------
+        # ROOT THREADS OF A POST (keyset по (created_at, id))
+        # Лишний (p_limit + 1)-й корень возвращается без веток: признак следующей страницы
+        # -------------------------
+        cursor.execute("DROP FUNCTION IF EXISTS get_root_comments_func(INT, INT, INT, INT, TIMESTAMP, INT)")
+        cursor.execute("""
+        CREATE FUNCTION get_root_comments_func(
+            p_post_id INT,
+            p_limit INT,
+            p_depth INT,
+            p_children_limit INT,
+            p_cursor_created_at TIMESTAMP DEFAULT NULL,
+            p_cursor_id INT DEFAULT NULL
+        )
+        RETURNS TABLE(
+            id INT,
+            post_id INT,
+            user_id INT,
+            content TEXT,
+            parent_id INT,
+            created_at TIMESTAMP,
+            level INT,
+            reply_count INT,
+            likes_count INT,
+            loves_count INT,
+            dislikes_count INT,
+            sort_path INT[]
+        ) AS $$
+        DECLARE
+            v_ids INT[];
         BEGIN
+            IF p_cursor_id IS NULL THEN
+                v_ids := ARRAY(
+                    SELECT c.id FROM comments c
+                    WHERE c.post_id = p_post_id AND c.parent_id IS NULL
+                    ORDER BY c.created_at, c.id
+                    LIMIT p_limit + 1
+                );
+            ELSE
+                v_ids := ARRAY(
+                    SELECT c.id FROM comments c
+                    WHERE c.post_id = p_post_id AND c.parent_id IS NULL
+                      AND (c.created_at, c.id) > (p_cursor_created_at, p_cursor_id)
+                    ORDER BY c.created_at, c.id
+                    LIMIT p_limit + 1
+                );
+            END IF;
+
             RETURN QUERY
-            WITH RECURSIVE comments_tree AS (
-                SELECT
-                    c.id,
-                    c.post_id,
-                    c.user_id,
-                    c.content,
-                    c.parent_id,
-                    c.created_at,
-                    0 AS level,
-                    ARRAY[c.id] AS path
+            SELECT * FROM get_comment_subtrees_func(v_ids[1:p_limit], p_depth, p_children_limit);
+
+            IF cardinality(v_ids) > p_limit THEN
+                RETURN QUERY
+                SELECT c.id, c.post_id, c.user_id, c.content, c.parent_id, c.created_at,
+                       0, c.reply_count, c.likes_count, c.loves_count, c.dislikes_count,
+                       ARRAY[p_limit + 1]
                 FROM comments c
-                WHERE c.post_id = p_post_id AND c.parent_id IS NULL
+                WHERE c.id = v_ids[p_limit + 1];
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql STABLE;
+        """)
 
-                UNION ALL
+        # -------------------------
+        # MORE REPLIES OF A COMMENT (keyset по (created_at, id))
+        # -------------------------
+        cursor.execute("DROP FUNCTION IF EXISTS get_comment_replies_func(INT, INT, INT, INT, TIMESTAMP, INT)")
+        cursor.execute("""
+        CREATE FUNCTION get_comment_replies_func(
+            p_parent_id INT,
+            p_limit INT,
+            p_depth INT,
+            p_children_limit INT,
+            p_cursor_created_at TIMESTAMP DEFAULT NULL,
+            p_cursor_id INT DEFAULT NULL
+        )
+        RETURNS TABLE(
+            id INT,
+            post_id INT,
+            user_id INT,
+            content TEXT,
+            parent_id INT,
+            created_at TIMESTAMP,
+            level INT,
+            reply_count INT,
+            likes_count INT,
+            loves_count INT,
+            dislikes_count INT,
+            sort_path INT[]
+        ) AS $$
+        DECLARE
+            v_ids INT[];
+        BEGIN
+            IF p_cursor_id IS NULL THEN
+                v_ids := ARRAY(
+                    SELECT c.id FROM comments c
+                    WHERE c.parent_id = p_parent_id
+                    ORDER BY c.created_at, c.id
+                    LIMIT p_limit + 1
+                );
+            ELSE
+                v_ids := ARRAY(
+                    SELECT c.id FROM comments c
+                    WHERE c.parent_id = p_parent_id
+                      AND (c.created_at, c.id) > (p_cursor_created_at, p_cursor_id)
+                    ORDER BY c.created_at, c.id
+                    LIMIT p_limit + 1
+                );
+            END IF;
 
-                SELECT
-                    c.id,
-                    c.post_id,
-                    c.user_id,
-                    c.content,
-                    c.parent_id,
-                    c.created_at,
-                    ct.level + 1 AS level,
-                    ct.path || c.id
+            RETURN QUERY
+            SELECT * FROM get_comment_subtrees_func(v_ids[1:p_limit], p_depth, p_children_limit);
+
+            IF cardinality(v_ids) > p_limit THEN
+                RETURN QUERY
+                SELECT c.id, c.post_id, c.user_id, c.content, c.parent_id, c.created_at,
+                       0, c.reply_count, c.likes_count, c.loves_count, c.dislikes_count,
+                       ARRAY[p_limit + 1]
                 FROM comments c
-                INNER JOIN comments_tree ct ON c.parent_id = ct.id
-            )
-            SELECT ct.id, ct.post_id, ct.user_id, ct.content, ct.parent_id, ct.created_at, ct.level
-            FROM comments_tree ct
-            ORDER BY ct.path;
+                WHERE c.id = v_ids[p_limit + 1];
+            END IF;
         END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE plpgsql STABLE;
         """)
 
         # -------------------------
@@ -189,40 +439,265 @@ def init_comments_table():
         cursor.execute("""
         CREATE FUNCTION count_comments_by_post_func(p_post_id INT)
         RETURNS INT AS $$
-        DECLARE total INT;
+            -- счётчик ведут триггеры post_stats
+            SELECT COALESCE(
+                (SELECT s.comment_count FROM post_stats s WHERE s.post_id = p_post_id), 0
+            );
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+    print("✔ comments table + SQL functions initialized")
+
+
+# =========================
+# Comment counters (trigger-maintained)
+# =========================
+def init_comment_counters():
+    """
+    Счётчики ответов и реакций прямо в строке comments
+    (колонки - db/init/013_comment_counters.sql).
+    Нужна таблица reactions, поэтому шаг идёт после init_reactions_table.
+    """
+    with connection.cursor() as cursor:
+        # колонки добавляет версионный файл раньше шага: пока триггеров нет,
+        # счётчики никто не вёл - пересчитываем после их создания
+        cursor.execute("""
+        SELECT 1 FROM pg_trigger
+        WHERE tgrelid = 'comments'::regclass AND tgname = 'trg_comment_counters_reply'
+        """)
+        needs_backfill = cursor.fetchone() is None
+
+        # -------------------------
+        # comments: reply_count родителя
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION comment_counters_on_reply()
+        RETURNS TRIGGER AS $$
         BEGIN
-            SELECT COUNT(*) INTO total FROM comments WHERE post_id = p_post_id;
-            RETURN total;
+            IF TG_OP = 'INSERT' AND NEW.parent_id IS NOT NULL THEN
+                UPDATE comments SET reply_count = reply_count + 1
+                WHERE id = NEW.parent_id;
+            ELSIF TG_OP = 'DELETE' AND OLD.parent_id IS NOT NULL THEN
+                -- при каскадном удалении родителя строки уже нет, UPDATE ничего не тронет
+                UPDATE comments SET reply_count = reply_count - 1
+                WHERE id = OLD.parent_id;
+            END IF;
+            RETURN NULL;
         END;
         $$ LANGUAGE plpgsql;
         """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_comment_counters_reply ON comments")
+        cursor.execute("""
+        CREATE TRIGGER trg_comment_counters_reply
+        AFTER INSERT OR DELETE ON comments
+        FOR EACH ROW
+        EXECUTE FUNCTION comment_counters_on_reply();
+        """)
 
-    print("✔ comments table + SQL functions initialized")
+        # -------------------------
+        # reactions: likes/loves/dislikes комментария
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION comment_counters_on_reaction()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            v_comment_id INT;
+            v_old_type VARCHAR;
+            v_new_type VARCHAR;
+        BEGIN
+            IF COALESCE(NEW.reactable_type, OLD.reactable_type) <> 'comment' THEN
+                RETURN NULL;
+            END IF;
+
+            IF current_setting('reverence.reaction_write_behind', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+
+            v_comment_id := COALESCE(NEW.reactable_id, OLD.reactable_id);
+            IF TG_OP <> 'INSERT' THEN
+                v_old_type := OLD.reaction_type;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                v_new_type := NEW.reaction_type;
+            END IF;
+
+            IF v_old_type IS NOT DISTINCT FROM v_new_type THEN
+                RETURN NULL;
+            END IF;
+
+            UPDATE comments
+            SET likes_count = likes_count
+                    + (v_new_type IS NOT DISTINCT FROM 'like')::INT
+                    - (v_old_type IS NOT DISTINCT FROM 'like')::INT,
+                loves_count = loves_count
+                    + (v_new_type IS NOT DISTINCT FROM 'love')::INT
+                    - (v_old_type IS NOT DISTINCT FROM 'love')::INT,
+                dislikes_count = dislikes_count
+                    + (v_new_type IS NOT DISTINCT FROM 'dislike')::INT
+                    - (v_old_type IS NOT DISTINCT FROM 'dislike')::INT
+            WHERE id = v_comment_id;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_comment_counters_reaction ON reactions")
+        cursor.execute("""
+        CREATE TRIGGER trg_comment_counters_reaction
+        AFTER INSERT OR UPDATE OR DELETE ON reactions
+        FOR EACH ROW
+        EXECUTE FUNCTION comment_counters_on_reaction();
+        """)
+
+        # -------------------------
+        # Расхождения счётчиков с реальными данными (manage.py check_counters)
+        # -------------------------
+        cursor.execute("DROP FUNCTION IF EXISTS comment_counter_drift()")
+        cursor.execute("""
+        CREATE FUNCTION comment_counter_drift()
+        RETURNS TABLE(
+            comment_id INT,
+            reply_count INT,
+            likes_count INT,
+            loves_count INT,
+            dislikes_count INT
+        ) AS $$
+        WITH replies AS (
+            SELECT parent_id AS comment_id, COUNT(*)::INT AS reply_count
+            FROM comments
+            WHERE parent_id IS NOT NULL
+            GROUP BY parent_id
+        ),
+        reacts AS (
+            SELECT
+                reactable_id AS comment_id,
+                COUNT(*) FILTER (WHERE reaction_type = 'like')::INT AS likes_count,
+                COUNT(*) FILTER (WHERE reaction_type = 'love')::INT AS loves_count,
+                COUNT(*) FILTER (WHERE reaction_type = 'dislike')::INT AS dislikes_count
+            FROM reactions
+            WHERE reactable_type = 'comment'
+            GROUP BY reactable_id
+        )
+        SELECT
+            c.id AS comment_id,
+            COALESCE(rp.reply_count, 0) AS reply_count,
+            COALESCE(rc.likes_count, 0) AS likes_count,
+            COALESCE(rc.loves_count, 0) AS loves_count,
+            COALESCE(rc.dislikes_count, 0) AS dislikes_count
+        FROM comments c
+        LEFT JOIN replies rp ON rp.comment_id = c.id
+        LEFT JOIN reacts rc ON rc.comment_id = c.id
+        WHERE (c.reply_count, c.likes_count, c.loves_count, c.dislikes_count)
+            IS DISTINCT FROM (
+                COALESCE(rp.reply_count, 0),
+                COALESCE(rc.likes_count, 0),
+                COALESCE(rc.loves_count, 0),
+                COALESCE(rc.dislikes_count, 0)
+            )
+        $$ LANGUAGE sql STABLE;
+        """)
+
+        if needs_backfill:
+            repair_comment_counters(cursor)
+
+    print("✔ comment counters + triggers ready")
+
+
+def repair_comment_counters(cursor):
+    """Переписывает счётчики комментариев из comment_counter_drift(), возвращает число строк"""
+    cursor.execute("""
+    UPDATE comments c
+    SET reply_count = d.reply_count,
+        likes_count = d.likes_count,
+        loves_count = d.loves_count,
+        dislikes_count = d.dislikes_count
+    FROM comment_counter_drift() d
+    WHERE c.id = d.comment_id
+    """)
+    return cursor.rowcount
 
 # =========================
 # Python wrappers
 # =========================
 
+GET_COMMENTS_TREE = PreparedStatement(
+    "get_comments_tree_stmt", "SELECT * FROM get_comments_tree_func(%s)"
+)
+
+
 def add_comment(post_id, user_id, content, parent_id=None):
     """Добавить комментарий к посту или ответ на комментарий"""
+    return call_one(
+        "SELECT * FROM add_comment_func(%s, %s, %s, %s)",
+        (post_id, user_id, content, parent_id)
+    )
+
+
+def get_comment(comment_id):
+    return call_one("SELECT * FROM get_comment_func(%s)", (comment_id,))
+
+
+def build_comment_page(rows, limit, viewer_reactions=None):
+    """
+    Строки в порядке sort_path -> (корни с children, next_cursor).
+    Для каждого комментария считаются more_replies и replies_cursor
+    для кнопки "load more replies", viewer_reaction - из viewer_reactions.
+    """
+    viewer_reactions = viewer_reactions or {}
+    nodes = {}
+    roots = []
+    for row in rows:
+        node = dict(row, children=[], viewer_reaction=viewer_reactions.get(row["id"]))
+        nodes[node["id"]] = node
+        if node["level"] == 0:
+            roots.append(node)
+        else:
+            nodes[node["parent_id"]]["children"].append(node)
+
+    next_cursor = None
+    if len(roots) > limit:
+        roots = roots[:limit]
+        next_cursor = encode_cursor(roots[-1]["created_at"], roots[-1]["id"])
+
+    for node in nodes.values():
+        children = node["children"]
+        node["more_replies"] = node["reply_count"] - len(children)
+        node["replies_cursor"] = (
+            encode_cursor(children[-1]["created_at"], children[-1]["id"]) if children else None
+        )
+    return roots, next_cursor
+
+
+def get_comment_threads(post_id, limit=COMMENT_ROOTS_PAGE_SIZE, cursor_token=None, viewer_id=None):
+    """Страница корневых веток поста: (comments, next_cursor)"""
+    created_at, comment_id = decode_cursor(cursor_token)
     with connection.cursor() as cursor:
         cursor.execute(
-            "SELECT * FROM add_comment_func(%s, %s, %s, %s)",
-            (post_id, user_id, content, parent_id)
+            "SELECT * FROM get_root_comments_func(%s, %s, %s, %s, %s, %s)",
+            (post_id, limit, COMMENT_THREAD_DEPTH, COMMENT_CHILDREN_LIMIT, created_at, comment_id)
         )
-        return dict_fetchone(cursor)
+        rows = fetch_all(cursor)
+    # реакции зрителя на всю страницу - один запрос по id
+    viewer_reactions = get_user_reactions_on_comments(viewer_id, [row["id"] for row in rows])
+    return build_comment_page(rows, limit, viewer_reactions)
 
 
-def get_comment(comment_id):
+def get_comment_replies(parent_id, limit=COMMENT_REPLIES_PAGE_SIZE, cursor_token=None, viewer_id=None):
+    """Следующие ответы на комментарий: (replies, next_cursor)"""
+    created_at, comment_id = decode_cursor(cursor_token)
     with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_comment_func(%s)", (comment_id,))
-        return dict_fetchone(cursor)
+        cursor.execute(
+            "SELECT * FROM get_comment_replies_func(%s, %s, %s, %s, %s, %s)",
+            (parent_id, limit, COMMENT_THREAD_DEPTH, COMMENT_CHILDREN_LIMIT, created_at, comment_id)
+        )
+        rows = fetch_all(cursor)
+    # реакции зрителя на всю страницу - один запрос по id
+    viewer_reactions = get_user_reactions_on_comments(viewer_id, [row["id"] for row in rows])
+    return build_comment_page(rows, limit, viewer_reactions)
 
 
 def get_comments_tree(post_id):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_comments_tree_func(%s)", (post_id,))
-        return dict_fetchall(cursor)
+    return call_all(GET_COMMENTS_TREE, (post_id,))
 
 
 def delete_comment(comment_id, user_id):
@@ -236,7 +711,5 @@ def delete_comment(comment_id, user_id):
 
 
 def count_comments_by_post(post_id):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT count_comments_by_post_func(%s)", (post_id,))
-        return cursor.fetchone()[0]
+    return call_value("SELECT count_comments_by_post_func(%s)", (post_id,))
     
@@ -10,6 +10,12 @@ urlpatterns = [
     # Добавить ответ на комментарий (с parent_id)
     path('post/<int:post_id>/comment/<int:parent_id>/', views.add_comment_view, name='add-reply'),
     
+    # Следующая страница корневых веток поста
+    path('post/<int:post_id>/comments/', views.more_comments_view, name='more-comments'),
+
+    # Следующие ответы на комментарий
+    path('comment/<int:comment_id>/replies/', views.comment_replies_view, name='comment-replies'),
+
     # Удалить комментарий
     path('comment/<int:comment_id>/delete/<int:post_id>/', views.comment_delete_view, name='delete-comment'),
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from posts import sql_posts
 from comments import sql_comments
 from users.views import jwt_required
@@ -69,6 +70,36 @@ def post_detail_view(request, post_id):
     return render(request, "posts/post_detail.html", template_context)
 
 
+@jwt_required
+def more_comments_view(request, post_id):
+    """HTML-фрагмент со следующей страницей корневых веток"""
+    comments, next_cursor = sql_comments.get_comment_threads(
+        post_id, cursor_token=request.GET.get("cursor"),
+        viewer_id=request.user_id,
+    )
+    return render(request, "comments/comment_page.html", {
+        "comments": comments,
+        "next_cursor": next_cursor,
+        "more_url": reverse('comments:more-comments', args=[post_id]),
+        "current_user_id": request.user_id,
+    })
+
+
+@jwt_required
+def comment_replies_view(request, comment_id):
+    """HTML-фрагмент со следующими ответами на комментарий"""
+    replies, next_cursor = sql_comments.get_comment_replies(
+        comment_id, cursor_token=request.GET.get("cursor"),
+        viewer_id=request.user_id,
+    )
+    return render(request, "comments/comment_page.html", {
+        "comments": replies,
+        "next_cursor": next_cursor,
+        "more_url": reverse('comments:comment-replies', args=[comment_id]),
+        "current_user_id": request.user_id,
+    })
+
+
 @jwt_required
 @require_http_methods(["POST"])
 def comment_delete_view(request, comment_id, post_id):
@@ -0,0 +1,207 @@
+import re
+import weakref
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+# =========================
+# Фабрики строк
+# =========================
+# Фабрика получает кортеж имён колонок и возвращает build(row).
+# Сборщики кэшируются по (фабрика, имена): description разбирается один раз
+# на форму результата, а не на каждую ячейку.
+
+
+def dict_row(columns):
+    """row -> dict (по умолчанию: шаблоны и views правят строки на месте)"""
+    def build(row, _columns=columns, _dict=dict, _zip=zip):
+        return _dict(_zip(_columns, row))
+    return build
+
+
+def tuple_row(columns):
+    """Строка как есть: psycopg2 уже отдаёт tuple"""
+    return None
+
+
+def namedtuple_row(columns):
+    """row -> namedtuple: доступ row.name, без словаря на строку"""
+    return namedtuple("Row", columns, rename=True)._make
+
+
+def slots_row(columns):
+    """row -> объект с __slots__: атрибуты для шаблонов, память как у кортежа"""
+    fields = namedtuple("Row", columns, rename=True)._fields
+    args = ", ".join(fields)
+    namespace = {}
+    exec(
+        f"def __init__(self, {args}):\n"
+        + "".join(f"    self.{name} = {name}\n" for name in fields),
+        namespace,
+    )
+    cls = type("Row", (), {
+        "__slots__": fields,
+        "__init__": namespace["__init__"],
+        "__repr__": lambda self: f"Row({', '.join(f'{f}={getattr(self, f)!r}' for f in fields)})",
+    })
+    return lambda row: cls(*row)
+
+
+@lru_cache(maxsize=256)
+def _builder(row_factory, columns):
+    return row_factory(columns)
+
+
+def _columns(cursor):
+    return tuple(column.name for column in cursor.description)
+
+
+# =========================
+# Чтение из курсора
+# =========================
+def fetch_one(cursor, row_factory=dict_row):
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    build = _builder(row_factory, _columns(cursor))
+    return row if build is None else build(row)
+
+
+def fetch_all(cursor, row_factory=dict_row):
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+    build = _builder(row_factory, _columns(cursor))
+    return rows if build is None else list(map(build, rows))
+
+
+def iter_rows(cursor, row_factory=dict_row, chunk_size=500):
+    """Ленивая выдача порциями fetchmany: в памяти не больше chunk_size строк"""
+    build = False
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        if build is False:
+            build = _builder(row_factory, _columns(cursor))
+        yield from rows if build is None else map(build, rows)
+
+
+# =========================
+# Подготовленные выражения
+# =========================
+# Горячие вызовы PREPARE-ятся один раз на физическом соединении, дальше идут
+# EXECUTE: Postgres не разбирает и не планирует внешний SELECT на каждый запрос.
+# Реестр: raw psycopg2-соединение -> set(имён) или None, если состояние сервера
+# неизвестно (после ошибки устаревшего плана) и нужен DEALLOCATE ALL
+_prepared = weakref.WeakKeyDictionary()
+
+# 0A000 - функцию пересоздали с другим типом результата,
+# 26000 - выражения на сервере нет (DISCARD ALL, сброс сессии пулером)
+_STALE_PLAN_CODES = ("0A000", "26000")
+
+
+class PreparedStatement:
+    """SQL с %s-параметрами под именем для PREPARE"""
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        count = 0
+
+        def number(match):
+            nonlocal count
+            if match.group() == "%%":
+                return "%"
+            count += 1
+            return f"${count}"
+
+        self.prepare_sql = f"PREPARE {name} AS {re.sub('%%|%s', number, sql)}"
+        self.execute_sql = f"EXECUTE {name}" + (f"({', '.join(['%s'] * count)})" if count else "")
+
+    def __repr__(self):
+        return f"PreparedStatement({self.name!r})"
+
+
+def execute(cursor, sql, params=None):
+    """cursor.execute для строки SQL или PreparedStatement"""
+    if not isinstance(sql, PreparedStatement):
+        cursor.execute(sql, params)
+        return
+    if not settings.DB_PREPARED_STATEMENTS:
+        cursor.execute(sql.sql, params)
+        return
+    try:
+        _execute_prepared(cursor, sql, params)
+    except DatabaseError as exc:
+        if getattr(exc.__cause__, "pgcode", None) not in _STALE_PLAN_CODES:
+            raise
+        _prepared[cursor.db.connection] = None
+        if cursor.db.in_atomic_block:
+            # транзакция уже прервана: повторит следующий запрос
+            raise
+        _execute_prepared(cursor, sql, params)
+
+
+def _execute_prepared(cursor, statement, params):
+    raw = cursor.db.connection
+    names = _prepared.get(raw)
+    if names is None:
+        if raw in _prepared:
+            cursor.execute("DEALLOCATE ALL")
+        names = _prepared[raw] = set()
+    if statement.name not in names:
+        cursor.execute(statement.prepare_sql)
+        names.add(statement.name)
+    cursor.execute(statement.execute_sql, params)
+
+
+def reset_prepared(db=connection):
+    """DEALLOCATE ALL на текущем соединении (после DDL в этом же процессе)"""
+    if db.connection is None:
+        return
+    with db.cursor() as cursor:
+        cursor.execute("DEALLOCATE ALL")
+    _prepared.pop(db.connection, None)
+
+
+# =========================
+# Вызов SQL-функций
+# =========================
+# sql - строка или PreparedStatement
+def call_one(sql, params=None, row_factory=dict_row):
+    """SELECT * FROM xyz_func(...) -> одна строка или None"""
+    with connection.cursor() as cursor:
+        execute(cursor, sql, params)
+        return fetch_one(cursor, row_factory)
+
+
+def call_all(sql, params=None, row_factory=dict_row):
+    """SELECT * FROM xyz_func(...) -> список строк"""
+    with connection.cursor() as cursor:
+        execute(cursor, sql, params)
+        return fetch_all(cursor, row_factory)
+
+
+def call_value(sql, params=None):
+    """Первая колонка первой строки (SELECT xyz_func(...))"""
+    with connection.cursor() as cursor:
+        execute(cursor, sql, params)
+        row = cursor.fetchone()
+        return None if row is None else row[0]
+
+
+def stream(sql, params=None, row_factory=dict_row, chunk_size=500):
+    """
+    Серверный курсор: строки приходят порциями chunk_size, результат
+    целиком не материализуется ни в Postgres-клиенте, ни в Python.
+    Генератор нужно дочитать (или закрыть) до конца запроса.
+    DECLARE CURSOR не принимает EXECUTE: PreparedStatement идёт текстом.
+    """
+    if isinstance(sql, PreparedStatement):
+        sql = sql.sql
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        yield from iter_rows(cursor, row_factory, chunk_size)
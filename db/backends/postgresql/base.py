@@ -0,0 +1,49 @@
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.utils.asyncio import async_unsafe
+
+from db.pool import get_pool
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    """
+    Стандартный postgresql-бэкенд плюс:
+    - OPTIONS['session_settings']: GUC на сессию через set_config - один раз
+      на физическое соединение (вместо libpq options, которые режет pgbouncer);
+    - OPTIONS['pool']: соединения берутся из пула процесса (db/pool.py),
+      close() возвращает их в пул вместо закрытия.
+    """
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        conn_params.pop("session_settings", None)
+        return conn_params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool_options = self.settings_dict["OPTIONS"].get("pool")
+        if not pool_options:
+            return self._open_connection(conn_params)
+        pool = get_pool(self.alias, lambda: self._open_connection(conn_params), **pool_options)
+        return pool.getconn()
+
+    def _open_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        session_settings = self.settings_dict["OPTIONS"].get("session_settings")
+        if session_settings:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT " + ", ".join(["set_config(%s, %s, false)"] * len(session_settings)),
+                    [value for item in session_settings.items() for value in item],
+                )
+            connection.commit()
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if not self.settings_dict["OPTIONS"].get("pool"):
+            return super()._close()
+        pool = get_pool(self.alias, None)
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
@@ -0,0 +1,26 @@
+CREATE TABLE IF NOT EXISTS post_stats (
+    post_id INT PRIMARY KEY
+        REFERENCES posts(id)
+        ON DELETE CASCADE,
+
+    comment_count INT NOT NULL DEFAULT 0,
+    tag_count INT NOT NULL DEFAULT 0,
+    tag_list TEXT NOT NULL DEFAULT 'No tags',
+
+    likes_count INT NOT NULL DEFAULT 0,
+    loves_count INT NOT NULL DEFAULT 0,
+    dislikes_count INT NOT NULL DEFAULT 0,
+
+    total_reactions INT GENERATED ALWAYS AS
+        (likes_count + loves_count + dislikes_count) STORED,
+    engagement_score INT GENERATED ALWAYS AS
+        (likes_count + 2 * loves_count - dislikes_count) STORED,
+
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_post_stats_engagement
+ON post_stats(engagement_score DESC, post_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_post_stats_total_reactions
+ON post_stats(total_reactions DESC, post_id DESC);
@@ -0,0 +1,24 @@
+CREATE TABLE IF NOT EXISTS user_activity (
+    user_id INT PRIMARY KEY
+        REFERENCES users(id)
+        ON DELETE CASCADE,
+
+    posts_count INT NOT NULL DEFAULT 0,
+    comments_count INT NOT NULL DEFAULT 0,
+    reactions_given INT NOT NULL DEFAULT 0,
+    reactions_on_posts INT NOT NULL DEFAULT 0,
+    reactions_on_comments INT NOT NULL DEFAULT 0,
+
+    total_contributions INT GENERATED ALWAYS AS
+        (posts_count + comments_count) STORED,
+    total_reactions_received INT GENERATED ALWAYS AS
+        (reactions_on_posts + reactions_on_comments) STORED,
+
+    last_activity_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_activity_contributions
+ON user_activity(total_contributions DESC, user_id);
+
+CREATE INDEX IF NOT EXISTS idx_profile_reputation
+ON profile(reputation DESC, user_id);
@@ -0,0 +1,10 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_posts_title_trgm
+    ON posts USING GIN (title gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_tags_name_trgm
+    ON tags USING GIN (name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm
+    ON users USING GIN (username gin_trgm_ops);
@@ -0,0 +1,4 @@
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS path INT[];
+
+CREATE INDEX IF NOT EXISTS idx_comments_post_path
+    ON comments(post_id, path);
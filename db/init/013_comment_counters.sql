@@ -0,0 +1,5 @@
+ALTER TABLE comments
+    ADD COLUMN IF NOT EXISTS reply_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS likes_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS loves_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS dislikes_count INT NOT NULL DEFAULT 0;
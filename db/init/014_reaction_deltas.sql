@@ -0,0 +1,15 @@
+-- Журнал дельт реакций для write-behind (REACTIONS_WRITE_BEHIND=1),
+-- сворачивается manage.py aggregate_reactions
+CREATE TABLE IF NOT EXISTS reaction_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    reactable_type VARCHAR(10) NOT NULL,
+    reactable_id INT NOT NULL,
+    reactor_id INT NOT NULL,
+    likes_delta SMALLINT NOT NULL DEFAULT 0,
+    loves_delta SMALLINT NOT NULL DEFAULT 0,
+    dislikes_delta SMALLINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_reaction_deltas_target
+ON reaction_deltas(reactable_type, reactable_id);
@@ -0,0 +1,19 @@
+-- Горячие посты: hot_score пересчитывает manage.py refresh_trending
+CREATE TABLE IF NOT EXISTS trending_posts (
+    post_id INT PRIMARY KEY
+        REFERENCES posts(id)
+        ON DELETE CASCADE,
+    hot_score DOUBLE PRECISION NOT NULL,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_trending_posts_hot
+ON trending_posts(hot_score DESC, post_id DESC);
+
+CREATE TABLE IF NOT EXISTS trending_refresh_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    last_refresh_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_post_stats_updated_at
+ON post_stats(updated_at);
@@ -0,0 +1,4 @@
+-- Триггеры активности обновляют строку пользователя, пока каскад его удаляет:
+-- проверку FK откладываем до COMMIT, к тому времени строка удалена каскадом
+ALTER TABLE user_activity
+    ALTER CONSTRAINT user_activity_user_id_fkey DEFERRABLE INITIALLY DEFERRED;
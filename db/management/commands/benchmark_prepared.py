@@ -0,0 +1,66 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from comments.sql_comments import get_comments_tree
+from db.access import reset_prepared
+from posts.sql_posts import get_all_posts, get_post_with_tags
+from reactions.sql_reactions import get_user_reaction_on_post
+from users.sql_users import user_exists
+
+
+class Command(BaseCommand):
+    help = (
+        "Горячие вызовы db.access.PreparedStatement: текстовый SQL против "
+        "PREPARE/EXECUTE на одном соединении (мкс на вызов)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=2000)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, calls, runs, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, author_id FROM posts ORDER BY id DESC LIMIT 1")
+            row = cursor.fetchone()
+        if row is None:
+            self.stdout.write(self.style.WARNING("⚠️ posts table is empty, nothing to benchmark"))
+            return
+        post_id, user_id = row
+
+        cases = (
+            ("get_all_posts", lambda: get_all_posts(20)),
+            ("get_post_with_tags", lambda: get_post_with_tags(post_id)),
+            ("get_comments_tree", lambda: get_comments_tree(post_id)),
+            ("get_user_reaction_on_post", lambda: get_user_reaction_on_post(user_id, post_id)),
+            ("user_exists", lambda: user_exists(user_id)),
+        )
+
+        self.stdout.write(f"post {post_id}, {calls} calls, median of {runs} runs")
+        self.stdout.write(f"{'call':<28} {'text us':>9} {'prepared us':>12} {'speedup':>8}")
+        total = {False: 0.0, True: 0.0}
+        for name, call in cases:
+            per_call = {}
+            for prepared in (False, True):
+                with override_settings(DB_PREPARED_STATEMENTS=prepared):
+                    reset_prepared()
+                    call()  # прогрев: PREPARE и кэш сборщиков строк
+                    timings = []
+                    for _ in range(runs):
+                        started = time.perf_counter()
+                        for _ in range(calls):
+                            call()
+                        timings.append(time.perf_counter() - started)
+                per_call[prepared] = statistics.median(timings) / calls
+                total[prepared] += per_call[prepared]
+            self.stdout.write(
+                f"{name:<28} {per_call[False] * 1e6:>9.1f} {per_call[True] * 1e6:>12.1f} "
+                f"{per_call[False] / per_call[True]:>7.2f}x"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ prepared statements {total[False] / total[True]:.2f}x faster on the hot path"
+        ))
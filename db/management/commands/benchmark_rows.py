@@ -0,0 +1,107 @@
+import gc
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from db.access import dict_row, fetch_all, namedtuple_row, slots_row, tuple_row
+
+# форма строки как у posts_with_stats
+SAMPLE_SQL = """
+SELECT
+    i AS id,
+    'post title ' || i AS title,
+    repeat('x', 200) AS content,
+    i %% 1000 + 1 AS author_id,
+    now() - i * interval '1 minute' AS created_at,
+    i %% 17 AS comment_count,
+    i %% 5 AS tag_count,
+    'django, postgres' AS tag_list,
+    i %% 11 AS likes_count,
+    i %% 7 AS loves_count,
+    i %% 3 AS dislikes_count,
+    i %% 11 + i %% 7 + i %% 3 AS total_reactions,
+    i %% 11 + 2 * (i %% 7) - i %% 3 AS engagement_score
+FROM generate_series(1, %s) AS i
+"""
+
+
+def legacy_dict_fetchall(cursor):
+    """Прежний dict_fetchall из sql_*.py: description на каждую ячейку"""
+    rows = cursor.fetchall()
+    desc = cursor.description
+    return [{desc[i].name: row[i] for i in range(len(row))} for row in rows]
+
+
+class ReplayCursor:
+    """Уже полученные строки: меряем только сборку строк, без сети"""
+
+    def __init__(self, description, rows):
+        self.description = description
+        self.rows = rows
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+FACTORIES = (
+    ("legacy dict", legacy_dict_fetchall),
+    ("dict_row", lambda cursor: fetch_all(cursor, dict_row)),
+    ("slots_row", lambda cursor: fetch_all(cursor, slots_row)),
+    ("namedtuple_row", lambda cursor: fetch_all(cursor, namedtuple_row)),
+    ("tuple_row", lambda cursor: fetch_all(cursor, tuple_row)),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Микробенчмарк сборки строк: прежний dict_fetchall против фабрик db.access "
+        "(время и память на строку)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50_000)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, rows, runs, **options):
+        with connection.cursor() as cursor:
+            cursor.execute(SAMPLE_SQL, (rows,))
+            sample = ReplayCursor(cursor.description, cursor.fetchall())
+
+        self.stdout.write(f"{rows} rows x {len(sample.description)} columns, median of {runs} runs")
+        self.stdout.write(f"{'factory':<16} {'us/row':>8} {'bytes/row':>10}")
+        results = {}
+        for name, fetch in FACTORIES:
+            fetch(sample)  # прогрев кэша сборщиков
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                fetch(sample)
+                timings.append(time.perf_counter() - started)
+            seconds = statistics.median(timings)
+            per_row_bytes = self.allocated(fetch, sample) / rows
+            results[name] = (seconds, per_row_bytes)
+            self.stdout.write(f"{name:<16} {seconds / rows * 1e6:>8.3f} {per_row_bytes:>10.0f}")
+
+        base_seconds, base_bytes = results["legacy dict"]
+        dict_seconds, _ = results["dict_row"]
+        slots_seconds, slots_bytes = results["slots_row"]
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ dict_row {base_seconds / dict_seconds:.2f}x faster than legacy; "
+            f"slots_row {1 - slots_bytes / base_bytes:.0%} less memory per row"
+        ))
+
+    @staticmethod
+    def allocated(fetch, sample):
+        """Байт, удерживаемых результатом (сами значения уже в sample и не считаются)"""
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = fetch(sample)
+            allocated, _peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result
+        return allocated
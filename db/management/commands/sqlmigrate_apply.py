@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from db.sql_migrations import apply_migrations, pending_migrations
+
+
+class Command(BaseCommand):
+    help = (
+        "Применяет версионные SQL-файлы db/init и изменившиеся init_* шаги приложений "
+        "под pg_advisory_lock; параллельные запуски ждут первого"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Ничего не применять; код выхода 1, если есть неприменённое",
+        )
+
+    def handle(self, *args, check, **options):
+        try:
+            if check:
+                pending = pending_migrations()
+                for name in pending:
+                    self.stdout.write(f"  pending {name}")
+                if pending:
+                    raise CommandError(f"{len(pending)} pending migrations")
+                self.stdout.write(self.style.SUCCESS("✔ schema is up to date"))
+                return
+
+            applied = apply_migrations(log=self.stdout.write)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        if applied:
+            self.stdout.write(self.style.SUCCESS(f"✔ {len(applied)} migrations applied"))
+        else:
+            self.stdout.write(self.style.SUCCESS("✔ schema is up to date"))
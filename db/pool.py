@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Свободного соединения не дождались за timeout секунд"""
+
+
+# =========================
+# Пул psycopg2-соединений процесса
+# =========================
+class ConnectionPool:
+    """
+    Потокобезопасный пул: при исчерпании ждёт до timeout, простоявшие
+    дольше check_after соединения проверяет SELECT 1, старше max_lifetime - пересоздаёт.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0,
+                 max_idle=300.0, max_lifetime=3600.0, check_after=30.0):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, opened_at, returned_at), справа - самые свежие
+        self._opened_at = {}  # id(conn) -> opened_at для выданных
+        self._size = 0
+        self._pid = os.getpid()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._wait_seconds_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._closed = 0
+        self._failed_checks = 0
+
+    def getconn(self):
+        started = time.monotonic()
+        waited = False
+        stale = []
+        with self._cond:
+            self._check_fork()
+            stale = self._prune_idle(started)
+            while True:
+                if self._idle:
+                    conn, opened_at, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"no free connection in {self.timeout}s (max_size={self.max_size})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            wait = time.monotonic() - started
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._wait_seconds += wait
+                self._wait_seconds_max = max(self._wait_seconds_max, wait)
+
+        for old in stale:
+            self._close_quietly(old)
+
+        if conn is not None:
+            now = time.monotonic()
+            if now - opened_at > self.max_lifetime:
+                self._close_quietly(conn)
+                conn = None
+            elif now - returned_at > self.check_after and not self._is_alive(conn):
+                with self._cond:
+                    self._failed_checks += 1
+                self._close_quietly(conn)
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            opened_at = time.monotonic()
+            with self._cond:
+                self._opened += 1
+
+        with self._cond:
+            self._opened_at[id(conn)] = opened_at
+        return conn
+
+    def putconn(self, conn):
+        reusable = not conn.closed
+        if reusable and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                reusable = False
+
+        now = time.monotonic()
+        with self._cond:
+            opened_at = self._opened_at.pop(id(conn), now)
+            if os.getpid() != self._pid:
+                # соединение родителя после fork: не трогаем и не учитываем
+                return
+            if reusable and now - opened_at <= self.max_lifetime:
+                self._idle.append((conn, opened_at, now))
+            else:
+                self._size -= 1
+                reusable = False
+            self._cond.notify()
+        if not reusable:
+            self._close_quietly(conn)
+
+    def closeall(self):
+        with self._cond:
+            idle = [conn for conn, _opened, _returned in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "pid": self._pid,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_seconds_total": round(self._wait_seconds, 6),
+                "wait_seconds_max": round(self._wait_seconds_max, 6),
+                "timeouts": self._timeouts,
+                "opened": self._opened,
+                "closed": self._closed,
+                "failed_health_checks": self._failed_checks,
+            }
+
+    def _prune_idle(self, now):
+        """Снимает с левого края (самые давние) простоявшие дольше max_idle сверх min_size"""
+        stale = []
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0][2] > self.max_idle):
+            stale.append(self._idle.popleft()[0])
+            self._size -= 1
+        return stale
+
+    def _check_fork(self):
+        if os.getpid() == self._pid:
+            return
+        # сокеты родителя закрывать нельзя - PQfinish оборвал бы его сессии.
+        # Ссылки отпускаем: psycopg2 при сборке объекта в чужом pid соединение не закрывает
+        self._idle.clear()
+        self._opened_at.clear()
+        self._size = 0
+        self._pid = os.getpid()
+
+    def _is_alive(self, conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _close_quietly(self, conn):
+        with self._cond:
+            self._closed += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+# =========================
+# Реестр пулов по alias базы
+# =========================
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, **options):
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(connect, **options)
+        return pool
+
+
+def close_pools():
+    """Закрыть свободные соединения всех пулов (перед fork воркеров)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.closeall()
+
+
+def pool_stats():
+    with _pools_lock:
+        return {alias: pool.stats() for alias, pool in _pools.items()}
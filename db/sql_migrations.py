@@ -0,0 +1,191 @@
+import hashlib
+import importlib
+import inspect
+import time
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from db.access import reset_prepared
+
+# ключ pg_advisory_lock: схему меняет один процесс, остальные ждут
+MIGRATIONS_LOCK_KEY = 7_301_021
+
+# версионные SQL-файлы: применяются один раз, править применённый файл нельзя.
+# Новые таблицы, колонки и индексы - новым файлом; init_* шаги их не дублируют
+VERSIONED_DIR = Path(__file__).resolve().parent / "init"
+
+# последний файл, который выполнял docker-entrypoint старого образа БД (до раннера):
+# только они уже есть в базе без журнала
+BASELINE_LAST_FILE = "008_reation_triger.sql"
+
+# повторяемые шаги: идемпотентные init_* функции приложений, в порядке зависимостей.
+# Шаг перезапускается, когда меняется исходник его модуля
+REPEATABLE_STEPS = (
+    ("users.sql_users", "create_users_table"),
+    ("posts.sql_posts", "init_posts_table"),
+    ("tags.sql_tags", "create_tags_tables"),
+    ("comments.sql_comments", "init_comments_table"),
+    ("reactions.sql_reactions", "init_reactions_table"),
+    ("client.sql_client", "create_profile_table_and_functions"),
+    ("client.sql_client", "init_post_stats"),
+    ("client.sql_client", "init_user_activity"),
+    ("comments.sql_comments", "init_comment_counters"),
+    ("reactions.sql_reactions", "init_reaction_deltas"),
+    ("reactions.sql_reactions", "init_reputation_audit"),
+    ("client.sql_client", "init_trending_posts"),
+)
+
+
+# =========================
+# Журнал миграций
+# =========================
+def init_schema_migrations(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name TEXT PRIMARY KEY,
+        kind VARCHAR(10) NOT NULL CHECK (kind IN ('versioned', 'repeatable')),
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        duration_ms INT NOT NULL DEFAULT 0
+    )
+    """)
+
+
+def _applied(cursor):
+    cursor.execute("SELECT name, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+
+def _record(cursor, name, kind, checksum, duration_ms=0):
+    cursor.execute("""
+    INSERT INTO schema_migrations(name, kind, checksum, duration_ms)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (name) DO UPDATE
+    SET checksum = EXCLUDED.checksum,
+        applied_at = CURRENT_TIMESTAMP,
+        duration_ms = EXCLUDED.duration_ms
+    """, (name, kind, checksum, duration_ms))
+
+
+def _checksum(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# =========================
+# План
+# =========================
+def versioned_migrations():
+    """[(name, sql, checksum)] из db/init по порядку номеров"""
+    migrations = []
+    for path in sorted(VERSIONED_DIR.glob("*.sql")):
+        sql = path.read_text(encoding="utf-8")
+        migrations.append((path.name, sql, _checksum(sql)))
+    return migrations
+
+
+def repeatable_steps():
+    """[(name, func, checksum)]: checksum - исходник модуля шага целиком"""
+    steps = []
+    for module_name, func_name in REPEATABLE_STEPS:
+        module = importlib.import_module(module_name)
+        steps.append((
+            f"{module_name}.{func_name}",
+            getattr(module, func_name),
+            _checksum(inspect.getsource(module)),
+        ))
+    return steps
+
+
+def pending_migrations():
+    """Имена того, что применит apply_migrations (без блокировки)"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        applied = _applied(cursor) if cursor.fetchone()[0] else {}
+
+    pending = []
+    for name, _sql, checksum in versioned_migrations():
+        if name not in applied:
+            pending.append(name)
+        elif applied[name] != checksum:
+            raise RuntimeError(f"{name} changed after it was applied; add a new file instead")
+    for name, _func, checksum in repeatable_steps():
+        if applied.get(name) != checksum:
+            pending.append(name)
+    return pending
+
+
+# =========================
+# Применение
+# =========================
+def apply_migrations(log=print):
+    """
+    Применяет новые версионные файлы и изменившиеся повторяемые шаги.
+    Возвращает список применённых имён.
+    """
+    applied_now = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            SELECT to_regclass('users') IS NOT NULL,
+                   to_regclass('schema_migrations') IS NOT NULL
+            """)
+            existing_schema, has_journal = cursor.fetchone()
+            if not has_journal:
+                init_schema_migrations(cursor)
+            applied = _applied(cursor)
+
+        versioned = versioned_migrations()
+        if not applied and existing_schema:
+            # база создана docker-entrypoint из db/init или старым DDL-на-старте:
+            # файлы до BASELINE_LAST_FILE уже отработали, только фиксируем их,
+            # более поздние выполнятся ниже
+            baseline = [
+                (name, checksum) for name, _sql, checksum in versioned
+                if name <= BASELINE_LAST_FILE
+            ]
+            with connection.cursor() as cursor:
+                for name, checksum in baseline:
+                    _record(cursor, name, "versioned", checksum)
+            applied = dict(baseline)
+            log(f"✔ baseline: {len(baseline)} versioned files marked as applied")
+
+        for name, sql, checksum in versioned:
+            if name in applied:
+                if applied[name] != checksum:
+                    raise RuntimeError(
+                        f"{name} changed after it was applied; add a new file instead"
+                    )
+                continue
+            started = time.monotonic()
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql)
+                _record(cursor, name, "versioned", checksum, _elapsed_ms(started))
+            applied_now.append(name)
+            log(f"✔ {name}")
+
+        for name, func, checksum in repeatable_steps():
+            if applied.get(name) == checksum:
+                continue
+            # init_* сами делают commit: шаг не атомарен, но идемпотентен -
+            # после сбоя просто перезапустится
+            started = time.monotonic()
+            func()
+            with connection.cursor() as cursor:
+                _record(cursor, name, "repeatable", checksum, _elapsed_ms(started))
+            applied_now.append(name)
+
+        if applied_now:
+            # свои PREPARE этого процесса сбрасываем сразу; в остальных процессах
+            # выражение с изменившимся типом результата переподготовит db.access.execute
+            reset_prepared()
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_KEY,))
+    return applied_now
+
+
+def _elapsed_ms(started):
+    return int((time.monotonic() - started) * 1000)
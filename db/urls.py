@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('db-pool/', views.db_pool_metrics, name='db-pool-metrics'),
+]
@@ -0,0 +1,30 @@
+import hmac
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from db.pool import pool_stats
+
+
+# =========================
+# Метрики соединений процесса
+# =========================
+def _metrics_authorized(request):
+    """Порт 8000 опубликован наружу - метрики отдаём только по внутреннему токену"""
+    token = settings.DB_POOL_METRICS_TOKEN
+    if not token:
+        return False
+    scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+    return scheme == "Bearer" and hmac.compare_digest(given.encode(), token.encode())
+
+
+def db_pool_metrics(request):
+    """Размер пула, ожидание и число выдач - по пулу каждого alias этого процесса"""
+    if not _metrics_authorized(request):
+        return JsonResponse({"error": "Not found"}, status=404)
+    database = settings.DATABASES["default"]
+    return JsonResponse({
+        "pooled": bool(database["OPTIONS"].get("pool")),
+        "conn_max_age": database["CONN_MAX_AGE"],
+        "pools": pool_stats(),
+    })
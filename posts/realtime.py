@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+import weakref
+
+import psycopg2
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# канал pg_notify из триггера trg_post_stats_notify (client.sql_client.init_post_stats)
+POST_STATS_CHANNEL = "post_stats"
+
+# EventSource переподключается сам: поток живёт ограниченное время,
+# чтобы отвалившиеся клиенты не держали подписку вечно
+SSE_RETRY_MS = 3000
+SSE_HEARTBEAT_SECONDS = 15
+SSE_STREAM_SECONDS = 300
+
+# событий в очереди одного клиента; счётчики абсолютные, лишние можно терять
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+# =========================
+# LISTEN-соединение процесса
+# =========================
+class PostStatsListener:
+    """
+    Одно LISTEN-соединение на процесс (event loop) и раздача
+    NOTIFY post_stats подписчикам по post_id.
+    """
+
+    def __init__(self):
+        self.conn = None
+        self.loop = None
+        self.fd = None
+        self.subscribers = {}  # post_id -> set(asyncio.Queue)
+        self._locks = weakref.WeakKeyDictionary()  # event loop -> asyncio.Lock
+
+    async def subscribe(self, post_id):
+        loop = asyncio.get_running_loop()
+        # замок берётся до первого await: одновременные подписчики ждут
+        # одно LISTEN-соединение, а не открывают каждый своё
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        async with lock:
+            if self.conn is None or self.loop is not loop:
+                conn = await loop.run_in_executor(None, self._connect)
+                # прежнее соединение закрываем вместе с его reader
+                self._close()
+                self.conn, self.loop, self.fd = conn, loop, conn.fileno()
+                loop.add_reader(self.fd, self._on_readable, conn)
+
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.setdefault(post_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, post_id, queue):
+        queues = self.subscribers.get(post_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[post_id]
+        if not self.subscribers:
+            self._close()
+
+    def _connect(self):
+        db = settings.DATABASES["default"]
+        conn = psycopg2.connect(
+            dbname=db["NAME"],
+            user=db["USER"],
+            password=db["PASSWORD"],
+            host=db["HOST"],
+            port=db["PORT"],
+        )
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {POST_STATS_CHANNEL}")
+        return conn
+
+    def _on_readable(self, conn):
+        if conn is not self.conn:
+            return
+        try:
+            conn.poll()
+        except psycopg2.Error:
+            logger.exception("LISTEN %s connection lost", POST_STATS_CHANNEL)
+            self._disconnect_all()
+            return
+
+        while conn.notifies:
+            payload = conn.notifies.pop(0).payload
+            post_id = json.loads(payload)["post_id"]
+            for queue in self.subscribers.get(post_id, ()):
+                if not queue.full():
+                    queue.put_nowait(payload)
+
+    def _disconnect_all(self):
+        # None закрывает поток: браузер переподключится уже к новому соединению
+        for queues in self.subscribers.values():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        self.subscribers = {}
+        self._close()
+
+    def _close(self):
+        if self.conn is None:
+            return
+        self.loop.remove_reader(self.fd)
+        if not self.conn.closed:
+            self.conn.close()
+        self.conn = None
+        self.fd = None
+
+
+listener = PostStatsListener()
+
+
+# =========================
+# SSE-поток счётчиков поста
+# =========================
+async def post_stats_events(post_id):
+    """Text/event-stream: 'stats' с новыми счётчиками поста и ': ping' для прокси"""
+    queue = await listener.subscribe(post_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SSE_STREAM_SECONDS
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                payload = await asyncio.wait_for(
+                    queue.get(), timeout=min(SSE_HEARTBEAT_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if payload is None:
+                break
+            yield f"event: stats\ndata: {payload}\n\n"
+    finally:
+        listener.unsubscribe(post_id, queue)
@@ -1,24 +1,95 @@
+import base64
+from datetime import datetime
+
 from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from db.access import PreparedStatement, call_all, call_one, call_value, execute, fetch_all, fetch_one
+
+# =========================
+# Keyset cursor utils
+# =========================
+
+def encode_cursor(created_at, post_id):
+    """Непрозрачный токен позиции в ленте: (created_at, id) последнего поста"""
+    raw = f"{created_at.isoformat()}|{post_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Возвращает (created_at, id) или (None, None) для пустого/битого токена"""
+    if not token:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, post_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        return None, None
+
+
+def encode_count_cursor(count, post_id):
+    """Токен позиции для сортировки по целому счётчику: (count, id) последнего поста"""
+    raw = f"{int(count)}|{post_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_count_cursor(token):
+    """Возвращает (count, id) как int или (None, None) для пустого/битого токена"""
+    if not token:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        count, post_id = raw.split("|")
+        return int(count), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        return None, None
+
+
+def fetch_page(cursor, limit):
+    """
+    Читает limit + 1 строк, возвращает (rows, next_cursor).
+    next_cursor = None, если это последняя страница.
+    """
+    rows = fetch_all(cursor)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last["created_at"], last["id"])
+
 
 # =========================
-# Utils
+# Full-text search utils
 # =========================
 
-def dict_fetchone(cursor):
-    row = cursor.fetchone()
-    if row is None:
-        return None
-    desc = cursor.description
-    return {desc[i].name: row[i] for i in range(len(row))}
+# Маркеры подсветки из ts_headline: текст сначала экранируется,
+# затем маркеры заменяются на <mark>, так что HTML из постов не проходит
+SEARCH_MARK_START = "\u27e6"
+SEARCH_MARK_STOP = "\u27e7"
+
+
+def highlight(text):
+    html = escape(text or "")
+    html = html.replace(SEARCH_MARK_START, "<mark>").replace(SEARCH_MARK_STOP, "</mark>")
+    return mark_safe(html)
+
 
+def encode_rank_cursor(rank, post_id):
+    raw = f"{rank!r}|{post_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-def dict_fetchall(cursor):
-    rows = cursor.fetchall()
-    desc = cursor.description
-    return [
-        {desc[i].name: row[i] for i in range(len(row))}
-        for row in rows
-    ]
+
+def decode_rank_cursor(token):
+    if not token:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        rank, post_id = raw.split("|")
+        return float(rank), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        return None, None
 
 
 # =========================
@@ -83,6 +154,62 @@ def init_posts_table():
         )
         """)
 
+        # -------------------------
+        # FEED INDEXES (keyset по (created_at, id))
+        # -------------------------
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_posts_created_id
+        ON posts(created_at, id)
+        """)
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_posts_author_created_id
+        ON posts(author_id, created_at, id)
+        """)
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_post_tags_tag_post
+        ON post_tags(tag_id, post_id)
+        """)
+
+        # -------------------------
+        # FULL-TEXT SEARCH: search_vector (title важнее content)
+        # -------------------------
+        cursor.execute("""
+        ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+        """)
+
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION posts_search_vector_update()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('english', COALESCE(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('english', COALESCE(NEW.content, '')), 'B');
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_posts_search_vector ON posts")
+        cursor.execute("""
+        CREATE TRIGGER trg_posts_search_vector
+        BEFORE INSERT OR UPDATE OF title, content ON posts
+        FOR EACH ROW
+        EXECUTE FUNCTION posts_search_vector_update();
+        """)
+
+        # backfill для постов, созданных до появления колонки
+        cursor.execute("""
+        UPDATE posts
+        SET search_vector =
+            setweight(to_tsvector('english', title), 'A') ||
+            setweight(to_tsvector('english', content), 'B')
+        WHERE search_vector IS NULL
+        """)
+
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_posts_search_vector
+        ON posts USING GIN (search_vector)
+        """)
+
         # -------------------------
         # DELETE LOG
         # -------------------------
@@ -189,9 +316,17 @@ def init_posts_table():
         cursor.execute("""
         DROP FUNCTION IF EXISTS get_posts_by_tag_func(TEXT)
         """)
+        cursor.execute("""
+        DROP FUNCTION IF EXISTS get_posts_by_tag_func(TEXT, INT, TIMESTAMP, INT)
+        """)
 
         cursor.execute("""
-        CREATE FUNCTION get_posts_by_tag_func(p_tag_name TEXT)
+        CREATE FUNCTION get_posts_by_tag_func(
+            p_tag_name TEXT,
+            p_limit INT,
+            p_cursor_created_at TIMESTAMP DEFAULT NULL,
+            p_cursor_id INT DEFAULT NULL
+        )
         RETURNS TABLE (
             id INT,
             title VARCHAR,
@@ -200,68 +335,86 @@ def init_posts_table():
             created_at TIMESTAMP,
             tag_names TEXT[]
         ) AS $$
-        BEGIN
-            RETURN QUERY
+            -- сначала страница id постов через idx_post_tags_tag_post,
+            -- теги собираем только для этих постов
+            WITH page AS (
+                SELECT p.id, p.title, p.content, p.author_id, p.created_at
+                FROM tags tg
+                JOIN post_tags pt ON pt.tag_id = tg.id
+                JOIN posts p ON p.id = pt.post_id
+                WHERE tg.name = p_tag_name
+                  AND (p.created_at, p.id)
+                    < (COALESCE(p_cursor_created_at, 'infinity'), COALESCE(p_cursor_id, 0))
+                ORDER BY p.created_at DESC, p.id DESC
+                LIMIT p_limit
+            )
             SELECT
-                p.id,
-                p.title,
-                p.content,
-                p.author_id,
-                p.created_at,
-                COALESCE(ARRAY_AGG(t2.name ORDER BY t2.name) FILTER (WHERE t2.name IS NOT NULL), ARRAY[]::TEXT[])
-            FROM posts p
-            JOIN post_tags pt1 ON pt1.post_id = p.id
-            JOIN tags t ON t.id = pt1.tag_id
-            LEFT JOIN post_tags pt2 ON pt2.post_id = p.id
-            LEFT JOIN tags t2 ON t2.id = pt2.tag_id
-            WHERE t.name = p_tag_name
-            GROUP BY p.id, p.title, p.content, p.author_id, p.created_at
-            ORDER BY p.created_at DESC;
-        END;
-        $$ LANGUAGE plpgsql;
+                page.id,
+                page.title,
+                page.content,
+                page.author_id,
+                page.created_at,
+                COALESCE(
+                    (SELECT ARRAY_AGG(t.name ORDER BY t.name)
+                     FROM post_tags pt
+                     JOIN tags t ON t.id = pt.tag_id
+                     WHERE pt.post_id = page.id),
+                    ARRAY[]::TEXT[]
+                )
+            FROM page
+            ORDER BY page.created_at DESC, page.id DESC;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
         # GET ALL POSTS
         # =========================
         cursor.execute("DROP FUNCTION IF EXISTS get_all_posts_func(INT, INT)")
+        cursor.execute("DROP FUNCTION IF EXISTS get_all_posts_func(INT, TIMESTAMP, INT)")
         cursor.execute("""
-        CREATE FUNCTION get_all_posts_func(p_limit INT, p_offset INT)
+        CREATE FUNCTION get_all_posts_func(
+            p_limit INT,
+            p_cursor_created_at TIMESTAMP DEFAULT NULL,
+            p_cursor_id INT DEFAULT NULL
+        )
         RETURNS TABLE(id INT, title VARCHAR, content TEXT, author_id INT, created_at TIMESTAMP) AS $$
-        BEGIN
-            RETURN QUERY
+            -- без курсора сравниваем с 'infinity': условие всегда Index Cond
+            -- по idx_posts_created_id, в том числе в generic-плане EXECUTE
             SELECT posts.id, posts.title, posts.content, posts.author_id, posts.created_at
             FROM posts
-            ORDER BY posts.created_at DESC
-            LIMIT p_limit OFFSET p_offset;
-        END;
-        $$ LANGUAGE plpgsql;
+            WHERE (posts.created_at, posts.id)
+                < (COALESCE(p_cursor_created_at, 'infinity'), COALESCE(p_cursor_id, 0))
+            ORDER BY posts.created_at DESC, posts.id DESC
+            LIMIT p_limit;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
         # GET POST BY ID
         # =========================
         cursor.execute("DROP FUNCTION IF EXISTS get_my_posts_func(INT)")
+        cursor.execute("DROP FUNCTION IF EXISTS get_my_posts_func(INT, INT, TIMESTAMP, INT)")
         cursor.execute("""
-            CREATE OR REPLACE FUNCTION get_my_posts_func(p_user_id INT)
+            CREATE FUNCTION get_my_posts_func(
+                p_user_id INT,
+                p_limit INT,
+                p_cursor_created_at TIMESTAMP DEFAULT NULL,
+                p_cursor_id INT DEFAULT NULL
+            )
             RETURNS TABLE (
                 id INT,
                 title VARCHAR,
                 content TEXT,
                 created_at TIMESTAMP
             ) AS $$
-            BEGIN
-                RETURN QUERY
-                SELECT
-                    p.id,
-                    p.title,
-                    p.content,
-                    p.created_at
+                SELECT p.id, p.title, p.content, p.created_at
                 FROM posts p
                 WHERE p.author_id = p_user_id
-                ORDER BY p.created_at DESC;
-            END;
-            $$ LANGUAGE plpgsql;
+                  AND (p.created_at, p.id)
+                    < (COALESCE(p_cursor_created_at, 'infinity'), COALESCE(p_cursor_id, 0))
+                ORDER BY p.created_at DESC, p.id DESC
+                LIMIT p_limit;
+            $$ LANGUAGE sql STABLE PARALLEL SAFE;
                 """)
         cursor.execute("DROP FUNCTION IF EXISTS get_post_with_tags_func(INT)")
         cursor.execute("""
@@ -274,8 +427,6 @@ def init_posts_table():
             created_at TIMESTAMP,
             tag_names TEXT[]
         ) AS $$
-        BEGIN
-            RETURN QUERY
             SELECT
                 p.id,
                 p.title,
@@ -288,26 +439,112 @@ def init_posts_table():
             LEFT JOIN tags t ON t.id = pt.tag_id
             WHERE p.id = p_id
             GROUP BY p.id, p.title, p.content, p.author_id, p.created_at;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+        # =========================
+        # POST DETAIL: пост, теги, счётчики, реакция зрителя и первая страница комментариев одним JSON
+        # =========================
+        cursor.execute("DROP FUNCTION IF EXISTS get_post_detail_func(INT, INT)")
+        cursor.execute("DROP FUNCTION IF EXISTS get_post_detail_func(INT, INT, INT, INT, INT)")
+        cursor.execute("""
+        CREATE FUNCTION get_post_detail_func(
+            p_post_id INT,
+            p_viewer_id INT,
+            p_comment_limit INT,
+            p_comment_depth INT,
+            p_children_limit INT
+        )
+        RETURNS JSON AS $$
+        DECLARE
+            v_comments JSON;
+        BEGIN
+            -- только первая страница веток (см. get_root_comments_func).
+            -- created_at - фиксированный формат: JSON timestamp теряет нули в долях
+            -- секунды ('.12'), а datetime.fromisoformat в 3.10 такое не читает
+            SELECT COALESCE(json_agg(
+                (to_jsonb(t) || jsonb_build_object(
+                    'created_at', to_char(t.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US')
+                ))::JSON
+                ORDER BY t.sort_path
+            ), '[]'::JSON)
+            INTO v_comments
+            FROM get_root_comments_func(
+                p_post_id, p_comment_limit, p_comment_depth, p_children_limit
+            ) t;
+
+            RETURN json_build_object(
+                'viewer_exists', EXISTS (SELECT 1 FROM users u WHERE u.id = p_viewer_id),
+
+                'post', (
+                    SELECT json_build_object(
+                        'id', p.id,
+                        'title', p.title,
+                        'content', p.content,
+                        'author_id', p.author_id,
+                        'created_at', to_char(p.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US'),
+                        'tag_names', COALESCE((
+                            SELECT ARRAY_AGG(t.name ORDER BY t.name)
+                            FROM post_tags pt
+                            JOIN tags t ON t.id = pt.tag_id
+                            WHERE pt.post_id = p.id
+                        ), ARRAY[]::TEXT[])
+                    )
+                    FROM posts p
+                    WHERE p.id = p_post_id
+                ),
+
+                -- счётчики уже посчитаны триггерами в post_stats
+                'stats', (
+                    SELECT row_to_json(s)
+                    FROM post_stats s
+                    WHERE s.post_id = p_post_id
+                ),
+
+                'viewer_reaction', (
+                    SELECT r.reaction_type
+                    FROM reactions r
+                    WHERE r.user_id = p_viewer_id
+                      AND r.reactable_type = 'post'
+                      AND r.reactable_id = p_post_id
+                ),
+
+                'comments', v_comments,
+
+                -- {comment_id: reaction_type} зрителя по комментариям страницы
+                'comment_reactions', COALESCE((
+                    SELECT json_object_agg(ur.reactable_id, ur.reaction_type)
+                    FROM get_user_reactions_func(
+                        p_viewer_id, 'comment',
+                        ARRAY(SELECT (c->>'id')::INT FROM json_array_elements(v_comments) c)
+                    ) ur
+                ), '{}'::JSON)
+            );
         END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE plpgsql STABLE;
         """)
 
         # =========================
         # GET POSTS BY AUTHOR
         # =========================
         cursor.execute("DROP FUNCTION IF EXISTS get_posts_by_author_func(INT, INT, INT)")
+        cursor.execute("DROP FUNCTION IF EXISTS get_posts_by_author_func(INT, INT, TIMESTAMP, INT)")
         cursor.execute("""
-        CREATE FUNCTION get_posts_by_author_func(p_author_id INT, p_limit INT, p_offset INT)
+        CREATE FUNCTION get_posts_by_author_func(
+            p_author_id INT,
+            p_limit INT,
+            p_cursor_created_at TIMESTAMP DEFAULT NULL,
+            p_cursor_id INT DEFAULT NULL
+        )
         RETURNS TABLE(id INT, title VARCHAR, content TEXT, author_id INT, created_at TIMESTAMP) AS $$
-        BEGIN
-            RETURN QUERY
             SELECT posts.id, posts.title, posts.content, posts.author_id, posts.created_at
             FROM posts
             WHERE posts.author_id = p_author_id
-            ORDER BY posts.created_at DESC
-            LIMIT p_limit OFFSET p_offset;
-        END;
-        $$ LANGUAGE plpgsql;
+              AND (posts.created_at, posts.id)
+                < (COALESCE(p_cursor_created_at, 'infinity'), COALESCE(p_cursor_id, 0))
+            ORDER BY posts.created_at DESC, posts.id DESC
+            LIMIT p_limit;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -459,8 +696,6 @@ def init_posts_table():
         cursor.execute("""
         CREATE FUNCTION get_all_tags_func()
         RETURNS TABLE(id INT, name TEXT, post_count BIGINT) AS $$
-        BEGIN
-            RETURN QUERY
             SELECT 
                 tags.id, 
                 tags.name::TEXT,
@@ -469,8 +704,7 @@ def init_posts_table():
             LEFT JOIN post_tags ON post_tags.tag_id = tags.id
             GROUP BY tags.id, tags.name
             ORDER BY tags.name;
-        END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -480,12 +714,8 @@ def init_posts_table():
         cursor.execute("""
         CREATE FUNCTION count_posts_func()
         RETURNS INT AS $$
-        DECLARE total INT;
-        BEGIN
-            SELECT COUNT(*) INTO total FROM posts;
-            RETURN total;
-        END;
-        $$ LANGUAGE plpgsql;
+            SELECT COUNT(*)::INT FROM posts;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -495,31 +725,137 @@ def init_posts_table():
         cursor.execute("""
         CREATE FUNCTION count_posts_by_author_func(p_author_id INT)
         RETURNS INT AS $$
-        DECLARE total INT;
-        BEGIN
-            SELECT COUNT(*) INTO total FROM posts WHERE author_id = p_author_id;
-            RETURN total;
-        END;
-        $$ LANGUAGE plpgsql;
+            SELECT COUNT(*)::INT FROM posts WHERE author_id = p_author_id;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
         # SEARCH POSTS
         # =========================
         cursor.execute("DROP FUNCTION IF EXISTS search_posts_func(VARCHAR, INT, INT)")
+        cursor.execute("DROP FUNCTION IF EXISTS search_posts_func(VARCHAR, INT, TIMESTAMP, INT)")
         cursor.execute("""
-        CREATE FUNCTION search_posts_func(p_query VARCHAR, p_limit INT, p_offset INT)
+        CREATE FUNCTION search_posts_func(
+            p_query VARCHAR,
+            p_limit INT,
+            p_cursor_created_at TIMESTAMP DEFAULT NULL,
+            p_cursor_id INT DEFAULT NULL
+        )
         RETURNS TABLE(id INT, title VARCHAR, content TEXT, author_id INT, created_at TIMESTAMP) AS $$
-        BEGIN
-            RETURN QUERY
             SELECT posts.id, posts.title, posts.content, posts.author_id, posts.created_at
             FROM posts
-            WHERE posts.title ILIKE '%' || p_query || '%'
-               OR posts.content ILIKE '%' || p_query || '%'
-            ORDER BY posts.created_at DESC
-            LIMIT p_limit OFFSET p_offset;
+            WHERE posts.search_vector @@ websearch_to_tsquery('english', p_query)
+              AND (posts.created_at, posts.id)
+                < (COALESCE(p_cursor_created_at, 'infinity'), COALESCE(p_cursor_id, 0))
+            ORDER BY posts.created_at DESC, posts.id DESC
+            LIMIT p_limit;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+        # =========================
+        # RANKED SEARCH (ts_rank + ts_headline)
+        # =========================
+        cursor.execute("DROP FUNCTION IF EXISTS search_posts_ranked_func(TEXT, INT, REAL, INT)")
+        cursor.execute("""
+        CREATE FUNCTION search_posts_ranked_func(
+            p_query TEXT,
+            p_limit INT,
+            p_cursor_rank REAL DEFAULT NULL,
+            p_cursor_id INT DEFAULT NULL
+        )
+        RETURNS TABLE(
+            id INT,
+            title VARCHAR,
+            author_id INT,
+            created_at TIMESTAMP,
+            rank REAL,
+            title_highlight TEXT,
+            snippet TEXT
+        ) AS $$
+            -- ts_headline дорогой, поэтому считается только для строк страницы
+            WITH q AS (
+                SELECT websearch_to_tsquery('english', p_query) AS v_query
+            ),
+            matches AS (
+                SELECT
+                    p.id,
+                    p.title,
+                    p.content,
+                    p.author_id,
+                    p.created_at,
+                    ts_rank(p.search_vector, q.v_query) AS rank,
+                    q.v_query
+                FROM q
+                JOIN posts p ON p.search_vector @@ q.v_query
+            ),
+            page AS (
+                SELECT *
+                FROM matches m
+                WHERE p_cursor_rank IS NULL
+                   OR (m.rank, m.id) < (p_cursor_rank, p_cursor_id)
+                ORDER BY m.rank DESC, m.id DESC
+                LIMIT p_limit
+            )
+            SELECT
+                page.id,
+                page.title,
+                page.author_id,
+                page.created_at,
+                page.rank,
+                ts_headline('english', page.title, page.v_query,
+                    'HighlightAll=true, StartSel=\u27e6, StopSel=\u27e7'),
+                ts_headline('english', page.content, page.v_query,
+                    'StartSel=\u27e6, StopSel=\u27e7, MaxWords=35, MinWords=15, MaxFragments=2')
+            FROM page
+            ORDER BY page.rank DESC, page.id DESC;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+        # =========================
+        # TITLE SEARCH (pg_trgm: подстрока + опечатки)
+        # =========================
+        cursor.execute("DROP FUNCTION IF EXISTS search_posts_by_title_func(TEXT, INT, REAL)")
+        cursor.execute("""
+        CREATE FUNCTION search_posts_by_title_func(
+            p_query TEXT,
+            p_limit INT,
+            p_threshold REAL DEFAULT 0.3
+        )
+        RETURNS TABLE(
+            id INT,
+            title VARCHAR,
+            author_id INT,
+            created_at TIMESTAMP,
+            score REAL
+        ) AS $$
+        DECLARE
+            v_pattern TEXT := '%' || replace(replace(replace(p_query,
+                '!', '!!'), '%', '!%'), '_', '!_') || '%';
+        BEGIN
+            -- порог для оператора <%; SET у функции (0.6 - умолчание pg_trgm)
+            -- восстанавливает прежнее значение на выходе, транзакция вызывающего не задета
+            PERFORM set_config('pg_trgm.word_similarity_threshold', p_threshold::TEXT, true);
+
+            -- оба условия обслуживаются idx_posts_title_trgm (BitmapOr)
+            RETURN QUERY
+            WITH matches AS (
+                SELECT
+                    p.id,
+                    p.title,
+                    p.author_id,
+                    p.created_at,
+                    word_similarity(p_query, p.title) AS sim
+                FROM posts p
+                WHERE p.title ILIKE v_pattern ESCAPE '!'
+                   OR p_query <% p.title
+            )
+            SELECT m.id, m.title, m.author_id, m.created_at, m.sim
+            FROM matches m
+            ORDER BY m.sim DESC, m.id DESC
+            LIMIT p_limit;
         END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE plpgsql
+        SET pg_trgm.word_similarity_threshold = 0.6;
         """)
 
         # =========================
@@ -565,62 +901,66 @@ def init_posts_table():
 # Python wrappers
 # =========================
 
+# горячие вызовы ленты и страницы поста: PREPARE один раз на соединение
+GET_ALL_POSTS = PreparedStatement(
+    "get_all_posts_stmt", "SELECT * FROM get_all_posts_func(%s, %s, %s)"
+)
+GET_POST_WITH_TAGS = PreparedStatement(
+    "get_post_with_tags_stmt", "SELECT * FROM get_post_with_tags_func(%s)"
+)
+
 
 def create_post_with_tags(title, content, author_id, tag_names):
-    with connection.cursor() as cursor:
-        cursor.execute(
-            "SELECT * FROM create_post_with_tags_func(%s, %s, %s, %s)",
-            (title, content, author_id, tag_names)
-        )
-        return dict_fetchone(cursor)
+    return call_one(
+        "SELECT * FROM create_post_with_tags_func(%s, %s, %s, %s)",
+        (title, content, author_id, tag_names)
+    )
 
 
-def get_posts_by_tag(tag_name):
+def get_posts_by_tag(tag_name, limit=20, cursor_token=None):
+    """Страница постов по тегу: (posts, next_cursor)"""
+    created_at, post_id = decode_cursor(cursor_token)
     with connection.cursor() as cursor:
         cursor.execute(
-            "SELECT * FROM get_posts_by_tag_func(%s)",
-            (tag_name,)
+            "SELECT * FROM get_posts_by_tag_func(%s, %s, %s, %s)",
+            (tag_name, limit + 1, created_at, post_id)
         )
-        return dict_fetchall(cursor)
+        return fetch_page(cursor, limit)
 
 
 def create_post(title, content, author_id):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM create_post_with_tags_func(%s, %s, %s, %s)", 
-                      (title, content, author_id, []))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM create_post_with_tags_func(%s, %s, %s, %s)",
+                    (title, content, author_id, []))
 
 
 def get_post_by_id(post_id):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_post_by_id_func(%s)", (post_id,))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM get_post_by_id_func(%s)", (post_id,))
 
 
-def get_all_posts(limit=50, offset=0):
+def get_all_posts(limit=50, cursor_token=None):
+    """Страница ленты: (posts, next_cursor)"""
+    created_at, post_id = decode_cursor(cursor_token)
     with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_all_posts_func(%s, %s)", (limit, offset))
-        return dict_fetchall(cursor)
+        execute(cursor, GET_ALL_POSTS, (limit + 1, created_at, post_id))
+        return fetch_page(cursor, limit)
 
 
-def get_posts_by_author(author_id, limit=50, offset=0):
+def get_posts_by_author(author_id, limit=50, cursor_token=None):
+    """Страница постов автора: (posts, next_cursor)"""
+    created_at, post_id = decode_cursor(cursor_token)
     with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_posts_by_author_func(%s, %s, %s)", 
-                      (author_id, limit, offset))
-        return dict_fetchall(cursor)
+        cursor.execute("SELECT * FROM get_posts_by_author_func(%s, %s, %s, %s)",
+                      (author_id, limit + 1, created_at, post_id))
+        return fetch_page(cursor, limit)
 
 
 def update_post(post_id, title=None, content=None):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM update_post_func(%s, %s, %s)", 
-                      (post_id, title, content))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM update_post_func(%s, %s, %s)",
+                    (post_id, title, content))
 
 
 def delete_post(post_id, user_id):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT delete_post_func(%s, %s)", (post_id, user_id))
-        return cursor.fetchone()[0]
+    return call_value("SELECT delete_post_func(%s, %s)", (post_id, user_id))
 
 
 def add_tag_to_post(post_id, tag_name, user_id):
@@ -630,55 +970,107 @@ def add_tag_to_post(post_id, tag_name, user_id):
             "SELECT * FROM add_tag_to_post_func(%s, %s, %s)",
             (post_id, user_id, tag_name)
         )
-        result = dict_fetchone(cursor)
+        result = fetch_one(cursor)
         return result
 
 
 
 def remove_tag_from_post(post_id, tag_name):
     """Удалить тег из поста"""
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT remove_tag_from_post_func(%s, %s)", 
+    return call_value("SELECT remove_tag_from_post_func(%s, %s)",
                       (post_id, tag_name))
-        return cursor.fetchone()[0]
 
 
 def get_post_with_tags(post_id):
     """Получить пост со всеми тегами"""
+    return call_one(GET_POST_WITH_TAGS, (post_id,))
+
+
+def get_post_detail(post_id, viewer_id, comment_limit, comment_depth, children_limit):
+    """
+    Всё для страницы поста за один запрос:
+    {viewer_exists, post, stats, viewer_reaction, comments, comment_reactions}
+    comments - строки get_root_comments_func в порядке sort_path,
+    comment_reactions - {comment_id: reaction_type} зрителя
+    """
     with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_post_with_tags_func(%s)", (post_id,))
-        return dict_fetchone(cursor)
+        cursor.execute("SELECT get_post_detail_func(%s, %s, %s, %s, %s)",
+                      (post_id, viewer_id, comment_limit, comment_depth, children_limit))
+        detail = cursor.fetchone()[0]
+
+    # created_at приходит строкой с 6 знаками долей секунды, шаблонам нужен datetime
+    if detail["post"]:
+        detail["post"]["created_at"] = datetime.fromisoformat(detail["post"]["created_at"])
+    for comment in detail["comments"]:
+        comment["created_at"] = datetime.fromisoformat(comment["created_at"])
+    # ключи JSON-объекта - строки
+    detail["comment_reactions"] = {
+        int(comment_id): reaction
+        for comment_id, reaction in detail["comment_reactions"].items()
+    }
+    return detail
 
 
 def get_all_tags():
     """Получить все теги с количеством постов"""
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_all_tags_func()")
-        return dict_fetchall(cursor)
+    return call_all("SELECT * FROM get_all_tags_func()")
 
 
 def count_posts():
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT count_posts_func()")
-        return cursor.fetchone()[0]
+    return call_value("SELECT count_posts_func()")
 
 
 def count_posts_by_author(author_id):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT count_posts_by_author_func(%s)", (author_id,))
-        return cursor.fetchone()[0]
+    return call_value("SELECT count_posts_by_author_func(%s)", (author_id,))
 
 
-def search_posts(query_text, limit=50, offset=0):
+def search_posts(query_text, limit=50, cursor_token=None):
+    """Страница результатов поиска: (posts, next_cursor)"""
+    created_at, post_id = decode_cursor(cursor_token)
     with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM search_posts_func(%s, %s, %s)", 
-                      (query_text, limit, offset))
-        return dict_fetchall(cursor)
+        cursor.execute("SELECT * FROM search_posts_func(%s, %s, %s, %s)",
+                      (query_text, limit + 1, created_at, post_id))
+        return fetch_page(cursor, limit)
     
-def get_my_posts(author_id):
+def search_posts_ranked(query_text, limit=20, cursor_token=None):
+    """Поиск по релевантности: (results, next_cursor), подсветка уже в HTML"""
+    query_text = (query_text or "").strip()
+    if not query_text:
+        return [], None
+
+    rank, post_id = decode_rank_cursor(cursor_token)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT * FROM search_posts_ranked_func(%s, %s, %s, %s)",
+                      (query_text, limit + 1, rank, post_id))
+        rows = fetch_all(cursor)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor(rows[-1]["rank"], rows[-1]["id"])
+
+    for row in rows:
+        row["title_highlight"] = highlight(row["title_highlight"])
+        row["snippet"] = highlight(row["snippet"])
+    return rows, next_cursor
+
+
+def search_posts_by_title(query_text, limit=10, threshold=0.3):
+    """Поиск по заголовкам с допуском опечаток, лучшие совпадения первыми"""
+    query_text = (query_text or "").strip()
+    if not query_text:
+        return []
+    return call_all("SELECT * FROM search_posts_by_title_func(%s, %s, %s)",
+                    (query_text, limit, threshold))
+
+
+def get_my_posts(author_id, limit=20, cursor_token=None):
+    """Страница моих постов: (posts, next_cursor)"""
+    created_at, post_id = decode_cursor(cursor_token)
     with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_my_posts_func(%s::int)", (author_id,))
-        return dict_fetchall(cursor)
+        cursor.execute("SELECT * FROM get_my_posts_func(%s::int, %s, %s, %s)",
+                      (author_id, limit + 1, created_at, post_id))
+        return fetch_page(cursor, limit)
     
 def update_my_post(post_id, user_id, title=None, content=None):
     with connection.cursor() as cursor:
@@ -686,4 +1078,4 @@ def update_my_post(post_id, user_id, title=None, content=None):
             "SELECT * FROM update_my_post_func(%s::int, %s::int, %s::varchar, %s::text)",
             (post_id, user_id, title, content)
         )
-        return dict_fetchone(cursor)
\ No newline at end of file
+        return fetch_one(cursor)
\ No newline at end of file
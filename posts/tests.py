@@ -1,3 +1,569 @@
-from django.test import TestCase
+import gc
+import json
+import os
+from datetime import datetime
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+import psycopg2
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from comments.sql_comments import init_comments_table
+from db.pool import ConnectionPool
+from db.sql_migrations import REPEATABLE_STEPS, apply_migrations
+from posts.sql_posts import decode_count_cursor, encode_count_cursor, encode_rank_cursor, get_post_detail
+from reactions.sql_reactions import REACTIONS_USER_FK_CONSTRAINT, migrate_reactions_to_partitions
+
+# читающие функции, которые должны встраиваться в вызывающий запрос
+INLINABLE_READ_FUNCTIONS = (
+    "get_all_posts_func",
+    "get_posts_by_author_func",
+    "get_my_posts_func",
+    "get_posts_by_tag_func",
+    "get_post_with_tags_func",
+    "search_posts_func",
+    "search_posts_ranked_func",
+    "get_tag_func",
+    "get_all_tags_func",
+    "get_user_by_username_func",
+    "get_user_by_email_func",
+    "get_comment_func",
+    "get_comments_tree_func",
+    "get_comment_subtrees_func",
+    "get_post_reactions_stats_func",
+    "get_comment_reactions_stats_func",
+    "get_user_reactions_func",
+    "get_posts_with_reactions_func",
+    "get_profile_func",
+)
+
+SEED_POSTS = 5000
+SEED_TAGS = 20
+SEED_COMMENTED_POSTS = 200
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+class ReadFunctionPlanTests(TransactionTestCase):
+    """
+    Читающие *_func - LANGUAGE sql STABLE без STRICT: планировщик встраивает
+    их тело в запрос, и условия с LIMIT доходят до индексов (нет Function Scan)
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        apply_migrations(log=lambda *args: None)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO users(username, email, password)
+            VALUES ('planner', 'planner@example.com', 'x')
+            RETURNING id
+            """)
+            cls.user_id = cursor.fetchone()[0]
+            cursor.execute("""
+            INSERT INTO posts(title, content, author_id, created_at)
+            SELECT 'post ' || i, 'plan test body ' || i, %s,
+                   TIMESTAMP '2024-01-01' + i * INTERVAL '1 minute'
+            FROM generate_series(1, %s) AS i
+            """, (cls.user_id, SEED_POSTS))
+            cursor.execute("""
+            INSERT INTO tags(name)
+            SELECT 'tag' || i FROM generate_series(1, %s) AS i
+            """, (SEED_TAGS,))
+            cursor.execute("""
+            INSERT INTO post_tags(post_id, tag_id)
+            SELECT p.id, t.id
+            FROM posts p
+            JOIN tags t ON t.name = 'tag' || (p.id %% %s + 1)
+            """, (SEED_TAGS,))
+            cursor.execute("""
+            INSERT INTO comments(post_id, user_id, content)
+            SELECT p.id, %s, 'comment ' || i
+            FROM (SELECT id FROM posts ORDER BY id LIMIT %s) p
+            CROSS JOIN generate_series(1, 10) AS i
+            """, (cls.user_id, SEED_COMMENTED_POSTS))
+            cursor.execute("SELECT MIN(id), MAX(id) FROM posts")
+            cls.first_post_id, cls.last_post_id = cursor.fetchone()
+            cursor.execute("ANALYZE")
+
+    def explain(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            result = cursor.fetchone()[0]
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result[0]["Plan"]
+
+    def assertInlined(self, plan):
+        function_scans = [
+            node.get("Function Name") for node in plan_nodes(plan)
+            if node["Node Type"] == "Function Scan"
+        ]
+        self.assertEqual(function_scans, [], "function was not inlined")
+
+    def assertUsesIndex(self, plan, index_name):
+        for node in plan_nodes(plan):
+            if node.get("Index Name") == index_name:
+                return node
+        self.fail(f"{index_name} is not used:\n{json.dumps(plan, indent=2)}")
+
+    def assertIndexCond(self, plan, index_name):
+        node = self.assertUsesIndex(plan, index_name)
+        self.assertIn("Index Cond", node, f"{index_name} is scanned without a condition")
+        return node
+
+    def test_read_functions_are_stable_sql(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            SELECT p.proname, l.lanname, p.provolatile, p.proisstrict
+            FROM pg_proc p
+            JOIN pg_language l ON l.oid = p.prolang
+            WHERE p.proname = ANY(%s)
+            """, (list(INLINABLE_READ_FUNCTIONS),))
+            rows = {name: rest for name, *rest in cursor.fetchall()}
+
+        self.assertEqual(set(rows), set(INLINABLE_READ_FUNCTIONS))
+        for name, (language, volatility, strict) in rows.items():
+            with self.subTest(function=name):
+                self.assertEqual(language, "sql")
+                self.assertEqual(volatility, "s")
+                self.assertFalse(strict)
+
+    def test_feed_limit_reaches_index(self):
+        for params in ((21, None, None), (21, "2024-01-02 12:00", self.last_post_id)):
+            with self.subTest(cursor=params[1]):
+                plan = self.explain("SELECT * FROM get_all_posts_func(%s, %s, %s)", params)
+                self.assertInlined(plan)
+                self.assertEqual(plan["Node Type"], "Limit")
+                node = self.assertIndexCond(plan, "idx_posts_created_id")
+                self.assertIn("created_at", node["Index Cond"])
+
+    def generic_plan(self, call, arg_types, args):
+        """План EXECUTE из db.access.PreparedStatement: generic, параметры не подставлены"""
+        with connection.cursor() as cursor:
+            cursor.execute("SET plan_cache_mode = force_generic_plan")
+            cursor.execute(f"PREPARE plan_test({', '.join(arg_types)}) AS SELECT * FROM {call}")
+        try:
+            return self.explain(f"EXECUTE plan_test({args})")
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("DEALLOCATE plan_test")
+                cursor.execute("RESET plan_cache_mode")
+
+    def test_keyset_generic_plan_keeps_cursor_condition(self):
+        # без курсора условие - сравнение с 'infinity', а не "курсор IS NULL OR ...":
+        # в generic-плане такой OR с параметром не стал бы условием индекса.
+        # Планировщик идёт либо по idx_posts_created_id (условие курсора - Index Cond),
+        # либо по индексу фильтра функции, и тогда курсор - простой Filter
+        cases = (
+            ("get_all_posts_func($1, $2, $3)", ("INT", "TIMESTAMP", "INT"),
+             "21, NULL, NULL", "idx_posts_created_id"),
+            ("get_posts_by_tag_func($1, $2, $3, $4)", ("TEXT", "INT", "TIMESTAMP", "INT"),
+             "'tag1', 21, NULL, NULL", "idx_post_tags_tag_post"),
+            ("search_posts_func($1, $2, $3, $4)", ("VARCHAR", "INT", "TIMESTAMP", "INT"),
+             "'plan', 21, NULL, NULL", "idx_posts_search_vector"),
+        )
+        for call, arg_types, args, filter_index in cases:
+            with self.subTest(function=call):
+                plan = self.generic_plan(call, arg_types, args)
+                nodes = list(plan_nodes(plan))
+                self.assertInlined(plan)
+                self.assertIn("Limit", [node["Node Type"] for node in nodes])
+                self.assertFalse(
+                    any("IS NULL" in json.dumps(node) for node in nodes),
+                    json.dumps(plan, indent=2),
+                )
+
+                cursor_in_index = [
+                    node for node in nodes if "infinity" in node.get("Index Cond", "")
+                ]
+                if cursor_in_index:
+                    self.assertEqual(cursor_in_index[0]["Index Name"], "idx_posts_created_id")
+                else:
+                    self.assertTrue(any("infinity" in node.get("Filter", "") for node in nodes))
+                    self.assertIndexCond(plan, filter_index)
+
+        plan = self.generic_plan(*cases[0][:3])
+        node = self.assertIndexCond(plan, "idx_posts_created_id")
+        self.assertIn("infinity", node["Index Cond"])
+
+    def test_post_with_tags_uses_primary_key(self):
+        plan = self.explain("SELECT * FROM get_post_with_tags_func(%s)", (self.first_post_id,))
+        self.assertInlined(plan)
+        self.assertIndexCond(plan, "posts_pkey")
+
+    def test_posts_by_tag_uses_tag_index(self):
+        plan = self.explain("SELECT * FROM get_posts_by_tag_func(%s, %s)", ("tag1", 20))
+        self.assertInlined(plan)
+        self.assertIndexCond(plan, "idx_post_tags_tag_post")
+
+    def test_comments_tree_uses_path_index(self):
+        plan = self.explain("SELECT * FROM get_comments_tree_func(%s)", (self.first_post_id,))
+        self.assertInlined(plan)
+        self.assertIndexCond(plan, "idx_comments_post_path")
+
+    def test_comment_subtrees_read_path_range(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            SELECT ARRAY_AGG(id ORDER BY id) FROM comments
+            WHERE post_id = %s AND parent_id IS NULL
+            """, (self.first_post_id,))
+            root_ids = cursor.fetchone()[0]
+        # на 2000 строк фикстуры Seq Scan дешевле; проверяем, что диапазон по path
+        # вообще доходит до индекса как Index Cond
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        try:
+            plan = self.explain("SELECT * FROM get_comment_subtrees_func(%s, 3, 10)", (root_ids,))
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_seqscan")
+        # Function Scan в плане - только unnest корней и путей из тела функции
+        self.assertNotIn("get_comment_subtrees_func", json.dumps(plan))
+        node_types = [node["Node Type"] for node in plan_nodes(plan)]
+        self.assertNotIn("Recursive Union", node_types)
+        node = self.assertIndexCond(plan, "idx_comments_post_path")
+        self.assertIn("path", node["Index Cond"])
+
+    def test_posts_with_reactions_runs_one_branch(self):
+        plan = self.explain(
+            "SELECT * FROM get_posts_with_reactions_func(%s, %s)", (20, "reactions")
+        )
+        self.assertInlined(plan)
+        # LIMIT читает индекс по порядку и останавливается, без сортировки
+        self.assertUsesIndex(plan, "idx_post_stats_total_reactions")
+        self.assertIn(
+            "false",
+            [node.get("One-Time Filter") for node in plan_nodes(plan)],
+        )
+
+
+class ReactionsPartitionMigrationTests(TransactionTestCase):
+    """
+    База из старого образа: reactions - обычная таблица с VARCHAR-типами,
+    поверх неё представления, в user_activity посчитаны и реакции-сироты
+    """
+
+    def setUp(self):
+        apply_migrations(log=lambda *args: None)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO users(username, email, password)
+            SELECT 'legacy' || i, 'legacy' || i || '@example.com', 'x'
+            FROM generate_series(1, 3) AS i
+            RETURNING id
+            """)
+            self.user_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("""
+            INSERT INTO posts(title, content, author_id)
+            SELECT 'legacy post ' || i, 'legacy post body', %s FROM generate_series(1, 3) AS i
+            RETURNING id
+            """, (self.user_ids[0],))
+            post_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("""
+            INSERT INTO comments(post_id, user_id, content)
+            VALUES (%s, %s, 'kept comment'), (%s, %s, 'deleted comment')
+            RETURNING id
+            """, (post_ids[0], self.user_ids[1], post_ids[1], self.user_ids[1]))
+            comment_ids = [row[0] for row in cursor.fetchall()]
+            # удаляем до создания старой таблицы: у неё нет FK, реакции на них - сироты
+            cursor.execute("DELETE FROM comments WHERE id = %s", (comment_ids[1],))
+            cursor.execute("DELETE FROM posts WHERE id = %s", (post_ids[2],))
+
+            cursor.execute("DROP TABLE reactions CASCADE")
+            cursor.execute("""
+            CREATE TABLE reactions (
+                id SERIAL PRIMARY KEY,
+                user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                reactable_type VARCHAR(20) NOT NULL CHECK (reactable_type IN ('post', 'comment')),
+                reactable_id INT NOT NULL CHECK (reactable_id > 0),
+                reaction_type VARCHAR(20) NOT NULL CHECK (reaction_type IN ('like', 'love', 'dislike')),
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, reactable_type, reactable_id)
+            )
+            """)
+            cursor.execute("""
+            INSERT INTO reactions(user_id, reactable_type, reactable_id, reaction_type)
+            SELECT u.id, t.reactable_type, t.reactable_id, t.reaction_type
+            FROM unnest(%s::INT[]) AS u(id)
+            CROSS JOIN (VALUES
+                ('post', %s, 'like'), ('post', %s, 'love'), ('post', %s, 'dislike'),
+                ('comment', %s, 'like'), ('comment', %s, 'love')
+            ) AS t(reactable_type, reactable_id, reaction_type)
+            """, (self.user_ids, *post_ids, *comment_ids))
+            cursor.execute("DROP VIEW IF EXISTS posts_with_stats, user_activity_summary")
+            cursor.execute("""
+            CREATE VIEW posts_with_stats AS
+            SELECT p.id, COUNT(r.id) AS total_reactions
+            FROM posts p
+            LEFT JOIN reactions r ON r.reactable_type = 'post' AND r.reactable_id = p.id
+            GROUP BY p.id
+            """)
+            cursor.execute("""
+            CREATE VIEW user_activity_summary AS
+            SELECT u.id AS user_id, COUNT(r.id) AS reactions_given
+            FROM users u
+            LEFT JOIN reactions r ON r.user_id = u.id
+            GROUP BY u.id
+            """)
+            cursor.execute("""
+            UPDATE user_activity ua
+            SET reactions_given = (SELECT COUNT(*) FROM reactions r WHERE r.user_id = ua.user_id)
+            WHERE ua.user_id = ANY(%s)
+            """, (self.user_ids,))
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            # каскад через триггеры user_activity (016_user_activity_fk_deferred.sql)
+            cursor.execute("DELETE FROM users WHERE id = ANY(%s)", (self.user_ids,))
+
+    def test_migration_upgrades_baseline_schema(self):
+        with connection.cursor() as cursor:
+            self.assertTrue(migrate_reactions_to_partitions(cursor))
+
+        # дальше по порядку шаги, которые пересоздают представления и триггеры
+        for module_name, func_name in REPEATABLE_STEPS[
+            REPEATABLE_STEPS.index(("reactions.sql_reactions", "init_reactions_table")):
+        ]:
+            getattr(import_module(module_name), func_name)()
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'reactions'::regclass")
+            self.assertEqual(cursor.fetchone()[0], "p")
+            cursor.execute("SELECT to_regclass('reactions_legacy')")
+            self.assertIsNone(cursor.fetchone()[0])
+            cursor.execute("""
+            SELECT to_regclass('posts_with_stats') IS NOT NULL,
+                   to_regclass('user_activity_summary') IS NOT NULL
+            """)
+            self.assertEqual(cursor.fetchone(), (True, True))
+            # имя FK на users не сдвинулось из-за старой таблицы (reactions.views)
+            cursor.execute("""
+            SELECT DISTINCT conname FROM pg_constraint
+            WHERE contype = 'f' AND confrelid = 'users'::regclass
+              AND conrelid IN ('reactions'::regclass, 'reactions_post'::regclass,
+                               'reactions_comment'::regclass)
+            """)
+            self.assertEqual(cursor.fetchall(), [(REACTIONS_USER_FK_CONSTRAINT,)])
+
+            # сироты (удалённый пост и комментарий) не перенесены
+            cursor.execute("SELECT COUNT(*) FROM reactions WHERE user_id = ANY(%s)", (self.user_ids,))
+            self.assertEqual(cursor.fetchone()[0], 3 * len(self.user_ids))
+
+            cursor.execute("""
+            SELECT ua.user_id, ua.reactions_given,
+                   (SELECT COUNT(*) FROM reactions r WHERE r.user_id = ua.user_id)
+            FROM user_activity ua
+            WHERE ua.user_id = ANY(%s)
+            """, (self.user_ids,))
+            rows = cursor.fetchall()
+        self.assertEqual(len(rows), len(self.user_ids))
+        for user_id, reactions_given, actual in rows:
+            with self.subTest(user_id=user_id):
+                self.assertEqual(reactions_given, actual)
+
+
+class PostDetailTests(TransactionTestCase):
+    def setUp(self):
+        apply_migrations(log=lambda *args: None)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO users(username, email, password)
+            VALUES ('detail', 'detail@example.com', 'x')
+            RETURNING id
+            """)
+            self.user_id = cursor.fetchone()[0]
+            # Postgres выводит такие доли секунды как '.12'
+            cursor.execute("""
+            INSERT INTO posts(title, content, author_id, created_at)
+            VALUES ('detail', 'detail post body', %s, '2024-01-01 10:00:00.120000')
+            RETURNING id
+            """, (self.user_id,))
+            self.post_id = cursor.fetchone()[0]
+            cursor.execute("""
+            INSERT INTO comments(post_id, user_id, content, created_at)
+            VALUES (%s, %s, 'detail comment', '2024-01-01 10:05:00.500000')
+            """, (self.post_id, self.user_id))
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM users WHERE id = %s", (self.user_id,))
+
+    def test_created_at_has_fixed_fraction(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT get_post_detail_func(%s, %s, 10, 3, 10)", (self.post_id, self.user_id))
+            raw = cursor.fetchone()[0]
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+        # datetime.fromisoformat в Python 3.10 читает только 3 или 6 знаков
+        self.assertEqual(raw["post"]["created_at"], "2024-01-01T10:00:00.120000")
+        self.assertEqual(raw["comments"][0]["created_at"], "2024-01-01T10:05:00.500000")
+
+        detail = get_post_detail(self.post_id, self.user_id, 10, 3, 10)
+        self.assertEqual(detail["post"]["created_at"], datetime(2024, 1, 1, 10, 0, 0, 120000))
+        self.assertEqual(detail["comments"][0]["created_at"], datetime(2024, 1, 1, 10, 5, 0, 500000))
+
+
+
+class CountCursorTests(SimpleTestCase):
+    def test_round_trip_keeps_integers(self):
+        count, post_id = decode_count_cursor(encode_count_cursor(2 ** 53 + 1, 42))
+        self.assertEqual((count, post_id), (2 ** 53 + 1, 42))
+        self.assertIsInstance(count, int)
+
+    def test_rejects_float_and_broken_tokens(self):
+        self.assertEqual(decode_count_cursor(encode_rank_cursor(3.5, 42)), (None, None))
+        self.assertEqual(decode_count_cursor("not-a-cursor"), (None, None))
+        self.assertEqual(decode_count_cursor(None), (None, None))
+
+
+class CommentPathTests(TransactionTestCase):
+    """path заполняет триггер при любой вставке в comments, не только add_comment_func"""
+
+    def setUp(self):
+        apply_migrations(log=lambda *args: None)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO users(username, email, password)
+            VALUES ('paths', 'paths@example.com', 'x')
+            RETURNING id
+            """)
+            self.user_id = cursor.fetchone()[0]
+            cursor.execute("""
+            INSERT INTO posts(title, content, author_id)
+            VALUES ('paths', 'comment path body', %s)
+            RETURNING id
+            """, (self.user_id,))
+            self.post_id = cursor.fetchone()[0]
+            cursor.execute("""
+            INSERT INTO comments(post_id, user_id, content)
+            VALUES (%s, %s, 'root') RETURNING id
+            """, (self.post_id, self.user_id))
+            self.root_id = cursor.fetchone()[0]
+            cursor.execute("""
+            INSERT INTO comments(post_id, user_id, content, parent_id)
+            VALUES (%s, %s, 'reply', %s) RETURNING id
+            """, (self.post_id, self.user_id, self.root_id))
+            self.reply_id = cursor.fetchone()[0]
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM users WHERE id = %s", (self.user_id,))
+
+    def paths(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, path FROM comments WHERE post_id = %s ORDER BY id", (self.post_id,)
+            )
+            return cursor.fetchall()
+
+    def test_plain_insert_fills_path(self):
+        self.assertEqual(self.paths(), [
+            (self.root_id, [self.root_id]),
+            (self.reply_id, [self.root_id, self.reply_id]),
+        ])
+
+    def test_migration_backfills_missing_paths(self):
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE comments SET path = NULL WHERE post_id = %s", (self.post_id,))
+        init_comments_table()
+        self.assertEqual(self.paths(), [
+            (self.root_id, [self.root_id]),
+            (self.reply_id, [self.root_id, self.reply_id]),
+        ])
+
+
+
+class AllUsersPageTests(TransactionTestCase):
+    """/client/users/ отдаёт страницы из user_activity_summary через users/all_users.html"""
+
+    def setUp(self):
+        apply_migrations(log=lambda *args: None)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            INSERT INTO users(username, email, password)
+            VALUES ('page_a', 'page_a@example.com', 'x'), ('page_b', 'page_b@example.com', 'x')
+            RETURNING id
+            """)
+            self.user_ids = [row[0] for row in cursor.fetchall()]
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM users WHERE id = ANY(%s)", (self.user_ids,))
+
+    @mock.patch("client.views.USERS_PAGE_SIZE", 1)
+    def test_pages_render(self):
+        first = self.client.get("/client/users/")
+        self.assertEqual(first.status_code, 200)
+        self.assertTemplateUsed(first, "users/all_users.html")
+        self.assertTrue(first.context["has_next"])
+        self.assertEqual(len(first.context["users"]), 1)
+
+        last = self.client.get("/client/users/?page=2")
+        self.assertEqual(last.status_code, 200)
+        self.assertFalse(last.context["has_next"])
+        self.assertNotEqual(first.context["users"][0]["user_id"], last.context["users"][0]["user_id"])
+
+
+class ConnectionPoolForkTests(TransactionTestCase):
+    def connect(self):
+        settings = connection.settings_dict
+        return psycopg2.connect(
+            dbname=settings["NAME"], user=settings["USER"], password=settings["PASSWORD"],
+            host=settings["HOST"], port=settings["PORT"],
+        )
+
+    def test_child_keeps_parent_connections_alive(self):
+        pool = ConnectionPool(self.connect, check_after=0.0)
+        conn = pool.getconn()
+        backend_pid = conn.get_backend_pid()
+        pool.putconn(conn)
+        del conn
+
+        child = os.fork()
+        if child == 0:
+            # пул в дочернем процессе открывает своё соединение, а унаследованное
+            # от родителя отпускает, не закрывая общий с родителем сокет
+            try:
+                own = pool.getconn()
+                pool.putconn(own)
+                gc.collect()
+                code = 0
+            except BaseException:
+                code = 1
+            os._exit(code)
+
+        _pid, status = os.waitpid(child, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+        # то же соединение родителя прошло проверку SELECT 1 и не было пересоздано
+        conn = pool.getconn()
+        try:
+            self.assertEqual(conn.get_backend_pid(), backend_pid)
+            self.assertEqual(pool.stats()["failed_health_checks"], 0)
+        finally:
+            pool.putconn(conn)
+            pool.closeall()
+
+
+class DbPoolMetricsAccessTests(TransactionTestCase):
+    url = "/metrics/db-pool/"
+
+    @override_settings(DB_POOL_METRICS_TOKEN="")
+    def test_disabled_without_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer ").status_code, 404)
+
+    @override_settings(DB_POOL_METRICS_TOKEN="s3cret")
+    def test_requires_bearer_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 404)
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("pools", response.json())
@@ -12,6 +12,8 @@ urlpatterns = [
     path('', views.posts_list_page, name='all-posts'),
     path('my/', views.my_posts_view, name='my-posts'),
     path('create/', views.post_create_page, name='post-create-page'),
+    path('search/', views.search_page, name='search'),
+    path('api/search/', views.search_api, name='search-api'),
     
     # =========================
     # НОВОЕ: Посты со статистикой
@@ -32,6 +34,7 @@ urlpatterns = [
     path('<int:post_id>/', views.post_detail_page, name='post-detail-page'),
     path('<int:post_id>/update/', views.post_update_page, name='post-update-page'),
     path('<int:post_id>/delete/', views.delete_post_view, name='post-delete-page'),
+    path('<int:post_id>/events/', views.post_events_stream, name='post-events'),
     
     # =========================
     # Управление тегами
@@ -1,17 +1,18 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from users.views import jwt_required
+from users.views import jwt_required, jwt_token_required, get_jwt_user_id
 from comments import sql_comments
 from reactions import sql_reactions
 from django.db import connection
+from posts.realtime import post_stats_events
 from posts.sql_posts import (
-    init_posts_table,
     create_post_with_tags,
     get_all_posts,
-    get_post_by_id,
     get_post_with_tags,
+    get_post_detail,
     delete_post as delete_post_sql,
     get_posts_by_tag,
     add_tag_to_post,
@@ -19,66 +20,78 @@ from posts.sql_posts import (
     get_all_tags,
     update_my_post,
     get_my_posts,
+    search_posts_ranked,
 )
 
 # ДОБАВЛЕНО: импорт функций статистики из client.sql_client
 from client.sql_client import (
     get_posts_with_stats,
-    get_post_stats_by_id,
-    get_most_engaged_posts,
+    get_trending_posts,
     get_posts_by_tag_with_stats
 )
 
 
-_table_initialized = False
+# ======================
+# LIST ALL POSTS
+# ======================
 
-def ensure_posts_table():
-    global _table_initialized
-    if not _table_initialized:
-        init_posts_table()
-        _table_initialized = True
+def posts_list_page(request):
+    posts, next_cursor = get_all_posts(limit=50, cursor_token=request.GET.get("cursor"))
+    sql_reactions.attach_viewer_reactions(get_jwt_user_id(request), posts)
+    return render(request, "posts/posts_list.html", {
+        "posts": posts,
+        "next_cursor": next_cursor,
+    })
 
 # ======================
-# LIST ALL POSTS
+# SEARCH (full-text, ranked)
 # ======================
+def search_page(request):
+    """Поиск постов по релевантности с подсветкой"""
+    query = request.GET.get("q", "").strip()
+    results, next_cursor = search_posts_ranked(query, limit=20, cursor_token=request.GET.get("cursor"))
+    return render(request, "posts/search.html", {
+        "query": query,
+        "results": results,
+        "next_cursor": next_cursor,
+    })
 
-def dict_fetchall(cursor):
-    """Преобразуем результат SQL в список словарей"""
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-def posts_list_page(request):
-    ensure_posts_table()
-    posts = get_all_posts(limit=50, offset=0)
-    return render(request, "posts/posts_list.html", {"posts": posts})
+@require_http_methods(["GET"])
+def search_api(request):
+    """JSON-вариант поиска: {"results": [...], "next_cursor": ...}"""
+    query = request.GET.get("q", "").strip()
+    results, next_cursor = search_posts_ranked(query, limit=20, cursor_token=request.GET.get("cursor"))
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
 
 # ======================
 # НОВОЕ: LIST POSTS WITH STATS
 # ======================
 def posts_list_with_stats_page(request):
     """Список постов со статистикой"""
-    ensure_posts_table()
     posts = get_posts_with_stats(limit=50, offset=0)
+    sql_reactions.attach_viewer_reactions(get_jwt_user_id(request), posts)
     return render(request, "posts/posts_list_stats.html", {"posts": posts})
 
 # ======================
 # НОВОЕ: TRENDING POSTS
 # ======================
 def trending_posts_page(request):
-    """Самые популярные посты"""
-    ensure_posts_table()
-    posts = get_most_engaged_posts(limit=20)
+    """Горячие посты: готовый список trending_posts (manage.py refresh_trending)"""
+    posts = get_trending_posts(limit=20)
+    sql_reactions.attach_viewer_reactions(get_jwt_user_id(request), posts)
     return render(request, "posts/trending.html", {"posts": posts})
 
 # ======================
 # LIST POSTS BY TAG
 # ======================
 def posts_by_tag_page(request, tag_name):
-    ensure_posts_table()
-    posts = get_posts_by_tag(tag_name)
+    posts, next_cursor = get_posts_by_tag(tag_name, limit=20, cursor_token=request.GET.get("cursor"))
+    sql_reactions.attach_viewer_reactions(get_jwt_user_id(request), posts)
     return render(request, "posts/posts_by_tag.html", {
         "posts": posts, 
-        "tag_name": tag_name
+        "tag_name": tag_name,
+        "next_cursor": next_cursor,
     })
 
 # ======================
@@ -86,8 +99,8 @@ def posts_by_tag_page(request, tag_name):
 # ======================
 def posts_by_tag_with_stats_page(request, tag_name):
     """Посты по тегу со статистикой"""
-    ensure_posts_table()
     posts = get_posts_by_tag_with_stats(tag_name, limit=50)
+    sql_reactions.attach_viewer_reactions(get_jwt_user_id(request), posts)
     return render(request, "posts/posts_by_tag_stats.html", {
         "posts": posts,
         "tag_name": tag_name
@@ -96,69 +109,67 @@ def posts_by_tag_with_stats_page(request, tag_name):
 # ======================
 # POST DETAIL WITH COMMENTS AND REACTIONS
 # ======================
-@jwt_required
+@jwt_token_required
 def post_detail_page(request, post_id):
     """
     Детальная страница поста с комментариями и реакциями
+    (один запрос get_post_detail_func)
     """
-    ensure_posts_table()
-    post = get_post_with_tags(post_id)
+    detail = get_post_detail(
+        post_id, request.user_id,
+        sql_comments.COMMENT_ROOTS_PAGE_SIZE,
+        sql_comments.COMMENT_THREAD_DEPTH,
+        sql_comments.COMMENT_CHILDREN_LIMIT,
+    )
+    if not detail["viewer_exists"]:
+        return redirect('login')
+
+    post = detail["post"]
     if not post:
         return render(request, "posts/post_not_found.html", status=404)
 
-    # ДОБАВЛЕНО: получаем статистику поста
-    post_stats = get_post_stats_by_id(post_id)
-    
-    comments_tree = sql_comments.get_comments_tree(post_id)
-
-    # Строим дерево комментариев
-    comments_dict = {c['id']: dict(c, children=[]) for c in comments_tree}
-    root_comments = []
-
-    for c in comments_tree:
-        if c['parent_id']:
-            parent = comments_dict.get(c['parent_id'])
-            if parent:
-                parent['children'].append(comments_dict[c['id']])
-        else:
-            root_comments.append(comments_dict[c['id']])
-
-    # Получаем реакции
-    reactions_stats = sql_reactions.get_post_reactions_stats(post_id)
-    likes_count = 0
-    loves_count = 0
-    dislikes_count = 0
-    
-    for stat in reactions_stats:
-        if stat['reaction_type'] == 'like':
-            likes_count = stat['count']
-        elif stat['reaction_type'] == 'love':
-            loves_count = stat['count']
-        elif stat['reaction_type'] == 'dislike':
-            dislikes_count = stat['count']
-
-    # Получаем реакцию текущего пользователя
-    user_id = request.session.get('user_id', 1)
-    user_reaction = sql_reactions.get_user_reaction_on_post(user_id, post_id)
+    post_stats = detail["stats"] or {}
+
+    # Только первая страница веток; остальное подгружается через comments API
+    root_comments, comments_next_cursor = sql_comments.build_comment_page(
+        detail["comments"], sql_comments.COMMENT_ROOTS_PAGE_SIZE, detail["comment_reactions"]
+    )
 
     return render(request, "posts/post_detail.html", {
         "post": post,
-        "post_stats": post_stats,  # ДОБАВЛЕНО
+        "post_stats": post_stats,
         "comments": root_comments,
+        "comments_next_cursor": comments_next_cursor,
         "current_user_id": request.user_id,
-        "likes_count": likes_count,
-        "loves_count": loves_count,
-        "dislikes_count": dislikes_count,
-        "user_reaction": user_reaction,
+        "likes_count": post_stats.get("likes_count", 0),
+        "loves_count": post_stats.get("loves_count", 0),
+        "dislikes_count": post_stats.get("dislikes_count", 0),
+        "user_reaction": detail["viewer_reaction"],
     })
 
+# ======================
+# POST COUNTS STREAM (SSE)
+# ======================
+async def post_events_stream(request, post_id):
+    """Счётчики реакций и комментариев поста в реальном времени (только под ASGI)"""
+    # require_http_methods в Django 4.2 не умеет async-view
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not isinstance(request, ASGIRequest):
+        # под WSGI поток занял бы воркер целиком; 204 - EventSource не переподключается
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(post_stats_events(post_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 # ======================
 # CREATE POST WITH TAGS
 # ======================
 @jwt_required
 @require_http_methods(["GET", "POST"])
 def post_create_page(request):
-    ensure_posts_table()
     tags = get_all_tags()
 
     if request.method == "POST":
@@ -186,8 +197,12 @@ def delete_post_view(request, post_id):
     try:
         deleted_id = delete_post_sql(post_id, user_id)
     except Exception as e:
-        posts = get_my_posts(user_id)
-        return render(request, "posts/my_posts.html", {"error": str(e), "posts": posts})
+        posts, next_cursor = get_my_posts(user_id, limit=20)
+        return render(request, "posts/my_posts.html", {
+            "error": str(e),
+            "posts": posts,
+            "next_cursor": next_cursor,
+        })
 
     return redirect("posts:my-posts")
 
@@ -196,7 +211,6 @@ def delete_post_view(request, post_id):
 # ======================
 @jwt_required
 def add_tag_to_post_view(request, post_id):
-    ensure_posts_table()
     if request.method == 'POST':
         tag_name = request.POST.get('tag_name', '').strip()
         if tag_name:
@@ -215,7 +229,6 @@ def add_tag_to_post_view(request, post_id):
 # ======================
 @jwt_required
 def remove_tag_from_post_view(request, post_id, tag_name):
-    ensure_posts_table()
     if request.method == 'POST':
         remove_tag_from_post(post_id, tag_name)
     
@@ -229,9 +242,12 @@ def remove_tag_from_post_view(request, post_id, tag_name):
 def my_posts_view(request):
     """HTTP-запрос для отображения только моих постов"""
     user_id = request.user_id
-    posts = get_my_posts(user_id)
+    posts, next_cursor = get_my_posts(user_id, limit=20, cursor_token=request.GET.get("cursor"))
     
-    return render(request, "posts/my_posts.html", {"posts": posts})
+    return render(request, "posts/my_posts.html", {
+        "posts": posts,
+        "next_cursor": next_cursor,
+    })
 
 # ======================
 # UPDATE POST
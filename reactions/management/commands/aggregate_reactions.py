@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from reactions.sql_reactions import apply_reaction_deltas, get_reaction_delta_lag
+
+# ключ pg_advisory_lock: один агрегатор на базу
+AGGREGATOR_LOCK_KEY = 7_301_013
+
+
+class Command(BaseCommand):
+    help = "Сворачивает reaction_deltas в post_stats / comments / profile / user_activity"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Свернуть всё накопленное и выйти",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=settings.REACTIONS_AGGREGATE_INTERVAL,
+            help="Пауза между проходами, сек",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Дельт за одну транзакцию",
+        )
+
+    def handle(self, *args, once, interval, batch_size, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (AGGREGATOR_LOCK_KEY,))
+            if not cursor.fetchone()[0]:
+                self.stdout.write(self.style.WARNING("⚠️ Another aggregator is running"))
+                return
+
+        try:
+            while True:
+                self.drain(batch_size)
+                if once:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (AGGREGATOR_LOCK_KEY,))
+
+    def drain(self, batch_size):
+        """Сворачивает пачки, пока очередь не опустеет"""
+        total = 0
+        started = time.monotonic()
+        while True:
+            # autocommit: каждая пачка - своя короткая транзакция
+            applied = apply_reaction_deltas(batch_size)
+            total += applied
+            if applied < batch_size:
+                break
+
+        lag = get_reaction_delta_lag()
+        if total:
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"✔ {total} deltas in {elapsed:.2f}s "
+                f"({total / max(elapsed, 1e-6):.0f}/s), pending {lag['pending']}"
+            )
+        if lag["oldest_age_seconds"] > settings.REACTIONS_MAX_LAG:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Aggregation lag {lag['oldest_age_seconds']:.1f}s "
+                f"exceeds {settings.REACTIONS_MAX_LAG}s"
+            ))
@@ -0,0 +1,97 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# (название, тип reactable_type, тип reaction_type)
+LAYOUTS = (
+    ("varchar", "VARCHAR(20)", "VARCHAR(20)"),
+    ("enum", "reactable_type_enum", "reaction_type_enum"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает VARCHAR и enum-кодирование типов реакций: размер таблицы, "
+        "индексов и время агрегации как в get_posts_with_reactions_func. "
+        "Данные синтетические во временных таблицах, всё откатывается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500_000)
+        parser.add_argument("--posts", type=int, default=10_000)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, rows, posts, runs, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            results = [self.bench(cursor, layout, rows, posts, runs) for layout in LAYOUTS]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{rows} reactions on {posts} posts, median of {runs} runs")
+        self.stdout.write(f"{'layout':<8} {'table':>10} {'indexes':>10} {'aggregate':>11}")
+        for name, table_size, index_size, seconds in results:
+            self.stdout.write(
+                f"{name:<8} {table_size / 2**20:>8.1f}MB {index_size / 2**20:>8.1f}MB "
+                f"{seconds * 1000:>9.1f}ms"
+            )
+
+        base, compact = results
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ enum: table {1 - compact[1] / base[1]:.0%} smaller, "
+            f"indexes {1 - compact[2] / base[2]:.0%} smaller, "
+            f"aggregate {base[3] / compact[3]:.2f}x"
+        ))
+
+    def bench(self, cursor, layout, rows, posts, runs):
+        name, reactable_type, reaction_type = layout
+        table = f"bench_reactions_{name}"
+        cursor.execute(f"""
+        CREATE TEMP TABLE {table} (
+            id INT PRIMARY KEY,
+            user_id INT NOT NULL,
+            reactable_type {reactable_type} NOT NULL,
+            reactable_id INT NOT NULL,
+            reaction_type {reaction_type} NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ON COMMIT DROP
+        """)
+        # детерминированно: один пользователь - не больше одной реакции на объект
+        cursor.execute(f"""
+        INSERT INTO {table}(id, user_id, reactable_type, reactable_id, reaction_type)
+        SELECT
+            i,
+            i / %s + 1,
+            (CASE WHEN i %% 4 = 0 THEN 'comment' ELSE 'post' END)::TEXT::{reactable_type},
+            i %% %s + 1,
+            (CASE i %% 7 WHEN 0 THEN 'dislike' WHEN 1 THEN 'love' WHEN 2 THEN 'love'
+                         ELSE 'like' END)::TEXT::{reaction_type}
+        FROM generate_series(0, %s - 1) AS i
+        """, (posts, posts, rows))
+        cursor.execute(f"CREATE UNIQUE INDEX ON {table}(user_id, reactable_type, reactable_id)")
+        cursor.execute(f"CREATE INDEX ON {table}(reactable_type, reactable_id)")
+        cursor.execute(f"ANALYZE {table}")
+
+        cursor.execute(
+            "SELECT pg_relation_size(%s::regclass), pg_indexes_size(%s::regclass)",
+            (table, table)
+        )
+        table_size, index_size = cursor.fetchone()
+
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            cursor.execute(f"""
+            SELECT
+                reactable_id,
+                COUNT(*) FILTER (WHERE reaction_type = 'like'),
+                COUNT(*) FILTER (WHERE reaction_type = 'love'),
+                COUNT(*) FILTER (WHERE reaction_type = 'dislike')
+            FROM {table}
+            WHERE reactable_type = 'post'
+            GROUP BY reactable_id
+            """)
+            cursor.fetchall()
+            timings.append(time.perf_counter() - started)
+
+        return name, table_size, index_size, statistics.median(timings)
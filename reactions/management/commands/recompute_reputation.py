@@ -0,0 +1,81 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from db.pool import close_pools
+
+
+def _init_worker():
+    # spawn-платформы стартуют чистый интерпретатор; при fork это no-op
+    django.setup()
+
+
+def _recompute_batch(user_from, user_to, apply):
+    """Одна пачка в отдельном процессе: (user_from, user_to, drift)"""
+    from reactions.sql_reactions import repair_reputation_range
+    return user_from, user_to, repair_reputation_range(user_from, user_to, apply)
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает profile.reputation из таблицы reactions и исправляет расхождения"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Диапазон user_id на одну пачку",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Число процессов",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать расхождения",
+        )
+
+    def handle(self, *args, batch_size, workers, dry_run, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT MIN(user_id), MAX(user_id), COUNT(*) FROM profile")
+            min_id, max_id, total_users = cursor.fetchone()
+        if not total_users:
+            self.stdout.write("✔ no profiles")
+            return
+
+        ranges = [
+            (start, start + batch_size)
+            for start in range(min_id, max_id + 1, batch_size)
+        ]
+        # дочерние процессы не должны делить сокет родителя
+        connections.close_all()
+        close_pools()
+
+        started = time.monotonic()
+        drifted = 0
+        points = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(_recompute_batch, user_from, user_to, not dry_run)
+                for user_from, user_to in ranges
+            ]
+            for future in as_completed(futures):
+                user_from, user_to, drift = future.result()
+                drifted += len(drift)
+                points += sum(abs(row["expected"] - row["reputation"]) for row in drift)
+                for row in drift[:5]:
+                    self.stdout.write(
+                        f"  user {row['user_id']}: {row['reputation']} -> {row['expected']}"
+                    )
+                if len(drift) > 5:
+                    self.stdout.write(f"  ... {len(drift) - 5} more in [{user_from}, {user_to})")
+
+        elapsed = time.monotonic() - started
+        action = "would fix" if dry_run else "fixed"
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {total_users} users in {len(ranges)} batches, {elapsed:.2f}s "
+            f"({total_users / max(elapsed, 1e-6):.0f} users/s); "
+            f"{action} {drifted} users, {points} points"
+        ))
@@ -1,179 +1,300 @@
-from django.db import connection
+import logging
 
-# =========================
-# Utils
-# =========================
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
 
-def dict_fetchone(cursor):
-    row = cursor.fetchone()
-    if row is None:
-        return None
-    desc = cursor.description
-    return {desc[i].name: row[i] for i in range(len(row))}
-
-def dict_fetchall(cursor):
-    rows = cursor.fetchall()
-    desc = cursor.description
-    return [
-        {desc[i].name: row[i] for i in range(len(row))}
-        for row in rows
-    ]
+from db.access import PreparedStatement, call_all, call_one, call_value, fetch_all, fetch_one, tuple_row
+from posts.sql_posts import decode_count_cursor, decode_cursor, encode_count_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
 
 # =========================
 # Init reactions table + SQL logic
 # =========================
 
+# Порядок значений = порядок меток enum в Postgres (сравнение и сортировка по нему)
+REACTABLE_TYPES = ('post', 'comment')
+REACTION_TYPES = ('like', 'love', 'dislike')
+
+
+def create_reaction_enums(cursor):
+    """
+    reactable_type / reaction_type хранятся как enum (4 байта, сравнение по OID)
+    вместо VARCHAR(20). Строковые литералы 'post' / 'like' в SQL работают как раньше.
+    """
+    for type_name, labels in (
+        ('reactable_type_enum', REACTABLE_TYPES),
+        ('reaction_type_enum', REACTION_TYPES),
+    ):
+        cursor.execute("SELECT to_regtype(%s)", (type_name,))
+        if cursor.fetchone()[0] is None:
+            labels_sql = ", ".join(f"'{label}'" for label in labels)
+            cursor.execute(f"CREATE TYPE {type_name} AS ENUM ({labels_sql})")
+
+
+def create_reactions_partitions(cursor):
+    """
+    reactions - LIST-партиции по reactable_type: reactions_post / reactions_comment.
+    У каждой партиции настоящий FK на свою таблицу (вместо триггера validate_reaction_fk),
+    свой индекс по reactable_id и свой autovacuum.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS reactions (
+        id SERIAL,
+        user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        reactable_type reactable_type_enum NOT NULL,
+        reactable_id INT NOT NULL CHECK (reactable_id > 0),
+        reaction_type reaction_type_enum NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, reactable_type),
+        UNIQUE(user_id, reactable_type, reactable_id)
+    ) PARTITION BY LIST (reactable_type);
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS reactions_post PARTITION OF reactions (
+        CONSTRAINT reactions_post_reactable_fk
+            FOREIGN KEY (reactable_id) REFERENCES posts(id) ON DELETE CASCADE
+    ) FOR VALUES IN ('post');
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS reactions_comment PARTITION OF reactions (
+        CONSTRAINT reactions_comment_reactable_fk
+            FOREIGN KEY (reactable_id) REFERENCES comments(id) ON DELETE CASCADE
+    ) FOR VALUES IN ('comment');
+    """)
+    # внутри партиции reactable_type константа: хватает reactable_id
+    # (им же пользуется каскадное удаление поста / комментария)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_reactions_target
+    ON reactions(reactable_id);
+    """)
+
+
+def migrate_reactions_to_partitions(cursor):
+    """
+    Старая таблица reactions (обычная или с VARCHAR-типами) -> партиционированная с enum.
+    Строки на удалённые посты/комментарии (сироты) не переносятся и вычитаются
+    из user_activity.reactions_given. Зависящие от reactions представления
+    удаляются - init_post_stats / init_user_activity создают их заново.
+    Триггеры других модулей (post_stats, user_activity, счётчики комментариев)
+    переносятся после копирования данных, чтобы копия не пересчитывала счётчики.
+    """
+    cursor.execute("""
+    SELECT c.relkind, a.atttypid::regtype::TEXT
+    FROM pg_class c
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = 'reaction_type'
+    WHERE c.oid = to_regclass('reactions')
+    """)
+    row = cursor.fetchone()
+    if not row or row == ('p', 'reaction_type_enum'):
+        return False
+
+    with transaction.atomic():
+        cursor.execute("LOCK TABLE reactions IN ACCESS EXCLUSIVE MODE")
+        # представления поверх старой таблицы (posts_with_stats, user_activity_summary)
+        # не дали бы удалить reactions_legacy; их пересоздают следующие шаги
+        cursor.execute("""
+        DO $$
+        DECLARE
+            v_view REGCLASS;
+        BEGIN
+            FOR v_view IN
+                SELECT DISTINCT rw.ev_class::REGCLASS
+                FROM pg_depend d
+                JOIN pg_rewrite rw ON rw.oid = d.objid
+                WHERE d.classid = 'pg_rewrite'::regclass
+                  AND rw.ev_class <> d.refobjid
+                  AND (d.refobjid = 'reactions'::regclass
+                       OR d.refobjid IN (
+                           SELECT inhrelid FROM pg_inherits
+                           WHERE inhparent = 'reactions'::regclass
+                       ))
+            LOOP
+                EXECUTE format('DROP VIEW IF EXISTS %s CASCADE', v_view);
+            END LOOP;
+        END;
+        $$;
+        """)
+        cursor.execute("ALTER TABLE reactions RENAME TO reactions_legacy")
+        cursor.execute("ALTER SEQUENCE IF EXISTS reactions_id_seq RENAME TO reactions_legacy_id_seq")
+        # имена партиций и индексов уникальны в схеме - освобождаем их для новой таблицы
+        cursor.execute("""
+        DO $$
+        DECLARE
+            v_rel REGCLASS;
+            v_name TEXT;
+        BEGIN
+            FOR v_name IN
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'reactions_legacy'::regclass
+            LOOP
+                EXECUTE format('ALTER TABLE %I RENAME TO %I', v_name, v_name || '_legacy');
+            END LOOP;
+
+            FOR v_name IN
+                SELECT c.relname FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = 'reactions_legacy'::regclass
+                   OR i.indrelid IN (
+                       SELECT inhrelid FROM pg_inherits
+                       WHERE inhparent = 'reactions_legacy'::regclass
+                   )
+            LOOP
+                EXECUTE format('ALTER INDEX %I RENAME TO %I', v_name, v_name || '_legacy');
+            END LOOP;
+
+            -- FK и CHECK тоже: иначе новые получат имя с суффиксом (reactions_user_id_fkey1).
+            -- Унаследованный CHECK партиции переименуется вместе с родительским
+            FOR v_rel, v_name IN
+                SELECT con.conrelid::REGCLASS, con.conname FROM pg_constraint con
+                WHERE (con.contype = 'f' OR (con.contype = 'c' AND con.coninhcount = 0))
+                  AND (con.conrelid = 'reactions_legacy'::regclass
+                       OR con.conrelid IN (
+                           SELECT inhrelid FROM pg_inherits
+                           WHERE inhparent = 'reactions_legacy'::regclass
+                       ))
+            LOOP
+                EXECUTE format('ALTER TABLE %s RENAME CONSTRAINT %I TO %I',
+                               v_rel, v_name, v_name || '_legacy');
+            END LOOP;
+        END;
+        $$;
+        """)
+
+        create_reactions_partitions(cursor)
+        cursor.execute("""
+        INSERT INTO reactions(id, user_id, reactable_type, reactable_id, reaction_type, created_at)
+        SELECT
+            r.id, r.user_id,
+            r.reactable_type::TEXT::reactable_type_enum,
+            r.reactable_id,
+            r.reaction_type::TEXT::reaction_type_enum,
+            r.created_at
+        FROM reactions_legacy r
+        WHERE (r.reactable_type = 'post' AND EXISTS (SELECT 1 FROM posts p WHERE p.id = r.reactable_id))
+           OR (r.reactable_type = 'comment' AND EXISTS (SELECT 1 FROM comments c WHERE c.id = r.reactable_id))
+        """)
+        copied = cursor.rowcount
+        # сироты уже посчитаны в user_activity.reactions_given - вычитаем их
+        cursor.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('user_activity') IS NOT NULL THEN
+                UPDATE user_activity ua
+                SET reactions_given = ua.reactions_given - o.cnt
+                FROM (
+                    SELECT r.user_id, COUNT(*) AS cnt
+                    FROM reactions_legacy r
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM reactions n
+                        WHERE n.id = r.id
+                          AND n.reactable_type = r.reactable_type::TEXT::reactable_type_enum
+                    )
+                    GROUP BY r.user_id
+                ) o
+                WHERE ua.user_id = o.user_id;
+            END IF;
+        END;
+        $$;
+        """)
+        cursor.execute("""
+        SELECT setval(pg_get_serial_sequence('reactions', 'id'),
+                      GREATEST((SELECT MAX(id) FROM reactions_legacy), 1))
+        """)
+
+        cursor.execute("""
+        DO $$
+        DECLARE
+            v_def TEXT;
+        BEGIN
+            FOR v_def IN
+                SELECT pg_get_triggerdef(t.oid) FROM pg_trigger t
+                WHERE t.tgrelid = 'reactions_legacy'::regclass
+                  AND NOT t.tgisinternal
+                  AND t.tgname <> 'trg_validate_reaction'
+            LOOP
+                EXECUTE regexp_replace(v_def, ' ON (public\.)?reactions_legacy ', ' ON reactions ');
+            END LOOP;
+        END;
+        $$;
+        """)
+        cursor.execute("DROP TABLE reactions_legacy")
+
+    print(f"✔ reactions migrated to partitions ({copied} rows)")
+    return True
+
+
 def init_reactions_table():
     with connection.cursor() as cursor:
         # -------------------------
-        # REACTIONS TABLE
+        # REACTIONS TABLE (партиции post / comment)
         # -------------------------
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS reactions (
-            id SERIAL PRIMARY KEY,
-            user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-            reactable_type VARCHAR(20) NOT NULL CHECK (reactable_type IN ('post', 'comment')),
-            reactable_id INT NOT NULL CHECK (reactable_id > 0),
-            reaction_type VARCHAR(20) NOT NULL CHECK (reaction_type IN ('like', 'love', 'dislike')),
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, reactable_type, reactable_id)
-        );
-        """)
+        create_reaction_enums(cursor)
+        migrate_reactions_to_partitions(cursor)
+        create_reactions_partitions(cursor)
 
         # -------------------------
-        # REPUTATION UPDATE TRIGGER (УЛУЧШЕННАЯ ВЕРСИЯ)
+        # REPUTATION UPDATE TRIGGER: один UPDATE profile на строку.
+        # Трассировка только при reverence.trace_reactions = on (settings.REACTIONS_TRACE)
         # -------------------------
+        cursor.execute("DROP FUNCTION IF EXISTS reaction_weight(VARCHAR)")
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION reaction_weight(p_reaction_type reaction_type_enum)
+        RETURNS INT AS $$
+            SELECT CASE p_reaction_type
+                WHEN 'like' THEN 1
+                WHEN 'love' THEN 2
+                WHEN 'dislike' THEN -1
+                ELSE 0
+            END;
+        $$ LANGUAGE sql IMMUTABLE;
+        """)
+
         cursor.execute("""
         CREATE OR REPLACE FUNCTION update_reputation_on_reaction()
         RETURNS TRIGGER AS $$
         DECLARE
-            owner_id INT;
-            old_reputation_change INT := 0;
-            new_reputation_change INT := 0;
-            total_change INT := 0;
-            current_reputation INT;
+            v_delta INT := 0;
+            v_owner_id INT;
         BEGIN
-            RAISE NOTICE '========================================';
-            RAISE NOTICE 'TRIGGER FIRED: % operation', TG_OP;
-            
-            -- Определяем владельца контента
-            IF COALESCE(NEW.reactable_type, OLD.reactable_type) = 'post' THEN
-                SELECT author_id INTO owner_id 
-                FROM posts 
-                WHERE id = COALESCE(NEW.reactable_id, OLD.reactable_id);
-                RAISE NOTICE 'Post owner_id: %', owner_id;
-            ELSIF COALESCE(NEW.reactable_type, OLD.reactable_type) = 'comment' THEN
-                SELECT user_id INTO owner_id 
-                FROM comments 
-                WHERE id = COALESCE(NEW.reactable_id, OLD.reactable_id);
-                RAISE NOTICE 'Comment owner_id: %', owner_id;
+            IF TG_OP <> 'INSERT' THEN
+                v_delta := v_delta - reaction_weight(OLD.reaction_type);
             END IF;
-
-            -- Проверяем, найден ли владелец
-            IF owner_id IS NULL THEN
-                RAISE NOTICE 'WARNING: owner_id is NULL - content not found!';
-                IF TG_OP = 'DELETE' THEN
-                    RETURN OLD;
-                ELSE
-                    RETURN NEW;
-                END IF;
+            IF TG_OP <> 'DELETE' THEN
+                v_delta := v_delta + reaction_weight(NEW.reaction_type);
             END IF;
 
-            -- Не даем самому себе менять репутацию
-            IF owner_id = COALESCE(NEW.user_id, OLD.user_id) THEN
-                RAISE NOTICE 'User % trying to react to own content - skipping reputation change', owner_id;
-                IF TG_OP = 'DELETE' THEN
-                    RETURN OLD;
-                ELSE
-                    RETURN NEW;
-                END IF;
+            -- write-behind: репутацию догонит aggregate_reactions
+            IF v_delta <> 0 AND current_setting('reverence.reaction_write_behind', true) IS DISTINCT FROM 'on' THEN
+                -- владелец контента; на свой контент репутация не меняется
+                UPDATE profile pr
+                SET reputation = pr.reputation + v_delta
+                WHERE pr.user_id = CASE COALESCE(NEW.reactable_type, OLD.reactable_type)
+                        WHEN 'post' THEN (
+                            SELECT p.author_id FROM posts p
+                            WHERE p.id = COALESCE(NEW.reactable_id, OLD.reactable_id))
+                        WHEN 'comment' THEN (
+                            SELECT c.user_id FROM comments c
+                            WHERE c.id = COALESCE(NEW.reactable_id, OLD.reactable_id))
+                    END
+                  AND pr.user_id <> COALESCE(NEW.user_id, OLD.user_id)
+                RETURNING pr.user_id INTO v_owner_id;
             END IF;
 
-            -- Получаем текущую репутацию
-            SELECT reputation INTO current_reputation FROM profile WHERE user_id = owner_id;
-            RAISE NOTICE 'Current reputation of user %: %', owner_id, current_reputation;
-
-            -- INSERT: добавляем репутацию
-            IF TG_OP = 'INSERT' THEN
-                new_reputation_change := CASE 
-                    WHEN NEW.reaction_type = 'like' THEN 1
-                    WHEN NEW.reaction_type = 'love' THEN 2
-                    WHEN NEW.reaction_type = 'dislike' THEN -1
-                    ELSE 0
-                END;
-                
-                RAISE NOTICE 'INSERT: user_id=%, reactable_type=%, reactable_id=%, reaction=%', 
-                    NEW.user_id, NEW.reactable_type, NEW.reactable_id, NEW.reaction_type;
-                RAISE NOTICE 'INSERT: Adding % reputation to user %', new_reputation_change, owner_id;
-                
-                UPDATE profile 
-                SET reputation = reputation + new_reputation_change 
-                WHERE user_id = owner_id;
-                
-                SELECT reputation INTO current_reputation FROM profile WHERE user_id = owner_id;
-                RAISE NOTICE 'New reputation after INSERT: %', current_reputation;
-                
-            -- DELETE: убираем репутацию
-            ELSIF TG_OP = 'DELETE' THEN
-                old_reputation_change := CASE 
-                    WHEN OLD.reaction_type = 'like' THEN -1
-                    WHEN OLD.reaction_type = 'love' THEN -2
-                    WHEN OLD.reaction_type = 'dislike' THEN 1
-                    ELSE 0
-                END;
-                
-                RAISE NOTICE 'DELETE: user_id=%, reactable_type=%, reactable_id=%, reaction=%', 
-                    OLD.user_id, OLD.reactable_type, OLD.reactable_id, OLD.reaction_type;
-                RAISE NOTICE 'DELETE: Changing reputation by % for user %', old_reputation_change, owner_id;
-                
-                UPDATE profile 
-                SET reputation = reputation + old_reputation_change 
-                WHERE user_id = owner_id;
-                
-                SELECT reputation INTO current_reputation FROM profile WHERE user_id = owner_id;
-                RAISE NOTICE 'New reputation after DELETE: %', current_reputation;
-                
-            -- UPDATE: отменяем старую и добавляем новую
-            ELSIF TG_OP = 'UPDATE' THEN
-                -- Отменяем старую реакцию
-                old_reputation_change := CASE 
-                    WHEN OLD.reaction_type = 'like' THEN -1
-                    WHEN OLD.reaction_type = 'love' THEN -2
-                    WHEN OLD.reaction_type = 'dislike' THEN 1
-                    ELSE 0
-                END;
-                
-                -- Добавляем новую реакцию
-                new_reputation_change := CASE 
-                    WHEN NEW.reaction_type = 'like' THEN 1
-                    WHEN NEW.reaction_type = 'love' THEN 2
-                    WHEN NEW.reaction_type = 'dislike' THEN -1
-                    ELSE 0
-                END;
-                
-                total_change := old_reputation_change + new_reputation_change;
-                
-                RAISE NOTICE 'UPDATE: user_id=%, reactable_type=%, reactable_id=%', 
-                    NEW.user_id, NEW.reactable_type, NEW.reactable_id;
-                RAISE NOTICE 'UPDATE: Changing from % to % for user %, total change: %', 
-                    OLD.reaction_type, NEW.reaction_type, owner_id, total_change;
-                
-                -- Применяем изменение
-                UPDATE profile 
-                SET reputation = reputation + total_change
-                WHERE user_id = owner_id;
-                
-                SELECT reputation INTO current_reputation FROM profile WHERE user_id = owner_id;
-                RAISE NOTICE 'New reputation after UPDATE: %', current_reputation;
+            IF current_setting('reverence.trace_reactions', true) = 'on' THEN
+                RAISE NOTICE 'reaction_trace op=% reactor=% target=%:% old=% new=% owner=% delta=%',
+                    TG_OP,
+                    COALESCE(NEW.user_id, OLD.user_id),
+                    COALESCE(NEW.reactable_type, OLD.reactable_type),
+                    COALESCE(NEW.reactable_id, OLD.reactable_id),
+                    CASE WHEN TG_OP <> 'INSERT' THEN OLD.reaction_type END,
+                    CASE WHEN TG_OP <> 'DELETE' THEN NEW.reaction_type END,
+                    v_owner_id,
+                    v_delta;
             END IF;
 
-            RAISE NOTICE '========================================';
-
-            IF TG_OP = 'DELETE' THEN
-                RETURN OLD;
-            ELSE
-                RETURN NEW;
-            END IF;
+            RETURN NULL;
         END;
         $$ LANGUAGE plpgsql;
         """)
@@ -186,56 +307,8 @@ def init_reactions_table():
         EXECUTE FUNCTION update_reputation_on_reaction();
         """)
 
-        # -------------------------
-        # FOREIGN KEY VALIDATION
-        # -------------------------
-        cursor.execute("""
-        CREATE OR REPLACE FUNCTION validate_reaction_fk()
-        RETURNS TRIGGER AS $$
-        BEGIN
-            IF (NEW.reactable_type = 'post') THEN
-                PERFORM 1 FROM posts WHERE id = NEW.reactable_id;
-                IF NOT FOUND THEN
-                    RAISE EXCEPTION 'Post id % does not exist', NEW.reactable_id;
-                END IF;
-            ELSIF (NEW.reactable_type = 'comment') THEN
-                PERFORM 1 FROM comments WHERE id = NEW.reactable_id;
-                IF NOT FOUND THEN
-                    RAISE EXCEPTION 'Comment id % does not exist', NEW.reactable_id;
-                END IF;
-            END IF;
-            RETURN NEW;
-        END;
-        $$ LANGUAGE plpgsql;
-        """)
-
-        cursor.execute("""
-        DROP TRIGGER IF EXISTS trg_validate_reaction ON reactions;
-        CREATE TRIGGER trg_validate_reaction
-        BEFORE INSERT ON reactions
-        FOR EACH ROW
-        EXECUTE FUNCTION validate_reaction_fk();
-        """)
-
-        # -------------------------
-        # INDEXES
-        # -------------------------
-        cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_reactions_post 
-        ON reactions(reactable_type, reactable_id) 
-        WHERE reactable_type = 'post';
-        """)
-        
-        cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_reactions_comment 
-        ON reactions(reactable_type, reactable_id) 
-        WHERE reactable_type = 'comment';
-        """)
-
-        cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_reactions_user 
-        ON reactions(user_id);
-        """)
+        # FK теперь на партициях - старый триггер-проверка не нужен
+        cursor.execute("DROP FUNCTION IF EXISTS validate_reaction_fk() CASCADE")
 
         # =========================
         # ADD OR UPDATE REACTION
@@ -250,15 +323,16 @@ def init_reactions_table():
         )
         RETURNS TABLE(r_id INT, r_user_id INT, r_reactable_type VARCHAR, r_reactable_id INT, r_reaction_type VARCHAR) AS $$
         BEGIN
-            RAISE NOTICE 'add_or_update_reaction_func called: user_id=%, type=%, id=%, reaction=%', 
-                p_user_id, p_reactable_type, p_reactable_id, p_reaction_type;
-            
             RETURN QUERY
             INSERT INTO reactions(user_id, reactable_type, reactable_id, reaction_type, created_at)
-            VALUES (p_user_id, p_reactable_type, p_reactable_id, p_reaction_type, NOW())
+            VALUES (
+                p_user_id, p_reactable_type::reactable_type_enum, p_reactable_id,
+                p_reaction_type::reaction_type_enum, NOW()
+            )
             ON CONFLICT (user_id, reactable_type, reactable_id) 
             DO UPDATE SET reaction_type = EXCLUDED.reaction_type, created_at = NOW()
-            RETURNING reactions.id, reactions.user_id, reactions.reactable_type, reactions.reactable_id, reactions.reaction_type;
+            RETURNING reactions.id, reactions.user_id, reactions.reactable_type::VARCHAR,
+                      reactions.reactable_id, reactions.reaction_type::VARCHAR;
         END;
         $$ LANGUAGE plpgsql;
         """)
@@ -277,22 +351,79 @@ def init_reactions_table():
         DECLARE
             deleted BOOLEAN := FALSE;
         BEGIN
-            RAISE NOTICE 'remove_reaction_func called: user_id=%, type=%, id=%', 
-                p_user_id, p_reactable_type, p_reactable_id;
-            
             DELETE FROM reactions 
             WHERE user_id = p_user_id 
-              AND reactable_type = p_reactable_type 
+              AND reactable_type = p_reactable_type::reactable_type_enum 
               AND reactable_id = p_reactable_id;
             
-            IF FOUND THEN
-                deleted := TRUE;
-                RAISE NOTICE 'Reaction deleted successfully';
+            deleted := FOUND;
+            RETURN deleted;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+
+        # =========================
+        # TOGGLE REACTION: удалить / поставить / сменить одним запросом
+        # =========================
+        cursor.execute("DROP FUNCTION IF EXISTS toggle_reaction_func(INT, VARCHAR, INT, VARCHAR)")
+        cursor.execute("""
+        CREATE FUNCTION toggle_reaction_func(
+            p_user_id INT,
+            p_reactable_type VARCHAR,
+            p_reactable_id INT,
+            p_reaction_type VARCHAR
+        )
+        RETURNS TABLE(
+            viewer_reaction VARCHAR,
+            likes_count INT,
+            loves_count INT,
+            dislikes_count INT,
+            post_id INT
+        ) AS $$
+        DECLARE
+            v_state VARCHAR;
+        BEGIN
+            -- та же реакция -> DELETE, иначе upsert; решение в одном statement,
+            -- конкурентные клики упираются в UNIQUE и блокировку строки
+            WITH removed AS (
+                DELETE FROM reactions r
+                WHERE r.user_id = p_user_id
+                  AND r.reactable_type = p_reactable_type::reactable_type_enum
+                  AND r.reactable_id = p_reactable_id
+                  AND r.reaction_type = p_reaction_type::reaction_type_enum
+                RETURNING r.id
+            ),
+            upserted AS (
+                INSERT INTO reactions(user_id, reactable_type, reactable_id, reaction_type, created_at)
+                SELECT
+                    p_user_id, p_reactable_type::reactable_type_enum, p_reactable_id,
+                    p_reaction_type::reaction_type_enum, NOW()
+                WHERE NOT EXISTS (SELECT 1 FROM removed)
+                ON CONFLICT (user_id, reactable_type, reactable_id)
+                DO UPDATE SET reaction_type = EXCLUDED.reaction_type, created_at = NOW()
+                RETURNING reactions.reaction_type
+            )
+            SELECT u.reaction_type INTO v_state FROM upserted u;
+
+            -- счётчики уже обновлены триггерами
+            -- + ещё не свёрнутые дельты (write-behind), чтобы ответ видел свой клик
+            IF p_reactable_type = 'post' THEN
+                RETURN QUERY
+                SELECT v_state,
+                       s.likes_count + pd.likes, s.loves_count + pd.loves,
+                       s.dislikes_count + pd.dislikes, s.post_id
+                FROM post_stats s
+                CROSS JOIN pending_reaction_deltas(p_reactable_type, p_reactable_id) pd
+                WHERE s.post_id = p_reactable_id;
             ELSE
-                RAISE NOTICE 'No reaction found to delete';
+                RETURN QUERY
+                SELECT v_state,
+                       c.likes_count + pd.likes, c.loves_count + pd.loves,
+                       c.dislikes_count + pd.dislikes, c.post_id
+                FROM comments c
+                CROSS JOIN pending_reaction_deltas(p_reactable_type, p_reactable_id) pd
+                WHERE c.id = p_reactable_id;
             END IF;
-            
-            RETURN deleted;
         END;
         $$ LANGUAGE plpgsql;
         """)
@@ -304,14 +435,16 @@ def init_reactions_table():
         cursor.execute("""
         CREATE FUNCTION get_post_reactions_stats_func(p_post_id INT)
         RETURNS TABLE(reaction_type VARCHAR, count BIGINT) AS $$
-        BEGIN
-            RETURN QUERY
-            SELECT r.reaction_type, COUNT(*) as count
-            FROM reactions r
-            WHERE r.reactable_type = 'post' AND r.reactable_id = p_post_id
-            GROUP BY r.reaction_type;
-        END;
-        $$ LANGUAGE plpgsql;
+            -- счётчики ведут триггеры post_stats
+            SELECT v.reaction_type, v.count
+            FROM post_stats s
+            CROSS JOIN LATERAL (VALUES
+                ('like'::VARCHAR, s.likes_count::BIGINT),
+                ('love'::VARCHAR, s.loves_count::BIGINT),
+                ('dislike'::VARCHAR, s.dislikes_count::BIGINT)
+            ) AS v(reaction_type, count)
+            WHERE s.post_id = p_post_id AND v.count > 0;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -321,14 +454,16 @@ def init_reactions_table():
         cursor.execute("""
         CREATE FUNCTION get_comment_reactions_stats_func(p_comment_id INT)
         RETURNS TABLE(reaction_type VARCHAR, count BIGINT) AS $$
-        BEGIN
-            RETURN QUERY
-            SELECT r.reaction_type, COUNT(*) as count
-            FROM reactions r
-            WHERE r.reactable_type = 'comment' AND r.reactable_id = p_comment_id
-            GROUP BY r.reaction_type;
-        END;
-        $$ LANGUAGE plpgsql;
+            -- счётчики ведут триггеры comment_counters
+            SELECT v.reaction_type, v.count
+            FROM comments c
+            CROSS JOIN LATERAL (VALUES
+                ('like'::VARCHAR, c.likes_count::BIGINT),
+                ('love'::VARCHAR, c.loves_count::BIGINT),
+                ('dislike'::VARCHAR, c.dislikes_count::BIGINT)
+            ) AS v(reaction_type, count)
+            WHERE c.id = p_comment_id AND v.count > 0;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -338,18 +473,12 @@ def init_reactions_table():
         cursor.execute("""
         CREATE FUNCTION get_user_reaction_on_post_func(p_user_id INT, p_post_id INT)
         RETURNS VARCHAR AS $$
-        DECLARE
-            reaction VARCHAR;
-        BEGIN
-            SELECT reaction_type INTO reaction
+            SELECT reaction_type::VARCHAR
             FROM reactions
             WHERE user_id = p_user_id 
               AND reactable_type = 'post' 
               AND reactable_id = p_post_id;
-            
-            RETURN reaction;
-        END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -359,79 +488,403 @@ def init_reactions_table():
         cursor.execute("""
         CREATE FUNCTION get_user_reaction_on_comment_func(p_user_id INT, p_comment_id INT)
         RETURNS VARCHAR AS $$
-        DECLARE
-            reaction VARCHAR;
-        BEGIN
-            SELECT reaction_type INTO reaction
+            SELECT reaction_type::VARCHAR
             FROM reactions
             WHERE user_id = p_user_id 
               AND reactable_type = 'comment' 
               AND reactable_id = p_comment_id;
-            
-            RETURN reaction;
-        END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+        # =========================
+        # GET USER REACTIONS (batch): реакции пользователя на список постов/комментариев
+        # одним проходом по UNIQUE(user_id, reactable_type, reactable_id)
+        # =========================
+        cursor.execute("DROP FUNCTION IF EXISTS get_user_reactions_func(INT, VARCHAR, INT[])")
+        cursor.execute("""
+        CREATE FUNCTION get_user_reactions_func(
+            p_user_id INT,
+            p_reactable_type VARCHAR,
+            p_reactable_ids INT[]
+        )
+        RETURNS TABLE(reactable_id INT, reaction_type VARCHAR) AS $$
+            SELECT r.reactable_id, r.reaction_type::VARCHAR
+            FROM reactions r
+            WHERE r.user_id = p_user_id
+              AND r.reactable_type = p_reactable_type::reactable_type_enum
+              AND r.reactable_id = ANY(p_reactable_ids);
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
-        # GET POSTS WITH REACTIONS
+        # GET POSTS WITH REACTIONS: страница постов + счётчики из post_stats
+        # recent    - по (created_at, id), idx_posts_created_id
+        # reactions - по (total_reactions, post_id), idx_post_stats_total_reactions
         # =========================
         cursor.execute("DROP FUNCTION IF EXISTS get_posts_with_reactions_func()")
+        cursor.execute("DROP FUNCTION IF EXISTS get_posts_with_reactions_func(INT, VARCHAR, TIMESTAMP, INT, INT)")
         cursor.execute("""
-        CREATE FUNCTION get_posts_with_reactions_func()
+        CREATE FUNCTION get_posts_with_reactions_func(
+            p_limit INT,
+            p_sort VARCHAR DEFAULT 'recent',
+            p_cursor_created_at TIMESTAMP DEFAULT NULL,
+            p_cursor_total INT DEFAULT NULL,
+            p_cursor_id INT DEFAULT NULL
+        )
         RETURNS TABLE(
             id INT,
             title VARCHAR,
             content TEXT,
             author_id INT,
             created_at TIMESTAMP,
-            likes_count BIGINT,
-            loves_count BIGINT,
-            dislikes_count BIGINT
+            likes_count INT,
+            loves_count INT,
+            dislikes_count INT,
+            total_reactions INT
         ) AS $$
+            -- ветка по p_sort - One-Time Filter: после подстановки константы
+            -- планировщик выполняет только одну из них
+            (
+                SELECT
+                    p.id, p.title, p.content, p.author_id, p.created_at,
+                    s.likes_count, s.loves_count, s.dislikes_count, s.total_reactions
+                FROM post_stats s
+                JOIN posts p ON p.id = s.post_id
+                WHERE p_sort = 'reactions'
+                  AND (p_cursor_id IS NULL
+                       OR (s.total_reactions, s.post_id) < (p_cursor_total, p_cursor_id))
+                ORDER BY s.total_reactions DESC, s.post_id DESC
+                LIMIT p_limit
+            )
+            UNION ALL
+            (
+                SELECT
+                    p.id, p.title, p.content, p.author_id, p.created_at,
+                    s.likes_count, s.loves_count, s.dislikes_count, s.total_reactions
+                FROM posts p
+                JOIN post_stats s ON s.post_id = p.id
+                WHERE p_sort IS DISTINCT FROM 'reactions'
+                  AND (p_cursor_id IS NULL
+                       OR (p.created_at, p.id) < (p_cursor_created_at, p_cursor_id))
+                ORDER BY p.created_at DESC, p.id DESC
+                LIMIT p_limit
+            );
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+    connection.commit()
+    print("✔ reactions table + SQL functions initialized")
+
+
+# =========================
+# Write-behind: журнал дельт реакций + агрегатор
+# =========================
+def init_reaction_deltas():
+    """
+    При reverence.reaction_write_behind = on (settings.REACTIONS_WRITE_BEHIND)
+    триггеры не трогают горячие строки profile / post_stats / comments / user_activity,
+    а пишут дельту в reaction_deltas. manage.py aggregate_reactions сворачивает их пачками.
+    Нужны post_stats и user_activity, поэтому вызывается после их init.
+    Таблица reaction_deltas (append-only, без FK) - db/init/014_reaction_deltas.sql.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION reaction_deltas_on_reaction()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            v_old_type VARCHAR;
+            v_new_type VARCHAR;
         BEGIN
-            RETURN QUERY
-            SELECT 
-                p.id,
-                p.title,
-                p.content,
-                p.author_id,
-                p.created_at,
-                COUNT(CASE WHEN r.reaction_type = 'like' THEN 1 END) as likes_count,
-                COUNT(CASE WHEN r.reaction_type = 'love' THEN 1 END) as loves_count,
-                COUNT(CASE WHEN r.reaction_type = 'dislike' THEN 1 END) as dislikes_count
-            FROM posts p
-            LEFT JOIN reactions r ON r.reactable_type = 'post' AND r.reactable_id = p.id
-            GROUP BY p.id, p.title, p.content, p.author_id, p.created_at
-            ORDER BY p.created_at DESC;
+            IF current_setting('reverence.reaction_write_behind', true) IS DISTINCT FROM 'on' THEN
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP <> 'INSERT' THEN
+                v_old_type := OLD.reaction_type;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                v_new_type := NEW.reaction_type;
+            END IF;
+            IF v_old_type IS NOT DISTINCT FROM v_new_type THEN
+                RETURN NULL;
+            END IF;
+
+            INSERT INTO reaction_deltas(
+                reactable_type, reactable_id, reactor_id,
+                likes_delta, loves_delta, dislikes_delta
+            )
+            VALUES (
+                COALESCE(NEW.reactable_type, OLD.reactable_type),
+                COALESCE(NEW.reactable_id, OLD.reactable_id),
+                COALESCE(NEW.user_id, OLD.user_id),
+                (v_new_type IS NOT DISTINCT FROM 'like')::INT - (v_old_type IS NOT DISTINCT FROM 'like')::INT,
+                (v_new_type IS NOT DISTINCT FROM 'love')::INT - (v_old_type IS NOT DISTINCT FROM 'love')::INT,
+                (v_new_type IS NOT DISTINCT FROM 'dislike')::INT - (v_old_type IS NOT DISTINCT FROM 'dislike')::INT
+            );
+            RETURN NULL;
         END;
         $$ LANGUAGE plpgsql;
         """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_reaction_deltas ON reactions")
+        cursor.execute("""
+        CREATE TRIGGER trg_reaction_deltas
+        AFTER INSERT OR UPDATE OR DELETE ON reactions
+        FOR EACH ROW
+        EXECUTE FUNCTION reaction_deltas_on_reaction();
+        """)
 
-    connection.commit()
-    print("✔ reactions table + SQL functions initialized")
+        # -------------------------
+        # Несвёрнутые дельты одного объекта (для ответа toggle)
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION pending_reaction_deltas(p_reactable_type VARCHAR, p_reactable_id INT)
+        RETURNS TABLE(likes INT, loves INT, dislikes INT) AS $$
+            SELECT
+                COALESCE(SUM(d.likes_delta), 0)::INT,
+                COALESCE(SUM(d.loves_delta), 0)::INT,
+                COALESCE(SUM(d.dislikes_delta), 0)::INT
+            FROM reaction_deltas d
+            WHERE d.reactable_type = p_reactable_type
+              AND d.reactable_id = p_reactable_id;
+        $$ LANGUAGE sql STABLE;
+        """)
+
+        # -------------------------
+        # Свернуть пачку дельт одним statement; SKIP LOCKED - агрегаторы не мешают друг другу
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION apply_reaction_deltas(p_batch_size INT)
+        RETURNS INT AS $$
+            WITH batch AS (
+                DELETE FROM reaction_deltas d
+                WHERE d.id IN (
+                    SELECT id FROM reaction_deltas
+                    ORDER BY id
+                    LIMIT p_batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING d.*
+            ),
+            owned AS (
+                SELECT
+                    b.*,
+                    CASE b.reactable_type WHEN 'post' THEN p.author_id ELSE c.user_id END AS owner_id
+                FROM batch b
+                LEFT JOIN posts p ON b.reactable_type = 'post' AND p.id = b.reactable_id
+                LEFT JOIN comments c ON b.reactable_type = 'comment' AND c.id = b.reactable_id
+            ),
+            post_upd AS (
+                UPDATE post_stats s
+                SET likes_count = s.likes_count + a.likes,
+                    loves_count = s.loves_count + a.loves,
+                    dislikes_count = s.dislikes_count + a.dislikes,
+                    updated_at = NOW()
+                FROM (
+                    SELECT reactable_id,
+                           SUM(likes_delta) AS likes,
+                           SUM(loves_delta) AS loves,
+                           SUM(dislikes_delta) AS dislikes
+                    FROM owned
+                    WHERE reactable_type = 'post'
+                    GROUP BY reactable_id
+                ) a
+                WHERE s.post_id = a.reactable_id
+            ),
+            comment_upd AS (
+                UPDATE comments c
+                SET likes_count = c.likes_count + a.likes,
+                    loves_count = c.loves_count + a.loves,
+                    dislikes_count = c.dislikes_count + a.dislikes
+                FROM (
+                    SELECT reactable_id,
+                           SUM(likes_delta) AS likes,
+                           SUM(loves_delta) AS loves,
+                           SUM(dislikes_delta) AS dislikes
+                    FROM owned
+                    WHERE reactable_type = 'comment'
+                    GROUP BY reactable_id
+                ) a
+                WHERE c.id = a.reactable_id
+            ),
+            reputation_upd AS (
+                UPDATE profile pr
+                SET reputation = pr.reputation + a.delta
+                FROM (
+                    SELECT owner_id,
+                           SUM(likes_delta * reaction_weight('like')
+                               + loves_delta * reaction_weight('love')
+                               + dislikes_delta * reaction_weight('dislike')) AS delta
+                    FROM owned
+                    WHERE owner_id IS NOT NULL AND owner_id <> reactor_id
+                    GROUP BY owner_id
+                ) a
+                WHERE pr.user_id = a.owner_id AND a.delta <> 0
+            ),
+            activity_upd AS (
+                UPDATE user_activity ua
+                SET reactions_on_posts = ua.reactions_on_posts + a.on_posts,
+                    reactions_on_comments = ua.reactions_on_comments + a.on_comments
+                FROM (
+                    SELECT owner_id,
+                           COALESCE(SUM(likes_delta + loves_delta + dislikes_delta)
+                               FILTER (WHERE reactable_type = 'post'), 0) AS on_posts,
+                           COALESCE(SUM(likes_delta + loves_delta + dislikes_delta)
+                               FILTER (WHERE reactable_type = 'comment'), 0) AS on_comments
+                    FROM owned
+                    WHERE owner_id IS NOT NULL
+                    GROUP BY owner_id
+                ) a
+                WHERE ua.user_id = a.owner_id
+            )
+            SELECT COUNT(*)::INT FROM batch;
+        $$ LANGUAGE sql;
+        """)
+
+        # -------------------------
+        # Отставание: сколько дельт ждёт и возраст самой старой
+        # -------------------------
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION reaction_delta_lag()
+        RETURNS TABLE(pending BIGINT, oldest_age_seconds DOUBLE PRECISION) AS $$
+            SELECT
+                COUNT(*),
+                COALESCE(EXTRACT(EPOCH FROM clock_timestamp() - MIN(created_at)), 0)::DOUBLE PRECISION
+            FROM reaction_deltas;
+        $$ LANGUAGE sql STABLE;
+        """)
+
+    print("✔ reaction_deltas + aggregator functions ready")
+
+
+# =========================
+# Пересчёт репутации с нуля (manage.py recompute_reputation)
+# =========================
+def init_reputation_audit():
+    """
+    reputation_drift(from, to): пользователи из [from, to), у которых
+    profile.reputation расходится с суммой весов реакций на их посты и комментарии.
+    Несвёрнутые reaction_deltas вычитаются - их ещё догонит aggregate_reactions.
+    """
+    with connection.cursor() as cursor:
+        # поиск комментариев владельца для пачки пользователей
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_comments_user
+        ON comments(user_id)
+        """)
+
+        cursor.execute("DROP FUNCTION IF EXISTS reputation_drift(INT, INT)")
+        cursor.execute("""
+        CREATE FUNCTION reputation_drift(p_from_user INT, p_to_user INT)
+        RETURNS TABLE(user_id INT, reputation INT, expected INT) AS $$
+        WITH owned AS (
+            SELECT p.author_id AS owner_id, r.user_id AS reactor_id, r.reaction_type
+            FROM posts p
+            JOIN reactions r ON r.reactable_type = 'post' AND r.reactable_id = p.id
+            WHERE p.author_id >= p_from_user AND p.author_id < p_to_user
+            UNION ALL
+            SELECT c.user_id, r.user_id, r.reaction_type
+            FROM comments c
+            JOIN reactions r ON r.reactable_type = 'comment' AND r.reactable_id = c.id
+            WHERE c.user_id >= p_from_user AND c.user_id < p_to_user
+        ),
+        earned AS (
+            SELECT owner_id, SUM(reaction_weight(reaction_type))::INT AS points
+            FROM owned
+            WHERE owner_id <> reactor_id
+            GROUP BY owner_id
+        ),
+        pending AS (
+            SELECT
+                CASE d.reactable_type WHEN 'post' THEN p.author_id ELSE c.user_id END AS owner_id,
+                d.reactor_id,
+                d.likes_delta * reaction_weight('like')
+                    + d.loves_delta * reaction_weight('love')
+                    + d.dislikes_delta * reaction_weight('dislike') AS points
+            FROM reaction_deltas d
+            LEFT JOIN posts p ON d.reactable_type = 'post' AND p.id = d.reactable_id
+            LEFT JOIN comments c ON d.reactable_type = 'comment' AND c.id = d.reactable_id
+        ),
+        pending_by_owner AS (
+            SELECT owner_id, SUM(points)::INT AS points
+            FROM pending
+            WHERE owner_id >= p_from_user AND owner_id < p_to_user
+              AND owner_id <> reactor_id
+            GROUP BY owner_id
+        ),
+        expected AS (
+            SELECT
+                pr.user_id,
+                pr.reputation,
+                COALESCE(e.points, 0) - COALESCE(pd.points, 0) AS expected
+            FROM profile pr
+            LEFT JOIN earned e ON e.owner_id = pr.user_id
+            LEFT JOIN pending_by_owner pd ON pd.owner_id = pr.user_id
+            WHERE pr.user_id >= p_from_user AND pr.user_id < p_to_user
+        )
+        SELECT user_id, reputation, expected
+        FROM expected
+        WHERE reputation <> expected
+        ORDER BY user_id;
+        $$ LANGUAGE sql STABLE;
+        """)
+
+    print("✔ reputation audit functions ready")
 
 # =========================
 # Python wrappers
 # =========================
 
+# режимы сортировки get_posts_with_reactions
+POSTS_WITH_REACTIONS_SORTS = ('recent', 'reactions')
+
+# FK партиций reactions_post / reactions_comment на posts / comments
+REACTABLE_FK_CONSTRAINTS = ('reactions_post_reactable_fk', 'reactions_comment_reactable_fk')
+
+# FK reactions.user_id на users (имя по умолчанию, общее для партиций)
+REACTIONS_USER_FK_CONSTRAINT = 'reactions_user_id_fkey'
+
+GET_USER_REACTION_ON_POST = PreparedStatement(
+    "get_user_reaction_on_post_stmt", "SELECT get_user_reaction_on_post_func(%s, %s)"
+)
+
+
+def violated_constraint(error):
+    """Имя нарушенного ограничения из IntegrityError (psycopg2 diag)"""
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None)
+
+
+
+def log_db_notices():
+    """
+    Режим трассировки: NOTICE из триггера (reaction_trace ...) уходят в debug-лог.
+    Без REACTIONS_TRACE триггер ничего не шлёт, и здесь нечего делать.
+    """
+    if not settings.REACTIONS_TRACE or connection.connection is None:
+        return
+    notices = connection.connection.notices
+    for notice in notices:
+        logger.debug(notice.strip().removeprefix("NOTICE:  "))
+    notices.clear()
+
+
 def add_or_update_reaction(user_id, reactable_type, reactable_id, reaction_type):
     """Добавить или обновить реакцию"""
-    print(f"[Python] add_or_update_reaction: user_id={user_id}, type={reactable_type}, id={reactable_id}, reaction={reaction_type}")
     with connection.cursor() as cursor:
         cursor.execute(
             "SELECT * FROM add_or_update_reaction_func(%s, %s, %s, %s)",
             (user_id, reactable_type, reactable_id, reaction_type)
         )
-        result = dict_fetchone(cursor)
+        result = fetch_one(cursor)
     connection.commit()
-    print(f"[Python] Result: {result}")
+    log_db_notices()
+    logger.debug("add_or_update_reaction user=%s target=%s:%s reaction=%s result=%s",
+                 user_id, reactable_type, reactable_id, reaction_type, result)
     return result
 
 
 def remove_reaction(user_id, reactable_type, reactable_id):
     """Удалить реакцию"""
-    print(f"[Python] remove_reaction: user_id={user_id}, type={reactable_type}, id={reactable_id}")
     with connection.cursor() as cursor:
         cursor.execute(
             "SELECT remove_reaction_func(%s, %s, %s)",
@@ -439,30 +892,79 @@ def remove_reaction(user_id, reactable_type, reactable_id):
         )
         result = cursor.fetchone()[0]
     connection.commit()
-    print(f"[Python] Deleted: {result}")
+    log_db_notices()
+    logger.debug("remove_reaction user=%s target=%s:%s deleted=%s",
+                 user_id, reactable_type, reactable_id, result)
     return result
 
 
+def toggle_reaction(user_id, reactable_type, reactable_id, reaction_type):
+    """
+    Переключить реакцию одним запросом.
+    Возвращает {viewer_reaction, likes_count, loves_count, dislikes_count, post_id}.
+    Нет такого поста/комментария -> None (FK партиции)
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT * FROM toggle_reaction_func(%s, %s, %s, %s)",
+                (user_id, reactable_type, reactable_id, reaction_type)
+            )
+            result = fetch_one(cursor)
+    except IntegrityError as e:
+        if violated_constraint(e) in REACTABLE_FK_CONSTRAINTS:
+            return None
+        raise
+    log_db_notices()
+    return result
+
+
+def apply_reaction_deltas(batch_size):
+    """Свернуть одну пачку дельт, вернуть число свёрнутых строк"""
+    return call_value("SELECT apply_reaction_deltas(%s)", (batch_size,))
+
+
+def get_reaction_delta_lag():
+    """{pending, oldest_age_seconds}"""
+    return call_one("SELECT * FROM reaction_delta_lag()")
+
+
+def repair_reputation_range(user_from, user_to, apply=True):
+    """
+    Сверяет репутацию пользователей [user_from, user_to) и, если apply,
+    исправляет одним UPDATE. Поправка применяется как дельта к текущему
+    значению, чтобы не затереть реакции, пришедшие после чтения.
+    Возвращает список {user_id, reputation, expected}.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT * FROM reputation_drift(%s, %s)", (user_from, user_to))
+        drift = fetch_all(cursor)
+        if apply and drift:
+            cursor.execute("""
+                UPDATE profile pr
+                SET reputation = pr.reputation + v.diff
+                FROM unnest(%s::INT[], %s::INT[]) AS v(user_id, diff)
+                WHERE pr.user_id = v.user_id
+            """, (
+                [row["user_id"] for row in drift],
+                [row["expected"] - row["reputation"] for row in drift],
+            ))
+        return drift
+
+
 def get_post_reactions_stats(post_id):
     """Получить статистику реакций для поста"""
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_post_reactions_stats_func(%s)", (post_id,))
-        return dict_fetchall(cursor)
+    return call_all("SELECT * FROM get_post_reactions_stats_func(%s)", (post_id,))
 
 
 def get_comment_reactions_stats(comment_id):
     """Получить статистику реакций для комментария"""
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_comment_reactions_stats_func(%s)", (comment_id,))
-        return dict_fetchall(cursor)
+    return call_all("SELECT * FROM get_comment_reactions_stats_func(%s)", (comment_id,))
 
 
 def get_user_reaction_on_post(user_id, post_id):
     """Получить реакцию пользователя на пост"""
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT get_user_reaction_on_post_func(%s, %s)", (user_id, post_id))
-        result = cursor.fetchone()
-        return result[0] if result else None
+    return call_value(GET_USER_REACTION_ON_POST, (user_id, post_id))
 
 
 def get_user_reaction_on_comment(user_id, comment_id):
@@ -473,8 +975,62 @@ def get_user_reaction_on_comment(user_id, comment_id):
         return result[0] if result else None
 
 
-def get_posts_with_reactions():
-    """Получить все посты с количеством реакций"""
+def get_user_reactions(user_id, reactable_type, reactable_ids):
+    """Реакции пользователя на список объектов: {reactable_id: reaction_type}"""
+    if not user_id or not reactable_ids:
+        return {}
+    return dict(call_all(
+        "SELECT * FROM get_user_reactions_func(%s, %s, %s)",
+        (user_id, reactable_type, list(reactable_ids)),
+        row_factory=tuple_row,
+    ))
+
+
+def get_user_reactions_on_posts(user_id, post_ids):
+    """{post_id: reaction_type} для ленты постов"""
+    return get_user_reactions(user_id, 'post', post_ids)
+
+
+def get_user_reactions_on_comments(user_id, comment_ids):
+    """{comment_id: reaction_type} для ветки комментариев"""
+    return get_user_reactions(user_id, 'comment', comment_ids)
+
+
+def attach_viewer_reactions(user_id, posts):
+    """Проставляет post["viewer_reaction"] для списка постов одним запросом"""
+    reactions = get_user_reactions_on_posts(user_id, [post["id"] for post in posts])
+    for post in posts:
+        post["viewer_reaction"] = reactions.get(post["id"])
+    return posts
+
+
+def get_posts_with_reactions(limit=20, sort='recent', cursor_token=None):
+    """
+    Страница постов с количеством реакций: (posts, next_cursor).
+    sort: 'recent' (новые первыми) или 'reactions' (больше реакций первыми)
+    """
+    if sort not in POSTS_WITH_REACTIONS_SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+
+    created_at = total = None
+    if sort == 'reactions':
+        total, post_id = decode_count_cursor(cursor_token)
+    else:
+        created_at, post_id = decode_cursor(cursor_token)
+
     with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_posts_with_reactions_func()")
-        return dict_fetchall(cursor)
\ No newline at end of file
+        cursor.execute(
+            "SELECT * FROM get_posts_with_reactions_func(%s, %s, %s, %s, %s)",
+            (limit + 1, sort, created_at, total, post_id)
+        )
+        rows = fetch_all(cursor)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if sort == 'reactions':
+            next_cursor = encode_count_cursor(last["total_reactions"], last["id"])
+        else:
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+    return rows, next_cursor
\ No newline at end of file
@@ -1,48 +1,53 @@
 from django.shortcuts import redirect
 from django.http import JsonResponse
+from django.db import IntegrityError
 from reactions import sql_reactions
-from comments import sql_comments
+from users.views import jwt_token_required
 
 
+@jwt_token_required
 def toggle_reaction_view(request, reactable_type, reactable_id, reaction_type):
     """
     Добавить/изменить/удалить реакцию.
     Если юзер уже поставил такую же реакцию - удалить.
     Если юзер поставил другую реакцию - обновить.
+    С Accept: application/json отвечает счётчиками вместо редиректа.
     """
     if request.method != "POST":
         return JsonResponse({"error": "POST required"}, status=405)
 
+    user_id = request.user_id
+    wants_json = "application/json" in request.headers.get("Accept", "")
     
-    user_id = request.session.get('user_id', 1)
     
-    
-    if reactable_type not in ['post', 'comment']:
+    if reactable_type not in sql_reactions.REACTABLE_TYPES:
         return JsonResponse({"error": "Invalid reactable_type"}, status=400)
     
     
-    if reaction_type not in ['like', 'love', 'dislike']:
+    if reaction_type not in sql_reactions.REACTION_TYPES:
         return JsonResponse({"error": "Invalid reaction_type"}, status=400)
 
-    
-    if reactable_type == 'post':
-        current_reaction = sql_reactions.get_user_reaction_on_post(user_id, reactable_id)
-    else:
-        current_reaction = sql_reactions.get_user_reaction_on_comment(user_id, reactable_id)
+    try:
+        result = sql_reactions.toggle_reaction(user_id, reactable_type, reactable_id, reaction_type)
+    except IntegrityError as e:
+        # FK reactions.user_id: пользователя из токена больше нет
+        if sql_reactions.violated_constraint(e) != sql_reactions.REACTIONS_USER_FK_CONSTRAINT:
+            raise
+        if wants_json:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        return redirect('login')
 
-    
-    if current_reaction == reaction_type:
-        sql_reactions.remove_reaction(user_id, reactable_type, reactable_id)
-    else:
-        
-        sql_reactions.add_or_update_reaction(user_id, reactable_type, reactable_id, reaction_type)
+    # FK партиции: поста/комментария нет
+    if result is None:
+        if wants_json:
+            return JsonResponse({"error": f"{reactable_type} not found"}, status=404)
+        return redirect('posts:all-posts')
 
-    
-    if reactable_type == 'post':
-        return redirect('posts:post-detail-page', post_id=reactable_id)
-    else:
-        
-        comment = sql_comments.get_comment(reactable_id)
-        if comment:
-            return redirect('posts:post-detail-page', post_id=comment['post_id'])
-        return redirect('posts:posts-list-page')
\ No newline at end of file
+    if wants_json:
+        return JsonResponse({
+            "reactable_type": reactable_type,
+            "reactable_id": reactable_id,
+            **result,
+        })
+
+    return redirect('posts:post-detail-page', post_id=result["post_id"])
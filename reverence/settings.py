@@ -46,7 +46,8 @@ INSTALLED_APPS = [
     'posts',
     'tags',
     'client',
-    'reactions'
+    'reactions',
+    'db',
 
 ]
 
@@ -87,15 +88,68 @@ WSGI_APPLICATION = 'reverence.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Трассировка триггера репутации (RAISE NOTICE -> logger "reactions.sql_reactions")
+REACTIONS_TRACE = os.getenv('REACTIONS_TRACE', '') == '1'
+
+# Write-behind: триггеры пишут дельты в reaction_deltas, счётчики/репутацию
+# догоняет manage.py aggregate_reactions (интервал и допустимое отставание в секундах)
+REACTIONS_WRITE_BEHIND = os.getenv('REACTIONS_WRITE_BEHIND', '') == '1'
+REACTIONS_AGGREGATE_INTERVAL = float(os.getenv('REACTIONS_AGGREGATE_INTERVAL', 2))
+REACTIONS_MAX_LAG = float(os.getenv('REACTIONS_MAX_LAG', 30))
+
+# Соединения с БД (db/backends/postgresql, db/pool.py):
+# DB_POOL_MAX_SIZE > 0 - пул psycopg2 в процессе, соединение берётся на запрос и
+# возвращается в пул; 0 - постоянное соединение на поток на DB_CONN_MAX_AGE секунд.
+# В обоих режимах перед повторным использованием соединение проверяется
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+# /metrics/db-pool/ отвечает только с заголовком Authorization: Bearer <токен>;
+# пустой токен - эндпоинт выключен (404)
+DB_POOL_METRICS_TOKEN = os.getenv('DB_POOL_METRICS_TOKEN', '')
+# Горячие вызовы (db.access.PreparedStatement) через PREPARE/EXECUTE на соединении;
+# при пулере в transaction-режиме выключить
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', '1') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'db.backends.postgresql',
         'HOST': os.getenv('POSTGRES_HOST', 'db'),
         'PORT': os.getenv('POSTGRES_PORT', 5432),
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'NAME': os.getenv('POSTGRES_DB', 'postageres'),
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'session_settings': {
+                'reverence.trace_reactions': 'on' if REACTIONS_TRACE else 'off',
+                'reverence.reaction_write_behind': 'on' if REACTIONS_WRITE_BEHIND else 'off',
+            },
+        },
+    }
+}
+
+if DB_POOL_MAX_SIZE:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': DB_POOL_TIMEOUT,
     }
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'reactions': {
+            'handlers': ['console'],
+            'level': 'DEBUG' if REACTIONS_TRACE else 'INFO',
+        },
+    },
 }
 
 
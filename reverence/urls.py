@@ -7,5 +7,6 @@ urlpatterns = [
     path('posts/', include(('posts.urls', 'posts'), namespace='posts')),
     path('tags/', include(('tags.urls', 'tags'), namespace='tags')),
     path('reactions/', include(('reactions.urls', 'reactions'), namespace='reactions')),
+    path('metrics/', include(('db.urls', 'db'), namespace='db')),
     path('', include(('comments.urls', 'comments'), namespace='comments'))
 ]
\ No newline at end of file
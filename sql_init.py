@@ -1,16 +1,7 @@
-from users.sql_users import create_users_table
-from posts.sql_posts import init_posts_table
-from comments.sql_comments import init_comments_table
-from profile.sql_profile import create_profile_table_and_functions
-
-from django.db import connection
+from db.sql_migrations import apply_migrations
 
 
 def init_all_tables():
-    
-    create_users_table()
-    init_posts_table()
-    init_comments_table()
-    create_profile_table()
+    # схема теперь только через раннер: python manage.py sqlmigrate_apply
+    apply_migrations()
     print("✅ All tables created successfully!")
-
@@ -1,20 +1,6 @@
 from django.db import connection
 
-# =========================
-# Утилиты
-# =========================
-def dict_fetchone(cursor):
-    row = cursor.fetchone()
-    if row is None:
-        return None
-    desc = cursor.description
-    return {desc[i].name: row[i] for i in range(len(row))}
-
-def dict_fetchall(cursor):
-    rows = cursor.fetchall()
-    desc = cursor.description
-    return [{desc[i].name: row[i] for i in range(len(row))} for row in rows]
-
+from db.access import call_all, call_one
 
 # =========================
 # Таблицы Tags и Post_Tags + SQL функции
@@ -78,13 +64,10 @@ def create_tags_tables():
         cursor.execute("""
             CREATE FUNCTION get_tag_func(p_id INT)
             RETURNS TABLE(id INT, name TEXT) AS $$
-            BEGIN
-                RETURN QUERY
                 SELECT tags.id, tags.name 
                 FROM tags 
                 WHERE tags.id = p_id;
-            END;
-            $$ LANGUAGE plpgsql;
+            $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -94,13 +77,43 @@ def create_tags_tables():
         cursor.execute("""
             CREATE FUNCTION get_all_tags_func()
             RETURNS TABLE(id INT, name TEXT) AS $$
-            BEGIN
-                RETURN QUERY
                 SELECT tags.id, tags.name 
                 FROM tags 
                 ORDER BY tags.name;
+            $$ LANGUAGE sql STABLE PARALLEL SAFE;
+        """)
+
+        # =========================
+        # SEARCH tags (pg_trgm)
+        # =========================
+        cursor.execute("DROP FUNCTION IF EXISTS search_tags_func(TEXT, INT, REAL)")
+        cursor.execute("""
+            CREATE FUNCTION search_tags_func(
+                p_query TEXT,
+                p_limit INT,
+                p_threshold REAL DEFAULT 0.3
+            )
+            RETURNS TABLE(id INT, name TEXT, score REAL) AS $$
+            DECLARE
+                v_pattern TEXT := '%' || replace(replace(replace(p_query,
+                    '!', '!!'), '%', '!%'), '_', '!_') || '%';
+            BEGIN
+                PERFORM set_config('pg_trgm.word_similarity_threshold', p_threshold::TEXT, true);
+
+                RETURN QUERY
+                WITH matches AS (
+                    SELECT t.id, t.name, word_similarity(p_query, t.name) AS sim
+                    FROM tags t
+                    WHERE t.name ILIKE v_pattern ESCAPE '!'
+                       OR p_query <% t.name
+                )
+                SELECT m.id, m.name, m.sim
+                FROM matches m
+                ORDER BY m.sim DESC, m.name
+                LIMIT p_limit;
             END;
-            $$ LANGUAGE plpgsql;
+            $$ LANGUAGE plpgsql
+            SET pg_trgm.word_similarity_threshold = 0.6;
         """)
 
         # =========================
@@ -127,19 +140,20 @@ def create_tags_tables():
 # Python wrappers
 # =========================
 def create_tag(name):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM create_tag_func(%s)", (name,))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM create_tag_func(%s)", (name,))
 
 def get_tag(tag_id):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_tag_func(%s)", (tag_id,))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM get_tag_func(%s)", (tag_id,))
 
 def get_all_tags():
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_all_tags_func()")
-        return dict_fetchall(cursor)
+    return call_all("SELECT * FROM get_all_tags_func()")
+
+def search_tags(query_text, limit=10, threshold=0.3):
+    query_text = (query_text or "").strip()
+    if not query_text:
+        return []
+    return call_all("SELECT * FROM search_tags_func(%s, %s, %s)",
+                    (query_text, limit, threshold))
 
 def delete_tag(tag_id):
     with connection.cursor() as cursor:
@@ -3,7 +3,6 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from users.views import jwt_required
 from .sql_tags import (
-    create_tags_tables,
     create_tag,
     get_tag,
     get_all_tags,
@@ -12,11 +11,6 @@ from .sql_tags import (
     update_tag
 )
 
-# =========================
-# Инициализация таблиц
-# =========================
-create_tags_tables()
-
 # =========================
 # Список всех тегов
 # =========================
@@ -1,20 +1,6 @@
 from django.db import connection
 
-# =========================
-# Utils
-# =========================
-def dict_fetchone(cursor):
-    row = cursor.fetchone()
-    if row is None:
-        return None
-    desc = cursor.description
-    return {desc[i].name: row[i] for i in range(len(row))}
-
-def dict_fetchall(cursor):
-    rows = cursor.fetchall()
-    desc = cursor.description
-    return [{desc[i].name: row[i] for i in range(len(row))} for row in rows]
-
+from db.access import PreparedStatement, call_all, call_one, call_value
 
 # =========================
 # Users table init + SQL functions
@@ -66,13 +52,10 @@ def create_users_table():
         cursor.execute("""
         CREATE FUNCTION get_user_by_username_func(p_username VARCHAR)
         RETURNS TABLE(user_id INT, username VARCHAR, password VARCHAR) AS $$
-        BEGIN
-            RETURN QUERY
             SELECT u.id, u.username, u.password
             FROM users u
             WHERE u.username = p_username;
-        END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -82,13 +65,10 @@ def create_users_table():
         cursor.execute("""
         CREATE FUNCTION get_user_by_email_func(p_email VARCHAR)
         RETURNS TABLE(user_id INT, username VARCHAR, email VARCHAR, password VARCHAR) AS $$
-        BEGIN
-            RETURN QUERY
             SELECT u.id, u.username, u.email, u.password
             FROM users u
             WHERE u.email = p_email;
-        END;
-        $$ LANGUAGE plpgsql;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -98,12 +78,8 @@ def create_users_table():
         cursor.execute("""
         CREATE FUNCTION user_exists_func(p_user_id INT)
         RETURNS BOOLEAN AS $$
-        DECLARE exists_flag BOOLEAN;
-        BEGIN
-            SELECT EXISTS(SELECT 1 FROM users u WHERE u.id = p_user_id) INTO exists_flag;
-            RETURN exists_flag;
-        END;
-        $$ LANGUAGE plpgsql;
+            SELECT EXISTS(SELECT 1 FROM users u WHERE u.id = p_user_id);
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -113,12 +89,8 @@ def create_users_table():
         cursor.execute("""
         CREATE FUNCTION count_users_func()
         RETURNS INT AS $$
-        DECLARE total INT;
-        BEGIN
-            SELECT COUNT(*) INTO total FROM users;
-            RETURN total;
-        END;
-        $$ LANGUAGE plpgsql;
+            SELECT COUNT(*)::INT FROM users;
+        $$ LANGUAGE sql STABLE PARALLEL SAFE;
         """)
 
         # =========================
@@ -146,38 +118,68 @@ def create_users_table():
         $$ LANGUAGE plpgsql;
         """)
 
+        # =========================
+        # Поиск пользователей по username (pg_trgm)
+        # =========================
+        cursor.execute("DROP FUNCTION IF EXISTS search_users_func(VARCHAR, INT, REAL)")
+        cursor.execute("""
+        CREATE FUNCTION search_users_func(
+            p_query VARCHAR,
+            p_limit INT,
+            p_threshold REAL DEFAULT 0.3
+        )
+        RETURNS TABLE(user_id INT, username VARCHAR, score REAL) AS $$
+        DECLARE
+            v_pattern TEXT := '%' || replace(replace(replace(p_query,
+                '!', '!!'), '%', '!%'), '_', '!_') || '%';
+        BEGIN
+            PERFORM set_config('pg_trgm.word_similarity_threshold', p_threshold::TEXT, true);
+
+            RETURN QUERY
+            WITH matches AS (
+                SELECT u.id, u.username, word_similarity(p_query, u.username) AS sim
+                FROM users u
+                WHERE u.username ILIKE v_pattern ESCAPE '!'
+                   OR p_query <% u.username
+            )
+            SELECT m.id, m.username, m.sim
+            FROM matches m
+            ORDER BY m.sim DESC, m.id
+            LIMIT p_limit;
+        END;
+        $$ LANGUAGE plpgsql
+        SET pg_trgm.word_similarity_threshold = 0.6;
+        """)
+
     print("✔ users table and SQL functions ready")
 
 
 # =========================
 # Python wrappers
 # =========================
+USER_EXISTS = PreparedStatement("user_exists_stmt", "SELECT user_exists_func(%s)")
+
+
 def register_user(username, email, password):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM register_user_func(%s, %s, %s)", (username, email, password))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM register_user_func(%s, %s, %s)", (username, email, password))
 
 def get_user_by_username(username):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_user_by_username_func(%s)", (username,))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM get_user_by_username_func(%s)", (username,))
 
 def get_user_by_email(email):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM get_user_by_email_func(%s)", (email,))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM get_user_by_email_func(%s)", (email,))
 
 def user_exists(user_id):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT user_exists_func(%s)", (user_id,))
-        return cursor.fetchone()[0]
+    return call_value(USER_EXISTS, (user_id,))
 
 def count_users():
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT count_users_func()")
-        return cursor.fetchone()[0]
+    return call_value("SELECT count_users_func()")
 
 def update_user(user_id, username=None, email=None, password=None):
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT * FROM update_user_func(%s, %s, %s, %s)", (user_id, username, email, password))
-        return dict_fetchone(cursor)
+    return call_one("SELECT * FROM update_user_func(%s, %s, %s, %s)", (user_id, username, email, password))
+
+def search_users(query_text, limit=10, threshold=0.3):
+    query_text = (query_text or "").strip()
+    if not query_text:
+        return []
+    return call_all("SELECT * FROM search_users_func(%s, %s, %s)", (query_text, limit, threshold))
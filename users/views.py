@@ -6,29 +6,41 @@ from functools import wraps
 from datetime import datetime, timedelta
 from django.views.decorators.http import require_POST
 from django.contrib.auth.hashers import make_password, check_password
-from .sql_users import create_users_table, register_user, get_user_by_username, user_exists
+from .sql_users import register_user, get_user_by_username, user_exists
+
+# =========================
+# JWT-cookie: одно место для имени cookie, алгоритма и разбора токена
+# =========================
+JWT_COOKIE = 'jwt'
+JWT_ALGORITHM = 'HS256'
+
+
+def _jwt_user_id(request):
+    """user_id из JWT-cookie или None (нет cookie, истёк, подпись неверна)"""
+    token = request.COOKIES.get(JWT_COOKIE)
+    if not token:
+        return None
+    try:
+        payload = pyjwt.decode(token, settings.SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except (pyjwt.ExpiredSignatureError, pyjwt.InvalidTokenError):
+        return None
+    return payload.get('user_id')
+
 
 # =========================
 # Главная страница
 # =========================
 def htmlshablon(request):
-    create_users_table()
-    token = request.COOKIES.get('jwt')
+    user_id = _jwt_user_id(request)
     username = None
 
-    if token:
-        try:
-            payload = pyjwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user_id = payload.get('user_id')
-            if user_exists(user_id):
-                from django.db import connection
-                with connection.cursor() as cursor:
-                    cursor.execute("SELECT username FROM users WHERE id = %s", [user_id])
-                    row = cursor.fetchone()
-                    if row:
-                        username = row[0]
-        except (pyjwt.ExpiredSignatureError, pyjwt.InvalidTokenError):
-            pass
+    if user_id is not None and user_exists(user_id):
+        from django.db import connection
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT username FROM users WHERE id = %s", [user_id])
+            row = cursor.fetchone()
+            if row:
+                username = row[0]
 
     return render(request, 'users/main.html', {'username': username})
 
@@ -36,7 +48,6 @@ def htmlshablon(request):
 # Регистрация
 # =========================
 def register(request):
-    create_users_table()
     if request.method == 'POST':
         username = request.POST.get('username').strip()
         email = request.POST.get('email').strip()
@@ -87,7 +98,7 @@ def login(request):
             'exp': datetime.utcnow() + timedelta(hours=24),
         }
 
-        token = pyjwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+        token = pyjwt.encode(payload, settings.SECRET_KEY, algorithm=JWT_ALGORITHM)
         
         # ✅ Отладка
         print(f"LOGIN DEBUG: user_id={user_id}, type={type(user_id)}")
@@ -95,7 +106,7 @@ def login(request):
         print(f"LOGIN DEBUG: token={token[:50]}...")
         
         response = redirect('htmlshablon')
-        response.set_cookie('jwt', token, httponly=True, max_age=86400, samesite='Lax')
+        response.set_cookie(JWT_COOKIE, token, httponly=True, max_age=86400, samesite='Lax')
         
         print(f"LOGIN DEBUG: Cookie set successfully")
         
@@ -109,7 +120,7 @@ def login(request):
 @require_POST
 def logout(request):
     response = redirect('htmlshablon')
-    response.delete_cookie('jwt')
+    response.delete_cookie(JWT_COOKIE)
     return response
 
 # =========================
@@ -118,18 +129,34 @@ def logout(request):
 def jwt_required(view_func):
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        token = request.COOKIES.get('jwt')
-        if not token:
+        user_id = _jwt_user_id(request)
+        if user_id is None or not user_exists(user_id):
             return redirect('login')
+        request.user_id = user_id
 
-        try:
-            payload = pyjwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user_id = payload.get('user_id')
-            if not user_exists(user_id):
-                return redirect('login')
-            request.user_id = user_id
-        except (pyjwt.ExpiredSignatureError, pyjwt.InvalidTokenError):
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def jwt_token_required(view_func):
+    """
+    Как jwt_required, но без запроса user_exists: view сам проверяет,
+    что пользователь существует (например, через viewer_exists в том же запросе).
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        user_id = _jwt_user_id(request)
+        if user_id is None:
             return redirect('login')
+        request.user_id = user_id
 
         return view_func(request, *args, **kwargs)
     return wrapper
+
+
+def get_jwt_user_id(request):
+    """
+    user_id из JWT-cookie или None - для страниц, открытых и без входа
+    (без запроса user_exists).
+    """
+    return _jwt_user_id(request)